@@ -34,6 +34,8 @@ Tzzzz是运行时间，范围为0000-9999，单位为s  全部是0000代表一
 #程序运行，必须先导入串口模块，然后实例化串口对象，然后调用相应的函数
 #1.导入串口模块
 from iCenterCar.z_uart import Mars_UART    
+from iCenterCar.z_servo import Mars_ServoFrame
+from iCenterCar.z_traj import Mars_ArmPlanner
 #2.导入时间模块
 import time
 
@@ -55,27 +57,38 @@ arm_servo_4_init=1500
 uart.uart_send_str('#021P1500T2000!')
 '''
 
+#预分配的指令帧，控制函数只改写其中的数字
+arm_frame = Mars_ServoFrame((21,22,23,24))
+arm_one_frame = Mars_ServoFrame((21,))
+
 #三、定义函数
 #1. 定义底盘舵机初始化函数，即再一次对中
 def arm_servos_init():
-    Srt = '#021P{0:0>4d}T{4:0>4d}!#022P{1:0>4d}T{4:0>4d}!#023P{2:0>4d}T{4:0>4d}!#024P{3:0>4d}T{4:0>4d}!'.format(arm_servo_1_init,arm_servo_2_init,arm_servo_3_init,arm_servo_4_init,1000)
-    print(Srt)
+    f = arm_frame
+    f.set(0,arm_servo_1_init,1000)
+    f.set(1,arm_servo_2_init,1000)
+    f.set(2,arm_servo_3_init,1000)
+    f.set(3,arm_servo_4_init,1000)
+    f.send(uart)
     print("Arm servos are tunning")
-    uart.uart_send_str(Srt)
     
 #2. 定义机械臂运动——任何1个关节运动，需要传递arm_id,arm_ang,move_time-ID号、角度和时间
 def arm_move_1(arm_id,arm_ang,move_time):
-    armSrt='#{0:0>3d}P{1:0>4d}T{2:0>4d}!'.format(arm_id,arm_ang,move_time)
-    print(armSrt)
+    f = arm_one_frame
+    f.set_id(0,arm_id)
+    f.set(0,arm_ang,move_time)
+    f.send(uart)
     print(arm_id,"is running")
-    uart.uart_send_str(armSrt)
 
 #4定义机械臂运动——4个关节的运动， 需要传递arm_ang1,arm_ang2,arm_ang3,arm_ang4,move_time
 def arm_move_4(arm_ang1,arm_ang2,arm_ang3,arm_ang4,move_time):
-    armSrt='#021P{0:0>4d}T{4:0>4d}!#022P{1:0>4d}T{4:0>4d}!#023P{2:0>4d}T{4:0>4d}!#024P{3:0>4d}T{4:0>4d}!'.format(arm_ang1,arm_ang2,arm_ang3,arm_ang4,move_time)
-    print(armSrt)
+    f = arm_frame
+    f.set(0,arm_ang1,move_time)
+    f.set(1,arm_ang2,move_time)
+    f.set(2,arm_ang3,move_time)
+    f.set(3,arm_ang4,move_time)
+    f.send(uart)
     print("Arm is running")
-    uart.uart_send_str(armSrt)
 
 if __name__ == '__main__':
 #     global uart,arm1_ang,arm2_ang,arm3_ang,arm4_ang,move_time,arm1_initial_ang,arm2_initial_ang,arm3_initial_ang,arm4_initial_ang
@@ -83,54 +96,25 @@ if __name__ == '__main__':
         
     #先对机械臂舵机初始值-程序对中
     arm_servos_init()
-    
-    #单个关节测试
-    #机械臂1号舵机先转到2000，再转到1000，最后回到初始位置
-    arm_move_1(arm_servo_1,2000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_1,1000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_1,arm_servo_1_init,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    #机械臂2号舵机先转到2000，再转到1000，最后回到初始位置
-    arm_move_1(arm_servo_2,2000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_2,1000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_2,arm_servo_2_init,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    
-    #机械臂3号舵机先转到2000，再转到1000，最后回到初始位置
-    arm_move_1(arm_servo_3,2000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_3,1000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_3,arm_servo_3_init,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    
-    #机械臂4号舵机先转到2000，再转到1000，最后回到初始位置
-    arm_move_1(arm_servo_4,2000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_4,1000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_4,arm_servo_4_init,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
+    time.sleep(1)
 
-    #机械臂的4个舵机同时调试  
+    #单个关节测试：每个舵机先转到2000，再转到1000，最后回到初始位置
+    #每个动作运动1秒、停留1秒，由轨迹规划器按固定周期平滑插值发送
+    arm_init = (arm_servo_1_init,arm_servo_2_init,arm_servo_3_init,arm_servo_4_init)
+    waypoints = []
+    for j in range(4):
+        for pwm in (2000,1000,arm_init[j]):
+            pose = list(arm_init)
+            pose[j] = pwm
+            waypoints.append((pose,1000))       #运动
+            waypoints.append((pose,1000))       #停留
+
+    #机械臂的4个舵机同时调试
     #1234关节
-    arm_move_4(1800,1800,1900,1900,1000)
-    time.sleep(2)
-    arm_move_4(1300,1400,1600,1200,1000)
-    time.sleep(2)
+    waypoints.append(((1800,1800,1900,1900),1000))
+    waypoints.append(((1800,1800,1900,1900),1000))
+    waypoints.append(((1300,1400,1600,1200),1000))
+    waypoints.append(((1300,1400,1600,1200),1000))
+
+    planner = Mars_ArmPlanner(arm_frame,uart,arm_init)
+    planner.run(waypoints)
@@ -34,6 +34,7 @@ Tzzzz是运行时间，范围为0000-9999，单位为s  全部是0000代表一
 #程序运行，必须先导入串口模块，然后实例化串口对象，然后调用相应的函数
 #1.导入串口模块
 from iCenterCar.z_uart import Mars_UART    
+from iCenterCar.z_servo import Mars_ServoFrame
 #2.导入时间模块
 import time
 
@@ -68,40 +69,68 @@ car_servo_br_init=1500
 uart.uart_send_str('#011P1500T2000!')
 '''
 
+#预分配的指令帧，控制函数只改写其中的数字
+car_motor_frame = Mars_ServoFrame((1,2,3,4),hold=0)
+car_servo_frame = Mars_ServoFrame((11,12,13,14))
+car_frame = Mars_ServoFrame((1,2,3,4,11,12,13,14),hold=(0,0,0,0,1,1,1,1))
+
 #三、定义函数
 #1.定义底盘舵机初始化函数，即再一次对中
 def car_servos_init():
-    Srt = '#011P{0:0>4d}T{4:0>4d}!#012P{1:0>4d}T{4:0>4d}!#013P{2:0>4d}T{4:0>4d}!#014P{3:0>4d}T{4:0>4d}!'.format(car_servo_fl_init,car_servo_fr_init,car_servo_bl_init,car_servo_br_init,1000)
-    print(Srt)
+    f = car_servo_frame
+    f.set(0,car_servo_fl_init,1000)
+    f.set(1,car_servo_fr_init,1000)
+    f.set(2,car_servo_bl_init,1000)
+    f.set(3,car_servo_br_init,1000)
+    f.send(uart)
     print("Car servos are tunning")
-    uart.uart_send_str(Srt)
 #2.小车直行运动函数
 def car_run(run_speed,run_time):
-    Srt = '#001P{0:0>4d}T{4:0>4d}!#002P{1:0>4d}T{4:0>4d}!#003P{2:0>4d}T{4:0>4d}!#004P{3:0>4d}T{4:0>4d}!'.format(1500-run_speed,1500+run_speed,1500-run_speed,1500+run_speed,run_time)
-    print(Srt)
+    f = car_motor_frame
+    f.set(0,1500-run_speed,run_time)
+    f.set(1,1500+run_speed,run_time)
+    f.set(2,1500-run_speed,run_time)
+    f.set(3,1500+run_speed,run_time)
+    f.send_changed(uart)
     print("Car is running")
-    uart.uart_send_str(Srt)
         
 #3.定义小车转弯运动
 def car_turn(turn_angle,turn_time):
-    Srt='#011P{0:0>4d}T{4:0>4d}!#012P{1:0>4d}T{4:0>4d}!#013P{2:0>4d}T{4:0>4d}!#014P{3:0>4d}T{4:0>4d}!'.format(1500-turn_angle,1500-turn_angle,1500+turn_angle,1500+turn_angle,turn_time)
-    print(Srt)
+    f = car_servo_frame
+    f.set(0,1500-turn_angle,turn_time)
+    f.set(1,1500-turn_angle,turn_time)
+    f.set(2,1500+turn_angle,turn_time)
+    f.set(3,1500+turn_angle,turn_time)
+    f.send_changed(uart)
     print("Car is turning")
-    uart.uart_send_str(Srt)
         
 #4.小车运动+转向
 def car_run_and_turn(run_speed,turn_angle,run_time):
-    Srt='#001P{0:0>4d}T{8:0>4d}!#002P{1:0>4d}T{8:0>4d}!#003P{2:0>4d}T{8:0>4d}!#004P{3:0>4d}T{8:0>4d}!#011P{4:0>4d}T{8:0>4d}!#012P{5:0>4d}T{8:0>4d}!#013P{6:0>4d}T{8:0>4d}!#014P{7:0>4d}T{8:0>4d}!'.format(1500-run_speed,1500+run_speed,1500-run_speed,1500+run_speed,1500-turn_angle,1500-turn_angle,1500+turn_angle,1500+turn_angle,run_time)
-    print(Srt)
+    f = car_frame
+    f.set(0,1500-run_speed,run_time)
+    f.set(1,1500+run_speed,run_time)
+    f.set(2,1500-run_speed,run_time)
+    f.set(3,1500+run_speed,run_time)
+    f.set(4,1500-turn_angle,run_time)
+    f.set(5,1500-turn_angle,run_time)
+    f.set(6,1500+turn_angle,run_time)
+    f.set(7,1500+turn_angle,run_time)
+    f.send_changed(uart)
     print("Car is running and turning")
-    uart.uart_send_str(Srt)
     
 #5.小车停止函数 #停止车轮和转向
 def car_stop():
-    Srt = '#001P1500T1000!#002P1500T1000!#003P1500T1000!#004P1500T1000!#011P1500T1000!#012P1500T1000!#013P1500T1000!#014P1500T1000!'
-    print(Srt)
+    f = car_frame
+    f.set(0,1500,1000)
+    f.set(1,1500,1000)
+    f.set(2,1500,1000)
+    f.set(3,1500,1000)
+    f.set(4,1500,1000)
+    f.set(5,1500,1000)
+    f.set(6,1500,1000)
+    f.set(7,1500,1000)
+    f.send_changed(uart)
     print("Car is stopping")
-    uart.uart_send_str(Srt)
 
 if __name__ == "__main__":
     
@@ -5,7 +5,8 @@
 '''
 #超声波测距传感器实例子
 import machine, time
-from machine import Pin
+from machine import Pin, Timer
+from array import array
 __version__ = '0.2.0'
 __author__ = 'Roberto Sánchez'
 __license__ = "Apache License 2.0. https://www.apache.org/licenses/LICENSE-2.0"
@@ -17,7 +18,15 @@ class HCSR04:
 
     The timeouts received listening to echo pin are converted to OSError('Out of range')
 
+    Besides the blocking distance_mm()/distance_cm(), start() runs the
+    sensor in the background: a hardware timer sends the trigger pulse,
+    echo edges are timestamped in a pin IRQ with ticks_us(), and each
+    result is published as integer millimetres into a ring buffer.
+    distance_median_mm() and distance_ema_mm() read the filtered value
+    without waiting for a measurement.
     """
+    OUT_OF_RANGE = 0  # Stored in the ring buffer when no echo came back in time
+    EMA_SHIFT = 2     # EMA weight of a new sample is 1/2**EMA_SHIFT
     # echo_timeout_us is based in chip range limit (400cm)
     def __init__(self, trigger_pin, echo_pin, echo_timeout_us=500*2*30):
         """
@@ -34,6 +43,17 @@ class HCSR04:
         # Init echo pin (in)
         self.echo = Pin(echo_pin, mode=Pin.IN, pull=None)
 
+        # Background ranging state, see start()
+        self.timer = None
+        self.samples = None
+        self._sorted = None    # Scratch buffer for distance_median_mm()
+        self.head = 0          # Next slot to write in samples
+        self.count = 0         # Valid slots in samples
+        self.seq = 0           # Incremented on every published sample, lets readers detect new data
+        self.ema16 = -1        # EMA of in-range samples in 1/16 mm, -1 until the first one
+        self._rise = 0         # ticks_us() of the echo rising edge
+        self._waiting = False  # A trigger was sent and its falling edge has not arrived yet
+
     def _send_pulse_and_wait(self):
         """
         Send the pulse to trigger and listen on echo pin.
@@ -70,6 +90,99 @@ class HCSR04:
         mm = pulse_time * 100 // 582
         return mm
 
+    def start(self, period_ms=60, depth=5, timer_id=2):
+        """
+        Start background ranging: one measurement every period_ms (the
+        sensor needs at least 60ms between pings), keeping the last depth
+        results. Uses hardware timer timer_id and an IRQ on the echo pin.
+        """
+        self.stop()
+        self.samples = array('H', bytes(2 * depth))
+        self._sorted = array('H', bytes(2 * depth))
+        self.head = 0
+        self.count = 0
+        self.ema16 = -1
+        self._waiting = False
+        # Hard IRQ so ticks_us() and pin.value() are read at the edge, not when the
+        # scheduler gets to it; the handler must not allocate
+        self.echo.irq(handler=self._echo_irq, trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, hard=True)
+        self.timer = Timer(timer_id)
+        self.timer.init(mode=Timer.PERIODIC, period=period_ms, callback=self._trigger_irq)
+
+    def stop(self):
+        """Stop background ranging and release the timer and echo IRQ."""
+        if self.timer is not None:
+            self.timer.deinit()
+            self.timer = None
+            self.echo.irq(handler=None)
+
+    def _trigger_irq(self, timer):
+        # The previous ping never came back: publish it as out of range
+        if self._waiting:
+            self._publish(self.OUT_OF_RANGE)
+        self._waiting = True
+        self._rise = 0
+        self.trigger.value(1)
+        time.sleep_us(10)
+        self.trigger.value(0)
+
+    def _echo_irq(self, pin):
+        t = time.ticks_us()
+        if pin.value():
+            self._rise = t
+        elif self._waiting and self._rise:
+            self._waiting = False
+            pulse_time = time.ticks_diff(t, self._rise)
+            if pulse_time > self.echo_timeout_us:
+                self._publish(self.OUT_OF_RANGE)
+            else:
+                self._publish(pulse_time * 100 // 582)
+
+    def _publish(self, mm):
+        self.samples[self.head] = mm
+        self.head = (self.head + 1) % len(self.samples)
+        if self.count < len(self.samples):
+            self.count += 1
+        if mm != self.OUT_OF_RANGE:
+            if self.ema16 < 0:
+                self.ema16 = mm << 4
+            else:
+                self.ema16 += ((mm << 4) - self.ema16) >> self.EMA_SHIFT
+        self.seq += 1
+
+    def latest_mm(self):
+        """Last published result in mm, OUT_OF_RANGE (0) for a lost echo, None before the first."""
+        if not self.count:
+            return None
+        return self.samples[(self.head - 1) % len(self.samples)]
+
+    def distance_median_mm(self):
+        """Median of the in-range results in the ring buffer, in mm, or None if there are none."""
+        if not self.count:
+            return None
+        buf = self._sorted
+        n = 0
+        for i in range(self.count):
+            v = self.samples[i]
+            if v == self.OUT_OF_RANGE:
+                continue
+            # Insertion sort into the preallocated scratch buffer
+            j = n
+            while j and buf[j - 1] > v:
+                buf[j] = buf[j - 1]
+                j -= 1
+            buf[j] = v
+            n += 1
+        if not n:
+            return None
+        return buf[n // 2]
+
+    def distance_ema_mm(self):
+        """Exponential moving average of the in-range results, in mm, or None before the first."""
+        if self.ema16 < 0:
+            return None
+        return (self.ema16 + 8) >> 4
+
     def distance_cm(self):
         """
         Get the distance in centimeters with floating point operations.
@@ -87,6 +200,14 @@ class HCSR04:
 # 程序入口
 if __name__ == "__main__":
     sensor = HCSR04(trigger_pin=2, echo_pin=4)  # 定义超声波模块Tring控制管脚及超声波模块Echo控制管脚,S3接口
+    # 后台测距：定时器触发、中断记录回波，主循环随时读取滤波后的距离，不会被测量阻塞
+    sensor.start(period_ms=60)
+    for _ in range(10):
+        time.sleep(0.5)
+        print(sensor.distance_median_mm(), 'mm (median)', sensor.distance_ema_mm(), 'mm (ema)', sensor.latest_mm(), 'mm (latest)')
+    sensor.stop()
+
+    # 阻塞测距
     while True:
         us_dis = sensor.distance_cm()  # 获取超声波计算距离 ，也可以调用sensor.distance_mm() 得到mm值
         print (us_dis, 'cm')  # 打印超声波距离值
@@ -1,10 +1,12 @@
 from machine import Pin
 import time
+from iCenterCar.z_pattern import Mars_Pattern
 
 class Mars_BEEP(object):
     def __init__(self, PIN_beep=5):
         self.PIN_beep = PIN_beep                    # 蜂鸣器连接引脚
         self.beep_pin = Pin(self.PIN_beep, Pin.OUT) # 蜂鸣器初始化并设置为输出模式
+        self.pattern = None                         # 后台鸣叫图案，第一次调用beep_pattern时创建
   
     # 蜂鸣器响
     def beep_on(self):
@@ -22,6 +24,22 @@ class Mars_BEEP(object):
             self.beep_off()                         # 蜂鸣器不响
             time.sleep(x)                           # 延时
 
+    # 后台播放鸣叫图案，立即返回；图案格式见z_pattern.py
+    def beep_pattern(self, pattern, repeat=1, timer_id=1):
+        if self.pattern is None:
+            self.pattern = Mars_Pattern(self.beep_pin, timer_id)
+        return self.pattern.play(pattern, repeat)
+
+    # 与beep_on_times相同的鸣叫，但不阻塞，x单位为秒
+    def beep_times(self, c=3, x=0.1):
+        ms = int(x * 1000)
+        return self.beep_pattern((ms, ms), c)
+
+    # 停止后台鸣叫
+    def beep_stop(self):
+        if self.pattern is not None:
+            self.pattern.stop()
+
 # 程序入口
 if __name__ == '__main__':
     beep = Mars_BEEP()                                # 实例化一个beep对象
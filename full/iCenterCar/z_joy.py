@@ -0,0 +1,176 @@
+'''
+手柄摇杆 -> 底盘运动映射
+四电机(1~4)+四转向舵机(11~14)的底盘：左摇杆上下控制车速，右摇杆左右控制转向。
+摇杆原始值 0~255(中位128)在构造时算成两张256项的查找表，包含死区和指数(expo)曲线：
+  y = (1-e)·x + e·x³   x为去掉死区后归一化的摇杆量，e为expo百分比
+中位附近细腻、推到底时最快，运行时每次只查两次表。
+
+为了不让总线被刷满：
+  - 车速或转向的变化小于 speed_step / turn_step 时不发送(松开摇杆回到0除外)
+  - 两次发送至少间隔 min_interval_ms，由波特率和总线占用比例 bus_share 算出：
+    一帧 8×15 字节，每字节10位，115200波特时约10.4ms，占用50%时最多约48帧/秒
+  - 使用 Mars_ServoFrame.send_changed()，只发目标有变化的设备
+电机指令带运行时间 move_time，手柄断开后电机会自己停下。send_changed() 总是发送运行中的电机指令，
+所以只改转向时电机指令也随帧发出、续上运行时间；摇杆保持不动时每 keepalive_ms 重发一次。手柄的红灯模式 0x73 和带压力感应的 0x79 都有摇杆数据。
+'''
+
+from array import array
+from iCenterCar.z_servo import SLOT
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:                         # CPython 下只用于运行自检
+    import time
+
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+THROTTLE = 8                                # PS2data 中左摇杆Y轴的位置
+STEER = 5                                   # PS2data 中右摇杆X轴的位置
+ANALOG_MODES = (0x73, 0x79)                 # 手柄红灯模拟模式(不带/带压力感应)，PS2data[1]
+
+
+# 生成256项查找表：原始值 -> -out_max~out_max，deadzone为中位两侧的死区，expo为0~100
+def make_lut(deadzone, expo, out_max, invert=False):
+    lut = array('h', [0] * 256)
+    span = 127 - deadzone
+    e = expo / 100
+    for r in range(256):
+        x = r - 128
+        a = abs(x) - deadzone
+        if a <= 0:
+            continue
+        n = min(a / span, 1.0)
+        y = int(((1 - e) * n + e * n * n * n) * out_max + 0.5)
+        if (x < 0) != invert:
+            y = -y
+        lut[r] = y
+    return lut
+
+
+class Mars_JoyMapper(object):
+    def __init__(self, uart, frame, motor_init, servo_init, speed_max=800, turn_max=200,
+                 deadzone=12, expo=40, speed_step=20, turn_step=8,
+                 baud=115200, bus_share=50, move_time=500, keepalive_ms=300):
+        self.uart = uart                                    # Mars_UART 对象
+        self.frame = frame                                  # 8个槽的帧：电机 fl fr bl br，舵机 fl fr bl br
+        self.motor_init = motor_init                        # 电机停止的PWM
+        self.servo_init = servo_init                        # 转向舵机对中的PWM
+        self.speed_lut = make_lut(deadzone, expo, speed_max, invert=True)  # Y轴向上为0，取反后向前为正
+        self.turn_lut = make_lut(deadzone, expo, turn_max)
+        self.speed_step = speed_step                        # 车速变化阈值
+        self.turn_step = turn_step                          # 转向变化阈值
+        self.move_time = move_time                          # 每条指令的运行时间
+        self.keepalive_ms = keepalive_ms                    # 保持不动时的重发间隔，应小于 move_time
+        # 总线预算：一整帧的传输时间除以允许占用的比例
+        self.min_interval_ms = frame.n * SLOT * 10 * 1000 * 100 // (baud * bus_share) + 1
+        self.speed = 0                                      # 最近发出的车速
+        self.turn = 0                                       # 最近发出的转向
+        self.last_ms = ticks_ms()                           # 最近一次发送的时间
+        self.frames = 0                                     # 发送次数
+        self.skipped = 0                                    # 因限速或变化太小而省去的次数
+
+    # 根据手柄当前的摇杆值更新底盘，读到新数据后调用；返回发送的设备数
+    def update(self, ps2):
+        data = ps2.PS2data
+        if data[1] not in ANALOG_MODES:                     # 不是模拟模式，摇杆值无效
+            return 0
+        speed = self.speed_lut[data[THROTTLE]]
+        turn = self.turn_lut[data[STEER]]
+        now = ticks_ms()
+        elapsed = ticks_diff(now, self.last_ms)
+        moved = (abs(speed - self.speed) >= self.speed_step or abs(turn - self.turn) >= self.turn_step
+                 or (speed == 0 and self.speed != 0) or (turn == 0 and self.turn != 0))
+        keep = self.speed != 0 and elapsed >= self.keepalive_ms
+        if (not moved and not keep) or elapsed < self.min_interval_ms:
+            self.skipped += 1
+            return 0
+        if not moved:
+            speed = self.speed
+            turn = self.turn
+        return self.drive(speed, turn, now)
+
+    # 按车速和转向设置8个槽并发送有变化的部分
+    def drive(self, speed, turn, now=None):
+        f = self.frame
+        m = self.motor_init
+        s = self.servo_init
+        t = self.move_time
+        if now is None:
+            now = ticks_ms()
+        f.set(0, m[0] - speed, t)
+        f.set(1, m[1] + speed, t)
+        f.set(2, m[2] - speed, t)
+        f.set(3, m[3] + speed, t)
+        f.set(4, s[0] - turn, t)
+        f.set(5, s[1] - turn, t)
+        f.set(6, s[2] + turn, t)
+        f.set(7, s[3] + turn, t)
+        self.speed = speed
+        self.turn = turn
+        self.last_ms = now
+        self.frames += 1
+        return f.send_changed(self.uart)
+
+    # 停车并回正
+    def stop(self):
+        return self.drive(0, 0)
+
+
+def _selftest():
+    """用假串口和假手柄数据检查两种模拟模式、只改转向时电机续时。"""
+    from iCenterCar.z_servo import Mars_ServoFrame
+
+    class FakeUART:
+        def __init__(self):
+            self.frames = []
+
+        def uart_send_str(self, buf):
+            self.frames.append(bytes(buf))
+
+    class FakePS2:
+        def __init__(self, mode):
+            self.PS2data = bytearray(21)
+            self.PS2data[1] = mode
+            self.PS2data[STEER] = 128
+            self.PS2data[THROTTLE] = 0                      # 左摇杆推到最上：全速前进
+
+    uart = FakeUART()
+    frame = Mars_ServoFrame((1, 2, 3, 4, 11, 12, 13, 14), hold=(0, 0, 0, 0, 1, 1, 1, 1))
+    joy = Mars_JoyMapper(uart, frame, (1500, 1500, 1500, 1500), (1580, 1450, 1570, 1460))
+    assert joy.update(FakePS2(0x41)) == 0                   # 数字模式没有摇杆值
+    ps2 = FakePS2(0x79)                                     # config_gamepad(pressures=True) 得到的模式
+    joy.last_ms -= joy.min_interval_ms
+    assert joy.update(ps2) == 8 and joy.speed == 800, uart.frames
+    assert uart.frames[-1].startswith(b'#001P0700T0500!#002P2300T0500!')
+    # 只改转向：车在运动，电机指令照样发出，运行时间不会中途耗尽
+    ps2.PS2data[STEER] = 255
+    joy.last_ms -= 1000
+    assert joy.update(ps2) == 8 and joy.turn == 200, uart.frames[-1]
+    assert joy.stop() == 8 and joy.stop() == 0
+    print('joy ok', joy.min_interval_ms, 'ms,', frame.sent_bytes, 'bytes')
+
+
+# 程序入口：用手柄左摇杆控制车速，右摇杆控制转向
+if __name__ == '__main__':
+    try:
+        import machine
+    except ImportError:                                     # CPython：用假串口自检
+        _selftest()
+        raise SystemExit
+    import time
+    from iCenterCar.z_uart import Mars_UART
+    from iCenterCar.z_ps2 import Mars_PS2
+    from iCenterCar.z_servo import Mars_ServoFrame
+    uart = Mars_UART()
+    ps2 = Mars_PS2()
+    ps2.config_gamepad()
+    frame = Mars_ServoFrame((1, 2, 3, 4, 11, 12, 13, 14), hold=(0, 0, 0, 0, 1, 1, 1, 1))
+    joy = Mars_JoyMapper(uart, frame, (1500, 1500, 1500, 1500), (1580, 1450, 1570, 1460))
+    print('min interval', joy.min_interval_ms, 'ms')
+    while True:
+        if ps2.read_gamepad():
+            joy.update(ps2)
+        time.sleep_ms(5)
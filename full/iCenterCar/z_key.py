@@ -1,13 +1,35 @@
 from machine import Pin
 import time
+import micropython
 from iCenterCar.z_led import Mars_LED
 
+# 按键事件类型
+KEY_PRESS = 1                                         # 按下
+KEY_RELEASE = 2                                       # 松开
+KEY_LONG = 3                                          # 长按，按住超过long_ms时产生一次
+
 class Mars_KEY(object):
-    def __init__(self, KEY1_PIN=36, KEY2_PIN=34):
+    def __init__(self, KEY1_PIN=36, KEY2_PIN=34, debounce_ms=20, long_ms=1000, depth=8):
         self.KEY1_PIN = KEY1_PIN                      # 定义按键1引脚
         self.KEY2_PIN = KEY2_PIN                      # 定义按键2引脚
         self.key1_pin = Pin(self.KEY1_PIN, Pin.IN)    # 将按键1对应引脚设置为输入模式
         self.key2_pin = Pin(self.KEY2_PIN, Pin.IN)    # 将按键2对应引脚设置为输入模式
+
+        # 中断方式的按键事件，见enable_irq()
+        self.debounce_ms = debounce_ms                # 消抖时间，两次状态变化间隔小于它时视为抖动
+        self.long_ms = long_ms                        # 长按时间
+        self.state = bytearray(2)                     # 消抖后的按键状态，1-按下
+        self.edge_ms = [0, 0]                         # 最近一次状态变化的时间
+        self.long_sent = bytearray(2)                 # 本次按下是否已经产生过长按事件
+        self.depth = depth                            # 事件队列深度
+        self.ev_kind = bytearray(depth)               # 事件队列：事件类型
+        self.ev_key = bytearray(depth)                # 事件队列：按键号1或2
+        self.ev_head = 0                              # 下一个要取出的事件
+        self.ev_count = 0                             # 队列中的事件数
+        self.ev_dropped = 0                           # 队列满时丢弃的事件数
+        self.handler = None                           # 事件处理函数handler(事件类型, 按键号)
+        self._dispatch_cb = self._dispatch            # 预先绑定，供micropython.schedule使用
+        self._scheduled = False                       # 已安排了一次分发，还没有执行
      
     # 读取KEY1的值，按键按下为低电平
     def key1(self):
@@ -16,31 +38,119 @@ class Mars_KEY(object):
     # 读取KEY2的值，按键按下为低电平
     def key2(self):
         return self.key2_pin.value()                  # 读取KEY2的值
-    
-# 循环检测按键引脚， key1控制led灯的亮灭，key2控制蜂鸣器的响灭
+
+    # 开启引脚中断。之后按键的按下/松开/长按放入事件队列，用get_event()取出；
+    # 传入handler时，事件通过micropython.schedule交给handler(事件类型, 按键号)处理；
+    # 有键按住时分发函数会不断重新安排自己，检查长按和消抖时丢掉的松开(不占用硬件定时器)
+    def enable_irq(self, handler=None):
+        self.handler = handler
+        for pin in (self.key1_pin, self.key2_pin):
+            pin.irq(handler=self._irq, trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING)
+
+    # 关闭引脚中断
+    def disable_irq(self):
+        self.key1_pin.irq(handler=None)
+        self.key2_pin.irq(handler=None)
+        self.handler = None
+
+    # 引脚中断：根据时间戳消抖，状态确实变化时产生事件
+    def _irq(self, pin):
+        t = time.ticks_ms()
+        k = 0 if pin is self.key1_pin else 1
+        down = 1 - pin.value()                        # 低电平为按下
+        if down == self.state[k]:                     # 抖动后回到原状态
+            return
+        if time.ticks_diff(t, self.edge_ms[k]) < self.debounce_ms:
+            return                                    # 距上次变化太近，视为抖动
+        if not down and not self.long_sent[k] and time.ticks_diff(t, self.edge_ms[k]) >= self.long_ms:
+            self.long_sent[k] = 1
+            self._push(KEY_LONG, k)                   # 没有被轮询到的长按，在松开时补发
+        self.state[k] = down
+        self.edge_ms[k] = t
+        self.long_sent[k] = 0
+        self._push(KEY_PRESS if down else KEY_RELEASE, k)
+
+    # 放入事件队列，有handler时安排一次分发
+    def _push(self, kind, k):
+        if self.ev_count >= self.depth:
+            self.ev_dropped += 1
+            return
+        i = (self.ev_head + self.ev_count) % self.depth
+        self.ev_kind[i] = kind
+        self.ev_key[i] = k + 1
+        self.ev_count += 1
+        if self.handler is not None:
+            self._schedule()
+
+    # 安排一次分发，已经安排过时不重复
+    def _schedule(self):
+        if self._scheduled:
+            return
+        try:
+            micropython.schedule(self._dispatch_cb, 0)
+            self._scheduled = True
+        except RuntimeError:                          # 调度队列已满，事件留在队列中，下次再分发
+            pass
+
+    # 检查长按，以及消抖时被忽略掉的松开
+    def _check(self):
+        t = time.ticks_ms()
+        pins = (self.key1_pin, self.key2_pin)
+        for k in range(2):
+            if not self.state[k]:
+                continue
+            held = time.ticks_diff(t, self.edge_ms[k])
+            if pins[k].value() and held >= self.debounce_ms:
+                self.state[k] = 0
+                self.edge_ms[k] = t
+                self._push(KEY_RELEASE, k)
+            elif not self.long_sent[k] and held >= self.long_ms:
+                self.long_sent[k] = 1
+                self._push(KEY_LONG, k)
+
+    # 取出一个按键事件，返回(事件类型, 按键号)，没有事件时返回(0, 0)，不会阻塞
+    def get_event(self):
+        self._check()
+        if not self.ev_count:
+            return 0, 0
+        i = self.ev_head
+        self.ev_head = (i + 1) % self.depth
+        self.ev_count -= 1
+        return self.ev_kind[i], self.ev_key[i]
+
+    # 由micropython.schedule调用，把队列中的事件交给handler；有键按住时继续轮询
+    def _dispatch(self, _):
+        self._scheduled = False
+        handler = self.handler
+        if handler is None:
+            return
+        self._check()
+        while self.ev_count:
+            kind, k = self.get_event()
+            handler(kind, k)
+        if self.state[0] or self.state[1]:
+            self._schedule()
+
+# 循环检测按键事件， key1和key2按住时led灯亮，松开时灯灭，长按时打印提示
 def loop_key():
     global key,led
-    if key.key1() == 0:                          # 检测按键1是否为低电平
-        time.sleep(0.02)                          # 消除抖动
-        if key.key1() == 0:                      # 当key1按下时
-            led.nled_on()                    # led灯亮
-            while key.key1() == 0:               # 按住按键1时灯亮
-                pass
-            led.nled_off()                   # 按键1松开时led灯灭
-    if key.key2() == 0:                          # 检测按键1是否为低电平
-        time.sleep(0.02)                          # 消除抖动
-        if key.key2() == 0:                      # 当key1按下时
-            led.nled_on()                    # led灯亮
-            while key.key2() == 0:               # 按住按键1时灯亮
-                pass
-            led.nled_off()                   # 按键1松开时led灯灭
+    kind, k = key.get_event()                    # 取出一个按键事件，没有事件时立即返回
+    if kind == KEY_PRESS:                        # 按键按下
+        led.nled_on()                            # led灯亮
+    elif kind == KEY_RELEASE:                    # 按键松开
+        led.nled_off()                           # led灯灭
+    elif kind == KEY_LONG:                       # 长按
+        print('KEY%d long press' % k)
 
 # 程序入口
 if __name__ == '__main__':
     key = Mars_KEY()                           # 实例化按键对象
     led = Mars_LED()                           # 实例化一个led灯对象
+    key.enable_irq()                           # 按键由中断检测，事件放入队列
     try:                                              # 异常处理
         while 1:                                      # 无限循环
             loop_key()                            # 循环检测按键        
+            time.sleep_ms(10)                     # 按键事件由中断记录，这里只处理队列
     except:
+        key.disable_irq()
         led.nled_off()                            # 程序异常时led灯灭
@@ -1,5 +1,6 @@
 from machine import Pin
 import time
+from iCenterCar.z_pattern import Mars_Pattern, BLINK_SLOW
 
 class Mars_LED(object):
     def __init__(self, PIN_nled=2, nled_val=-1, nled_period=500*(10**6)):
@@ -9,7 +10,9 @@ class Mars_LED(object):
         self.nled_val = nled_val                    # 通过该值来控制灯亮灭
         self.nled_systick_ms_bak = 0                # led灯时间控制，每隔一段时间亮一次
         self.nled_period = nled_period              # led亮灭的周期，每隔一段时间亮一次
+        self.nled_period_ms = nled_period // 1000000    # 同一周期，单位毫秒，loop_nled用小整数比较
         self.nled_pin = Pin(self.PIN_nled, Pin.OUT) # led灯连接引脚2，并设置为输出模式
+        self.pattern = None                         # 后台闪烁图案，第一次调用nled_pattern时创建
 
     # led灯亮
     def nled_on(self):
@@ -28,11 +31,23 @@ class Mars_LED(object):
 
     # led灯循环函数
     def loop_nled(self):
-        if time.time_ns() - self.nled_systick_ms_bak > self.nled_period:  	# 每隔nled_period时间执行一次
-            self.nled_systick_ms_bak = time.time_ns()                     	# 将当前时间赋值给nled_systick_ms_bak
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.nled_systick_ms_bak) > self.nled_period_ms:  	# 每隔nled_period时间执行一次
+            self.nled_systick_ms_bak = now                                   	# 将当前时间赋值给nled_systick_ms_bak
             self.nled_flip(self.nled_val)           						# 执行led
             self.nled_val = -self.nled_val          						# 反转，即灯亮一次灭一次
 
+    # 后台播放闪烁图案，立即返回，repeat=0代表一直闪烁；图案格式见z_pattern.py
+    def nled_pattern(self, pattern=BLINK_SLOW, repeat=0, timer_id=0):
+        if self.pattern is None:
+            self.pattern = Mars_Pattern(self.nled_pin, timer_id)
+        return self.pattern.play(pattern, repeat)
+
+    # 停止后台闪烁，灯灭
+    def nled_pattern_stop(self):
+        if self.pattern is not None:
+            self.pattern.stop()
+
 # 程序入口
 if __name__ == '__main__':
     nled = Mars_LED()                                 # 实例化一个nled对象
@@ -28,12 +28,19 @@
 import re							#正则表达式模块，用于字符串匹配和处理
 import time
 import _thread
+import uasyncio as asyncio
 # 从`factory`包中导入各种自定义模块，分别用于控制LED、蜂鸣器、按键、ADC、串口、文件、舵机、运动学和PS2手柄
 from iCenterCar.z_led import Mars_LED
 from iCenterCar.z_beep import Mars_BEEP
 from iCenterCar.z_key import Mars_KEY
 from iCenterCar.z_uart import Mars_UART
+from iCenterCar.z_servo import Mars_ServoFrame
+from iCenterCar.z_traj import Mars_ArmPlanner
+from iCenterCar.z_query import Mars_ServoQuery
 from iCenterCar.z_ps2 import Mars_PS2
+from iCenterCar.z_joy import Mars_JoyMapper
+from iCenterCar.z_mem import Mars_MemProbe
+import iCenterCar.z_prof as z_prof
 
 
 #二、全局变量定义
@@ -101,6 +108,35 @@ voice_flag = 0					    #语音控制开关标记  1-开启；0-关闭
 car_move_tag=0					    #底盘运动控制标记，1-说明运动要变化，0-说明运动不变化
 arm_move_tag=0					    #机械臂运动控制标记，1-说明运动要变化，0-说明运动不变化
 
+#2.6 预分配的指令帧，控制函数只改写其中的数字
+car_motor_frame = Mars_ServoFrame((1,2,3,4),hold=0)
+car_servo_frame = Mars_ServoFrame((11,12,13,14))
+car_frame = Mars_ServoFrame((1,2,3,4,11,12,13,14),hold=(0,0,0,0,1,1,1,1))
+arm_frame = Mars_ServoFrame((21,22,23,24))
+arm_one_frame = Mars_ServoFrame((21,))
+
+#2.7 任务间通信：串口和手柄任务只负责把动作放进队列，由运动任务依次执行
+motion_queue = []                       #运动指令队列，元素为(函数, 参数, 执行后保持的毫秒数)
+motion_event = asyncio.Event()          #队列中有新指令时置位，唤醒运动任务
+motion_abort = asyncio.Event()          #新指令要求打断当前动作时置位，提前结束保持时间
+
+#2.8 任务周期
+uart_poll_ms = 2                        #串口接收任务的轮询周期，单位ms
+ps2_poll_ms = 5                         #手柄读取任务的轮询周期，单位ms
+
+#2.9 内存遥测：为True时各任务每轮调用mem.mark()，串口输出@MEM采样，用monitor.py查看
+mem_telemetry = False
+mem = None
+
+#2.11 摇杆驾驶：为True时左摇杆控制车速、右摇杆控制转向，由 Mars_JoyMapper 查表并限制总线发送频率
+#     默认关闭：打开后摇杆与语音/串口指令同时驱动底盘(共用 z_servo 的指令缓存)，只在手柄为红灯模拟模式时生效
+joy_drive = False
+joy = None
+
+#2.10 耗时统计：用 upload.py --profile 部署后开启，monitor.py 的 prof 命令查看
+prof_functions = ('loop_uart','loop_ps2','uart_data_handle',
+                  'car_servos_init','car_run','car_turn','car_run_and_turn','car_stop',
+                  'arm_servos_init','arm_move_1','arm_move_4','arm_stop')
 
 #三、函数定义
 #3.1 定义时间函数
@@ -118,65 +154,98 @@ def loop_nled():
 #3.4 定义小车运动函数
 #3.4.1 定义底盘舵机初始化函数，即再一次对中位值进行校准
 def car_servos_init():
-    Srt = '#011P{0:0>4d}T{4:0>4d}!#012P{1:0>4d}T{4:0>4d}!#013P{2:0>4d}T{4:0>4d}!#014P{3:0>4d}T{4:0>4d}!'.format(car_servo_fl_init,car_servo_fr_init,car_servo_bl_init,car_servo_br_init,1000)
-    print(Srt)
+    f = car_servo_frame
+    f.set(0,car_servo_fl_init,1000)
+    f.set(1,car_servo_fr_init,1000)
+    f.set(2,car_servo_bl_init,1000)
+    f.set(3,car_servo_br_init,1000)
+    f.send(uart)
     print("Car servos are tunning")
-    uart.uart_send_str(Srt)
 #3.4.2 小车直行运动函数
 def car_run(run_speed,run_time):
-    Srt = '#001P{0:0>4d}T{4:0>4d}!#002P{1:0>4d}T{4:0>4d}!#003P{2:0>4d}T{4:0>4d}!#004P{3:0>4d}T{4:0>4d}!'.format(1500-run_speed,1500+run_speed,1500-run_speed,1500+run_speed,run_time)
-    print(Srt)
+    f = car_motor_frame
+    f.set(0,1500-run_speed,run_time)
+    f.set(1,1500+run_speed,run_time)
+    f.set(2,1500-run_speed,run_time)
+    f.set(3,1500+run_speed,run_time)
+    f.send_changed(uart)
     print("Car is running")
-    uart.uart_send_str(Srt)
         
 #3.4.3 定义小车转弯运动
 def car_turn(turn_angle,turn_time):
-    Srt='#011P{0:0>4d}T{4:0>4d}!#012P{1:0>4d}T{4:0>4d}!#013P{2:0>4d}T{4:0>4d}!#014P{3:0>4d}T{4:0>4d}!'.format(1500-turn_angle,1500-turn_angle,1500+turn_angle,1500+turn_angle,turn_time)
-    print(Srt)
+    f = car_servo_frame
+    f.set(0,1500-turn_angle,turn_time)
+    f.set(1,1500-turn_angle,turn_time)
+    f.set(2,1500+turn_angle,turn_time)
+    f.set(3,1500+turn_angle,turn_time)
+    f.send_changed(uart)
     print("Car is turning")
-    uart.uart_send_str(Srt)
         
 #3.4.4 小车运动+转向
 def car_run_and_turn(run_speed,turn_angle,run_time):
-    Srt='#001P{0:0>4d}T{8:0>4d}!#002P{1:0>4d}T{8:0>4d}!#003P{2:0>4d}T{8:0>4d}!#004P{3:0>4d}T{8:0>4d}!#011P{4:0>4d}T{8:0>4d}!#012P{5:0>4d}T{8:0>4d}!#013P{6:0>4d}T{8:0>4d}!#014P{7:0>4d}T{8:0>4d}!'.format(1500-run_speed,1500+run_speed,1500-run_speed,1500+run_speed,1500-turn_angle,1500-turn_angle,1500+turn_angle,1500+turn_angle,run_time)
-    print(Srt)
+    f = car_frame
+    f.set(0,1500-run_speed,run_time)
+    f.set(1,1500+run_speed,run_time)
+    f.set(2,1500-run_speed,run_time)
+    f.set(3,1500+run_speed,run_time)
+    f.set(4,1500-turn_angle,run_time)
+    f.set(5,1500-turn_angle,run_time)
+    f.set(6,1500+turn_angle,run_time)
+    f.set(7,1500+turn_angle,run_time)
+    f.send_changed(uart)
     print("Car is running and turning")
-    uart.uart_send_str(Srt)
     
 #3.4.5小车停止函数 #停止车轮和转向
 def car_stop():
-    Srt = '#001P1500T1000!#002P1500T1000!#003P1500T1000!#004P1500T1000!#011P{0:0>4d}T1000!#012P{1:0>4d}T1000!#013P{2:0>4d}T1000!#014P{3:0>4d}T1000!'.format(car_servo_fl_init,car_servo_fr_init,car_servo_bl_init,car_servo_br_init)
-    print(Srt)
+    f = car_frame
+    f.set(0,1500,1000)
+    f.set(1,1500,1000)
+    f.set(2,1500,1000)
+    f.set(3,1500,1000)
+    f.set(4,car_servo_fl_init,1000)
+    f.set(5,car_servo_fr_init,1000)
+    f.set(6,car_servo_bl_init,1000)
+    f.set(7,car_servo_br_init,1000)
+    f.send_changed(uart)
     print("Car is stopping")
-    uart.uart_send_str(Srt)
 
 #3.5 定义机械臂运动函数
 #3.5.1 定义机械臂舵机初始化函数，即再一次对中
 def arm_servos_init():
-    Srt = '#021P{0:0>4d}T{4:0>4d}!#022P{1:0>4d}T{4:0>4d}!#023P{2:0>4d}T{4:0>4d}!#024P{3:0>4d}T{4:0>4d}!'.format(arm_servo_1_init,arm_servo_2_init,arm_servo_3_init,arm_servo_4_init,1000)
-    print(Srt)
+    f = arm_frame
+    f.set(0,arm_servo_1_init,1000)
+    f.set(1,arm_servo_2_init,1000)
+    f.set(2,arm_servo_3_init,1000)
+    f.set(3,arm_servo_4_init,1000)
+    f.send(uart)
     print("Arm servos are tunning")
-    uart.uart_send_str(Srt)
 #2. 定义机械臂运动——任何1个关节运动，需要传递arm_id,arm_ang,move_time
 def arm_move_1(arm_id,arm_ang,move_time):
-    armSrt='#{0:0>3d}P{1:0>4d}T{2:0>4d}!'.format(arm_id,arm_ang,move_time)
-    print(armSrt)
+    f = arm_one_frame
+    f.set_id(0,arm_id)
+    f.set(0,arm_ang,move_time)
+    f.send(uart)
     print(arm_id,"is running")
-    uart.uart_send_str(armSrt)    
 
 #3.5.2定义机械臂运动——4个关节的运动， 需要传递arm_ang1,arm_ang2,arm_ang3,arm_ang4,move_time
 def arm_move_4(arm_ang1,arm_ang2,arm_ang3,arm_ang4,move_time):
-    armSrt='#021P{0:0>4d}T{4:0>4d}!#022P{1:0>4d}T{4:0>4d}!#023P{2:0>4d}T{4:0>4d}!#024P{3:0>4d}T{4:0>4d}!'.format(arm_ang1,arm_ang2,arm_ang3,arm_ang4,move_time)
-    print(armSrt)
+    f = arm_frame
+    f.set(0,arm_ang1,move_time)
+    f.set(1,arm_ang2,move_time)
+    f.set(2,arm_ang3,move_time)
+    f.set(3,arm_ang4,move_time)
+    f.send(uart)
     print("Arm is running")
-    uart.uart_send_str(armSrt)
     
 #3.5.2定停止运动——4个关节的运动
 def arm_stop():
-    armSrt='#021P{0:0>4d}T{4:0>4d}!#022P{1:0>4d}T{4:0>4d}!#023P{2:0>4d}T{4:0>4d}!#024P{3:0>4d}T{4:0>4d}!'.format(arm_servo_1_init,arm_servo_2_init,arm_servo_3_init,arm_servo_4_init,1000)
-    print(armSrt)
+    f = arm_frame
+    f.set(0,arm_servo_1_init,1000)
+    f.set(1,arm_servo_2_init,1000)
+    f.set(2,arm_servo_3_init,1000)
+    f.set(3,arm_servo_4_init,1000)
+    f.send(uart)
     print("Arm is running")
-    uart.uart_send_str(armSrt)
 
 
 #3.6主函数启动 车子机械臂初始化运动
@@ -186,7 +255,7 @@ def car_arm_initial():
     car_servos_init()
     time.sleep(1)
     arm_servos_init()
-    time.sleep(1)
+    arm_query.wait_arrival((arm_servo_1_init,arm_servo_2_init,arm_servo_3_init,arm_servo_4_init),timeout_ms=1000)  #到位即继续，最多等1秒
     
     #直行前进运动测试
     car_run(int(car_run_speed/2),int(car_run_time/2)) #测试阶段速度 时间减半
@@ -221,53 +290,24 @@ def car_arm_initial():
     car_stop()
     time.sleep(1) 
     
-    arm_move_1(arm_servo_1,2000,1000)  #机械臂1号舵机运动
-    time.sleep(1)
-    
-    arm_move_1(arm_servo_1,1000,1000)  #机械臂1号舵机运动
-    time.sleep(1)
-    
-    arm_move_1(arm_servo_1,arm_servo_1_init,1000)  #机械臂1号舵机运动
-    time.sleep(1)
-
-    
-    #机械臂2号舵机先转到2000，再转到1000，最后回到初始位置
-    arm_move_1(arm_servo_2,2000,1000)  #机械臂1号舵机运动
-    time.sleep(1)
-    
-    arm_move_1(arm_servo_2,1000,1000)  #机械臂1号舵机运动
-    time.sleep(1)
-
-    arm_move_1(arm_servo_2,arm_servo_2_init,1000)  #机械臂1号舵机运动
-    time.sleep(1)
-       
-    #机械臂3号舵机先转到2000，再转到1000，最后回到初始位置
-    arm_move_1(arm_servo_3,2000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_3,1000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-
-    arm_move_1(arm_servo_3,arm_servo_3_init,1000)  #机械臂1号舵机运动
-    time.sleep(1)
-       
-    #机械臂4号舵机先转到2000，再转到1000，最后回到初始位置
-    arm_move_1(arm_servo_4,2000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-    
-    arm_move_1(arm_servo_4,1000,1000)  #机械臂1号舵机运动
-    time.sleep(2)
-
-    arm_move_1(arm_servo_4,arm_servo_4_init,1000)  #机械臂1号舵机运动
-    time.sleep(1)
-
+    #机械臂测试：由轨迹规划器按固定周期平滑插值发送，不再用 time.sleep 等待每个动作
+    #每个舵机先转到2000，再转到1000，最后回到初始位置，每个位置用时1秒
+    arm_init = (arm_servo_1_init,arm_servo_2_init,arm_servo_3_init,arm_servo_4_init)
+    waypoints = []
+    for j in range(4):
+        for pwm in (2000,1000,arm_init[j]):
+            pose = list(arm_init)
+            pose[j] = pwm
+            waypoints.append((pose,1000))
     #机械臂的4个舵机同时测试
-    #…………
+    waypoints.append(((1800,1800,1900,1900),1000))
+    waypoints.append((arm_init,1000))
+    Mars_ArmPlanner(arm_frame,uart,arm_init).run(waypoints)
     #初始化车子和机械臂，为开始工作做准备
     car_servos_init()
     time.sleep(1)
     arm_servos_init()
-    time.sleep(1)
+    arm_query.wait_arrival((arm_servo_1_init,arm_servo_2_init,arm_servo_3_init,arm_servo_4_init),timeout_ms=1000)  #到位即继续，最多等1秒
 
 
 #3.3处理串口接收的数据
@@ -283,11 +323,11 @@ def loop_uart():
     global uart
     uart.recv_str()                           # 串口接收并根据格式处理数据
 #     print(uart.uart_receive_str)
-   
-    #类似$111！
-    if uart.uart_get_ok == 4:
-#         print("uart.uart_get_ok=",uart.uart_get_ok)
-        uart_data_handle(uart.uart_receive_str)         # 处理接收的数据-语音控制
+    while uart.uart_get_ok:                   # 一次可能收到多帧，逐帧处理
+        #类似$111！
+        if uart.uart_get_ok == 4:
+#             print("uart.uart_get_ok=",uart.uart_get_ok)
+            uart_data_handle(uart.uart_receive_str)         # 处理接收的数据-语音控制
 #         uart.uart_receive_str = ''
 #         uart.uart_get_ok = 0
 #         #指令模式
@@ -300,8 +340,9 @@ def loop_uart():
 #         uart.uart_receive_str = ''
 #         uart.uart_get_ok = 0
 
-    uart.uart_receive_str = ''
-    uart.uart_get_ok = 0
+        uart.uart_receive_str = ''
+        uart.uart_get_ok = 0
+        uart.recv_frame()                     # 取下一帧
   
 
 def uart_data_handle(uart_data):
@@ -309,41 +350,33 @@ def uart_data_handle(uart_data):
     # 唤醒指令
     if '$WAKE!' in uart_data:
         print('$WAKE!')
-        car_stop()
-        time.sleep(1)
+        motion_post(((car_stop,(),1000),))
 #         voice_flag = 1
     # 停止指令
     elif '$TZ!' in uart_data:
         print('$TZ!')
-        car_stop()
-        time.sleep(1)
+        motion_post(((car_stop,(),1000),))
     # 前进指令
     elif '$QJ!' in uart_data:
         print('$QJ!')
-        car_run(car_run_speed,0)   #一直前进
-        time.sleep(1)
+        motion_post(((car_run,(car_run_speed,0),1000),))   #一直前进
 
     # 后退指令
     elif '$HT!' in uart_data:
         print('$HT!')
-        car_run(-car_run_speed,0)
-        time.sleep(1)
+        motion_post(((car_run,(-car_run_speed,0),1000),))
 
     # 左转指令
     elif '$ZZ!' in uart_data:
         print('$ZZ!')
-        car_stop()
-        time.sleep(1)
-        car_run_and_turn(car_turn_speed,car_turn_angle,0)
-        time.sleep(1)
+        motion_post(((car_stop,(),1000),
+                     (car_run_and_turn,(car_turn_speed,car_turn_angle,0),1000)))
 
     # 右转指令
     elif '$YZ!' in uart_data:
         print('$YZ!')
-        car_stop()
-        time.sleep(1)
-        car_run_and_turn(car_turn_speed,-car_turn_angle,0)
-        time.sleep(1)
+        motion_post(((car_stop,(),1000),
+                     (car_run_and_turn,(car_turn_speed,-car_turn_angle,0),1000)))
 
 #     elif '$ZPY!' in uart_data:
 #         print('$ZPY!')
@@ -358,8 +391,26 @@ def uart_data_handle(uart_data):
 #         uart.uart_send_str(Srt)
 #         time.sleep(1)
 
-######################同学们需要在 loop_ps2()函数中增加自己的按键功能##########################
+######################同学们需要增加自己的按键处理函数，并在 ps2_bind()中登记##########################
 #3.4 处理PS2手柄输入
+######################这里是 “START”按键的应用示范########################## 
+def ps2_start_pressed():
+    motion_post(((car_servos_init,(),1000),
+                 (arm_servos_init,(),1000)))
+    print("Start button pressed. ")
+
+######################请同学们自己补充各个按键功能 开始##########################
+
+
+
+
+######################请同学们自己补充各个按键功能 结束##########################
+
+# 按键和处理函数的对应表：ps2.on(按键名, 按下时调用的函数, 松开时调用的函数)
+def ps2_bind():
+    ps2.on('START', ps2_start_pressed)
+
+# 读取手柄，只对状态发生变化的按键调用处理函数；摇杆等模拟量在这里用 ps2.Analog() 读取
 def loop_ps2(): 
     global arm_move_tag,car_move_tag
     global arm_servo_1_pwm,arm_servo_2_pwm,arm_servo_3_pwm,arm_servo_4_pwm
@@ -367,31 +418,74 @@ def loop_ps2():
     
     if not ps2.read_gamepad():
         return
-    
-    ######################这里是 “START”按键的应用示范########################## 
-    if ps2.ButtonPressed('START'):
-        car_servos_init()
-        time.sleep(1)
-        arm_servos_init()
-        time.sleep(1)
-        print("Start button pressed. ")
-
-    ######################请同学们自己补充各个按键功能 开始##########################
-
-
-
+    ps2.dispatch()
+    if joy:
+        joy.update(ps2)                       # 摇杆没有明显变化时不发送
 
-    ######################请同学们自己补充各个按键功能 结束##########################
-        
-    #四、主函数定义
+#3.5 运动指令队列
+'''
+    - 串口和手柄的处理函数中不要再调用 time.sleep()，否则会阻塞所有任务
+    - 把一组动作用 motion_post() 放进队列，例如：
+      motion_post(((car_stop,(),1000), (car_run,(car_run_speed,0),1000)))
+    - preempt=True 时清空还没执行的动作并打断当前的保持时间，新指令立即生效
+'''
+def motion_post(steps, preempt=True):
+    if preempt:
+        del motion_queue[:]
+        motion_abort.set()
+    motion_queue.extend(steps)
+    motion_event.set()
+
+#3.6 协程任务
+# 串口接收任务
+async def task_uart():
+    while True:
+        loop_uart()
+        if mem:
+            mem.mark('uart')
+        await asyncio.sleep_ms(uart_poll_ms)
+
+# 手柄读取任务
+async def task_ps2():
+    while True:
+        loop_ps2()
+        if mem:
+            mem.mark('ps2')
+        await asyncio.sleep_ms(ps2_poll_ms)
+
+# 运动执行任务：依次执行队列中的动作，保持时间内让出CPU，被新指令打断时提前结束
+async def task_motion():
+    while True:
+        if not motion_queue:
+            motion_event.clear()
+            await motion_event.wait()
+            continue
+        func, args, hold_ms = motion_queue.pop(0)
+        motion_abort.clear()
+        func(*args)
+        if mem:
+            mem.mark('motion')
+        if hold_ms:
+            try:
+                await asyncio.wait_for_ms(motion_abort.wait(), hold_ms)
+            except asyncio.TimeoutError:
+                pass
+
+async def main_tasks():
+    asyncio.create_task(task_uart())
+    asyncio.create_task(task_ps2())
+    await task_motion()
+
+#四、主函数定义
 
 def z_main_test():
-    global nled,beep,key,ps2,uart
+    global nled,beep,key,ps2,uart,mem,arm_query,joy
     
     nled = Mars_LED()                                    # 实例化一个led灯对象
     beep = Mars_BEEP()                                   # 实例化一个蜂鸣器对象
     key = Mars_KEY()                                     # 实例化按键对象
     uart = Mars_UART()                                   # 实例化串口对象
+    arm_query = Mars_ServoQuery(uart,(21,22,23,24))      # 机械臂舵机位置回读
 
    #################################此处是手柄实例化及初始化 开始#################################### 
     ps2 = Mars_PS2()                                     # 实例化手柄对象
@@ -414,18 +508,31 @@ def z_main_test():
 
     car_arm_initial()
     
-    beep.beep_on_times(3,0.1)                          # 启动完成
+    beep.beep_times(3,0.1)                             # 启动完成，后台鸣叫不阻塞
+    nled.nled_pattern()                                # LED灯由定时器在后台闪烁
     
     print('main init ok')
     
     uart.uart_send_str('0,10,10\r\n')
-    #################################此处是主程序进入无线循环#################################### 
-    while 1:                                           # 无限循环
-        loop_nled()
-        loop_uart()
-        loop_ps2()                                     # 手柄数据读写
-        
-        time.sleep(0.1)
+    #################################此处是主程序进入协程调度#################################### 
+    if mem_telemetry:
+        mem = Mars_MemProbe()                          # 内存遥测
+    if joy_drive:
+        joy = Mars_JoyMapper(uart,car_frame,(1500,1500,1500,1500),
+                             (car_servo_fl_init,car_servo_fr_init,car_servo_bl_init,car_servo_br_init))
+    if z_prof.enabled:                                 # 耗时统计：替换为计时的包装函数
+        g = globals()
+        for name in prof_functions:
+            g[name] = z_prof.wrap(g[name], name)
+        z_prof.wrap_attrs(ps2, ('read_gamepad',), 'ps2.')
+        z_prof.wrap_attrs(uart, ('recv_str',), 'uart.')
+        Mars_ServoFrame.send = z_prof.wrap(Mars_ServoFrame.send, 'frame.send')
+    ps2_bind()                                         # 登记手柄按键处理函数
+    ps2.clear_events()                                 # 丢弃初始化过程中的按键事件
+    try:
+        asyncio.run(main_tasks())                      # 串口、手柄、运动三个任务并发运行
+    finally:
+        asyncio.new_event_loop()                       # 清除调度器状态，便于在REPL中再次运行
 
 # 程序入口
 if __name__ == '__main__':
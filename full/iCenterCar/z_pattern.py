@@ -0,0 +1,101 @@
+'''
+LED灯/蜂鸣器的闪烁和鸣叫图案
+图案是一个毫秒数元组，按 亮(响)、灭(停)、亮、灭…… 的顺序交替，例如：
+  (100, 100)            亮100ms 灭100ms
+  (50, 100, 50, 800)    心跳：两次短亮后长灭
+调用者把(图案, 次数)放进队列后立即返回，由硬件定时器的单次回调逐段切换引脚电平，
+每一段只触发一次回调，主循环不需要查询时间，也不需要延时等待。
+ESP32 有4个硬件定时器(0~3)，默认 LED 用0号，蜂鸣器用1号。
+'''
+
+from machine import Timer
+
+# 常用图案
+BLINK_SLOW = (500, 500)                 # 慢闪
+BLINK_FAST = (100, 100)                 # 快闪
+HEARTBEAT = (50, 100, 50, 800)          # 心跳
+BEEP_SHORT = (100, 100)                 # 短鸣
+BEEP_LONG = (500, 200)                  # 长鸣
+
+
+class Mars_Pattern(object):
+    def __init__(self, pin, timer_id=0, depth=8, active=1):
+        self.pin = pin                          # 输出引脚，任何带 value() 方法的对象
+        self.active = active                    # 点亮(鸣叫)时的电平
+        self.timer = Timer(timer_id)            # 硬件定时器
+        self.depth = depth                      # 队列深度
+        self.queue = [None] * depth             # 等待播放的(图案, 次数)，环形队列
+        self.head = 0                           # 下一个要播放的位置
+        self.count = 0                          # 队列中的图案数
+        self.pattern = None                     # 正在播放的图案
+        self.repeat = 0                         # 剩余次数，0代表一直重复
+        self.index = 0                          # 图案中的下一段
+        self._step_cb = self._step              # 预先绑定回调，避免每次创建绑定方法
+
+    # 把图案放进队列，repeat为播放次数，0代表一直重复(直到有新图案排队或调用stop)
+    # 队列满时返回False
+    def play(self, pattern, repeat=1):
+        if self.count >= self.depth:
+            return False
+        self.queue[(self.head + self.count) % self.depth] = (pattern, repeat)
+        self.count += 1
+        if self.pattern is None:
+            self._next()
+        return True
+
+    # 清空队列，停止播放并关闭输出
+    def stop(self):
+        self.timer.deinit()
+        self.count = 0
+        self.pattern = None
+        self.pin.value(1 - self.active)
+
+    # 是否正在播放
+    def busy(self):
+        return self.pattern is not None
+
+    # 取出下一个图案开始播放，队列为空时关闭输出
+    def _next(self):
+        if not self.count:
+            self.pattern = None
+            self.pin.value(1 - self.active)
+            return
+        self.pattern, self.repeat = self.queue[self.head]
+        self.queue[self.head] = None
+        self.head = (self.head + 1) % self.depth
+        self.count -= 1
+        self.index = 0
+        self._step(None)
+
+    # 定时器回调：输出当前段的电平，并在这一段结束时再次回调
+    def _step(self, timer):
+        pattern = self.pattern
+        if pattern is None:
+            return
+        if self.index >= len(pattern):                  # 一遍播放完
+            self.index = 0
+            if self.repeat == 1 or (self.repeat == 0 and self.count):
+                self._next()                            # 播放完毕，或一直重复的图案让给排队的图案
+                return
+            if self.repeat > 1:
+                self.repeat -= 1
+        i = self.index
+        self.pin.value(self.active if i % 2 == 0 else 1 - self.active)
+        self.index = i + 1
+        self.timer.init(mode=Timer.ONE_SHOT, period=pattern[i], callback=self._step_cb)
+
+
+# 程序入口
+if __name__ == '__main__':
+    import time
+    from machine import Pin
+    led = Mars_Pattern(Pin(2, Pin.OUT), timer_id=0)
+    beep = Mars_Pattern(Pin(5, Pin.OUT), timer_id=1)
+    beep.play(BEEP_SHORT, 3)                            # 响3声，立即返回
+    beep.play(BEEP_LONG, 1)                             # 接着长鸣一声
+    led.play(HEARTBEAT, 0)                              # LED一直心跳
+    for i in range(5):
+        print('main loop is free', i)
+        time.sleep(1)
+    led.stop()
+    beep.stop()
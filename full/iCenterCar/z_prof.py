@@ -0,0 +1,131 @@
+'''
+函数耗时统计(性能分析)
+把要统计的函数用 wrap() 包一层，或在循环的某个阶段前后调用 begin()/end()，
+每次调用用 ticks_us 计时，累加到固定大小的表中：调用次数、总耗时、最长耗时。
+dump() 按行输出整张表，主机端 monitor.py 的 prof 命令会调用它并排序显示：
+  @PROF name=名称 n=次数 total=总耗时us max=最长耗时us
+  @PROFEND entries=表项数 enabled=是否开启
+
+是否开启在部署时决定：upload.py --profile 会在设备上创建 /prof.enable，
+没有这个文件时 wrap() 直接返回原函数，begin()/end() 什么也不做，不影响运行速度。
+标准 ESP32 固件没有打开 sys.settrace，所以这里用包装函数计时。
+'''
+
+import os
+import time
+
+FLAG_FILE = '/prof.enable'                  # 存在时开启统计
+MAX_ENTRIES = 32                            # 表的大小
+
+
+def _flag():
+    try:
+        os.stat(FLAG_FILE)
+        return True
+    except OSError:
+        return False
+
+
+enabled = _flag()
+names = []                                  # 表项名称
+count = []                                  # 调用次数
+total = []                                  # 总耗时 us
+peak = []                                   # 最长耗时 us
+
+
+# 返回 name 的表项序号，没有时新建；表满时返回 -1
+def slot(name):
+    for i in range(len(names)):
+        if names[i] == name:
+            return i
+    if len(names) >= MAX_ENTRIES:
+        print('z_prof: table full, %s not profiled' % name)
+        return -1
+    names.append(name)
+    count.append(0)
+    total.append(0)
+    peak.append(0)
+    return len(names) - 1
+
+
+# 把一次耗时记入第 i 项
+def add(i, us):
+    if i < 0:
+        return
+    count[i] += 1
+    total[i] += us
+    if us > peak[i]:
+        peak[i] = us
+
+
+# 返回计时的包装函数；未开启时返回原函数。也可以当作装饰器使用：@z_prof.wrap
+def wrap(func, name=None):
+    if not enabled:
+        return func
+    i = slot(name or func.__name__)
+    if i < 0:
+        return func
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+
+    def wrapper(*args, **kwargs):
+        t = ticks_us()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            add(i, ticks_diff(ticks_us(), t))
+    return wrapper
+
+
+# 把 obj(模块或对象)的若干属性替换为计时的包装函数，表项名称为 prefix + 属性名
+def wrap_attrs(obj, attrs, prefix=''):
+    if not enabled:
+        return
+    for attr in attrs:
+        setattr(obj, attr, wrap(getattr(obj, attr), prefix + attr))
+
+
+# 循环阶段计时：i = slot('阶段名') 只需调用一次，然后 t = begin() ... end(i, t)
+def begin():
+    return time.ticks_us() if enabled else 0
+
+
+def end(i, t):
+    if enabled:
+        add(i, time.ticks_diff(time.ticks_us(), t))
+
+
+# 输出整张表
+def dump():
+    for i in range(len(names)):
+        print('@PROF name=%s n=%d total=%d max=%d' % (names[i], count[i], total[i], peak[i]))
+    print('@PROFEND entries=%d enabled=%d' % (len(names), enabled))
+
+
+# 清零统计，保留表项
+def reset():
+    for i in range(len(names)):
+        count[i] = 0
+        total[i] = 0
+        peak[i] = 0
+
+
+# 程序入口：强制开启，统计两个函数和一个循环阶段
+if __name__ == '__main__':
+    enabled = True
+
+    @wrap
+    def short_job():
+        time.sleep_us(200)
+
+    def long_job(n):
+        time.sleep_ms(n)
+    long_job = wrap(long_job, 'long_job')
+
+    loop = slot('loop')
+    for k in range(20):
+        t = begin()
+        short_job()
+        long_job(k % 3)
+        end(loop, t)
+    dump()
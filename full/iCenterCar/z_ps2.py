@@ -6,12 +6,60 @@
 # 修复：2025年6月23日 - 添加退出机制
 # 修复：2025年6月24日 - 更新全部代码
 # '''
-from machine import Pin
 import time
+try:
+    from machine import Pin, SPI, SoftSPI
+    from time import ticks_ms, ticks_us, ticks_diff, sleep_ms, sleep_us
+except ImportError:                      # CPython 下没有 machine 模块，只用于运行文件末尾的协议自检
+    Pin = SPI = SoftSPI = None
+
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_us():
+        return int(time.monotonic() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+    def sleep_us(us):
+        pass
 
 # 常量定义
 READ_DELAY_MS = 10  
 SHORT_DELAY_US = 5
+SPI_BAUDRATE = 250000                    # SPI 时钟频率，手柄一般不超过 500kHz
+EVENT_DEPTH = 16                         # 按键事件队列深度
+EV_PRESSED = 1                           # 事件类型：按下
+EV_RELEASED = 2                          # 事件类型：松开
+
+# 手柄命令
+_CMD_POLL = b'\x01\x42' + bytes(19)      # 读取按键和摇杆，第4、5字节为振动参数
+_CMD_ENTER_CONFIG = b'\x01\x43\x00\x01\x00'
+_CMD_EXIT_CONFIG = b'\x01\x43\x00\x00\x5a\x5a\x5a\x5a\x5a'
+_CMD_TYPE_READ = b'\x01\x45\x00\x5a\x5a\x5a\x5a\x5a\x5a'
+_CMD_SET_MODE = b'\x01\x44\x00\x01\x03\x00\x00\x00\x00'
+_CMD_ENABLE_RUMBLE = b'\x01\x4d\x00\x00\x01'
+_CMD_ENABLE_PRESSURES = b'\x01\x4f\x00\xff\xff\x03\x00\x00\x00'
+
+# 位序反转表，SoftSPI 只能高位先发，而手柄协议是低位先发
+_REV = bytearray(256)
+for _i in range(256):
+    for _b in range(8):
+        if _i >> _b & 1:
+            _REV[_i] |= 0x80 >> _b
+
+
+def _pin(p, out):
+    """p 为引脚号时创建 Pin 对象，已经是引脚对象时直接使用。"""
+    if hasattr(p, 'value'):
+        return p
+    if out:
+        return Pin(p, Pin.OUT)
+    return Pin(p, Pin.IN, Pin.PULL_UP)
 
 # 定义按钮常量
 BUTTONS = {
@@ -33,118 +81,308 @@ CMD 用于命令输出，SEL 用于选择信号，CLK 用于发送时钟信号
 """
 
 class Mars_PS2:
-    def __init__(self, dat_pin=19, cmd_pin=18, sel_pin=15, clk_pin=23):
+    def __init__(self, dat_pin=19, cmd_pin=18, sel_pin=15, clk_pin=23, spi=None, delay_us=SHORT_DELAY_US):
+        """spi=None 时用引脚模拟时序；spi='hw' 使用硬件SPI(LSB先发)；spi='soft' 使用SoftSPI(只支持MSB，查表反转位序)；
+        也可以直接传入已配置好的 SPI 对象(模式3)，它只能高位先发时把 spi_lsb 设为 False。
+        引脚参数可以是引脚号，也可以是带 value() 方法的引脚对象(便于在CPython下用假引脚测试)。
+        使用SPI时DAT线需要有上拉电阻。
+        """
         # 初始化引脚
-        self.PS2_DAT = Pin(dat_pin, Pin.IN, Pin.PULL_UP)  # 数据输入引脚
-        self.PS2_CMD = Pin(cmd_pin, Pin.OUT)              # 命令输出引脚
-        self.PS2_SEL = Pin(sel_pin, Pin.OUT)              # 选择信号引脚
-        self.PS2_CLK = Pin(clk_pin, Pin.OUT)              # 时钟信号引脚
-        
+        self.PS2_DAT = _pin(dat_pin, False)      # 数据输入引脚(上拉)
+        self.PS2_CMD = _pin(cmd_pin, True)       # 命令输出引脚
+        self.PS2_SEL = _pin(sel_pin, True)       # 选择信号引脚
+        self.PS2_CLK = _pin(clk_pin, True)       # 时钟信号引脚
+        self.delay_us = delay_us                  # 引脚模拟时每半个时钟周期的等待时间
+
+        # 预先绑定引脚方法，位循环中不再查找属性
+        self._dat = self.PS2_DAT.value
+        self._cmd = self.PS2_CMD.value
+        self._sel = self.PS2_SEL.value
+        self._clk = self.PS2_CLK.value
+
+        # SPI 传输
+        self.spi_lsb = True
+        if spi == 'hw':
+            spi = SPI(1, baudrate=SPI_BAUDRATE, polarity=1, phase=1, firstbit=SPI.LSB,
+                      sck=self.PS2_CLK, mosi=self.PS2_CMD, miso=self.PS2_DAT)
+        elif spi == 'soft':
+            spi = SoftSPI(baudrate=SPI_BAUDRATE, polarity=1, phase=1,
+                          sck=self.PS2_CLK, mosi=self.PS2_CMD, miso=self.PS2_DAT)
+            self.spi_lsb = False
+        self.spi = spi
+
+        # 预分配的收发缓冲区，读取过程中不再创建列表
+        self.PS2data = bytearray(21)              # 接收缓冲
+        self._tx = bytearray(21)                  # 发送缓冲
+        self._txr = bytearray(21)                 # SoftSPI 位序反转用
+        # 预先切好的(发送, 接收, 反转)切片，读取时直接使用，不再分配内存
+        tx, rx, txr = memoryview(self._tx), memoryview(self.PS2data), memoryview(self._txr)
+        self._v5 = (tx[0:5], rx[0:5], txr[0:5])      # 5字节配置命令
+        self._v9 = (tx[0:9], rx[0:9], txr[0:9])      # 读取命令的前9字节，9字节配置命令
+        self._v12 = (tx[9:21], rx[9:21], txr[9:21])  # 压力模式下读取的后12字节
+
         # 初始化内部状态变量
-        self.PS2data = [0] * 21
-        self.last_buttons = 0
-        self.buttons = 0
+        self.last_buttons = 0xFFFF               # 按键为低电平有效，0xFFFF 表示全部松开
+        self.buttons = 0xFFFF
         self.last_read = 0
         self.read_delay = 1
         self.controller_type = 0
         self.en_Rumble = False
         self.en_Pressures = False
-    
+
+        # 按键边沿，每次读取时计算一次，位为1表示对应按键
+        self.pressed = 0                          # 本次刚按下的按键
+        self.released = 0                         # 本次刚松开的按键
+        self.held = 0                             # 当前按住的按键
+
+        # 按键事件队列(环形，预分配)和分发表
+        self.ev_kind = bytearray(EVENT_DEPTH)     # 事件类型 EV_PRESSED / EV_RELEASED
+        self.ev_bit = bytearray(EVENT_DEPTH)      # 按键位序号 0~15
+        self.ev_head = 0                          # 下一个要取出的事件
+        self.ev_count = 0                         # 队列中的事件数
+        self.ev_dropped = 0                       # 队列满时丢弃的事件数
+        self.on_pressed = [None] * 16             # 位序号 -> 按下处理函数
+        self.on_released = [None] * 16            # 位序号 -> 松开处理函数
+
+        # 读取耗时统计
+        self.read_count = 0                       # 读取次数
+        self.read_us = 0                          # 最近一次读取耗时
+        self.read_us_max = 0                      # 最大读取耗时
+        self.read_us_total = 0                    # 读取耗时总和
+        self.stats_start = ticks_ms()             # 统计开始时间
+
+    def _view(self, start, n):
+        """返回收发缓冲区[start, start+n)的切片；读取和配置用到的几段是预先切好的。"""
+        if start == 0 and n == 9:
+            return self._v9
+        if start == 9 and n == 12:
+            return self._v12
+        if start == 0 and n == 5:
+            return self._v5
+        return (memoryview(self._tx)[start:start + n], memoryview(self.PS2data)[start:start + n],
+                memoryview(self._txr)[start:start + n])
+
+    def _shift_bitbang(self, start, n):
+        """用引脚模拟时序交换 _tx[start:start+n]，结果写入 PS2data。低位先发。"""
+        tx = self._tx
+        rx = self.PS2data
+        cmd = self._cmd
+        clk = self._clk
+        dat = self._dat
+        d = self.delay_us
+        for k in range(start, start + n):
+            byte = tx[k]
+            tmp = 0
+            for i in range(8):
+                cmd(byte >> i & 1)                # 设置命令引脚的状态
+                clk(0)                            # 拉低时钟信号开始传输
+                if d:
+                    sleep_us(d)
+                if dat():                         # 读取数据引脚的当前值并记录
+                    tmp |= 1 << i
+                clk(1)                            # 拉高时钟信号结束当前位的传输
+                if d:
+                    sleep_us(d)
+            cmd(1)                                # 释放命令引脚
+            if d:
+                sleep_us(d)
+            rx[k] = tmp
+
+    def _shift_spi(self, start, n):
+        """用SPI交换 _tx[start:start+n]，结果写入 PS2data。"""
+        tx, rx, txr = self._view(start, n)
+        if self.spi_lsb:
+            self.spi.write_readinto(tx, rx)
+            return
+        # 只支持高位先发的SPI：发送前和接收后各查表反转一次位序
+        for k in range(n):
+            txr[k] = _REV[tx[k]]
+        self.spi.write_readinto(txr, rx)
+        for k in range(n):
+            rx[k] = _REV[rx[k]]
+
+    def _shift(self, start, n):
+        if self.spi is None:
+            self._shift_bitbang(start, n)
+        else:
+            self._shift_spi(start, n)
+
+    def _idle(self):
+        """空闲电平：CMD和CLK为高(SPI模式下由SPI控制)。"""
+        if self.spi is None:
+            self._cmd(1)
+            self._clk(1)
+
     def _gamepad_shiftinout(self, byte):
-        """发送和接收一个字节的数据，与手柄通信。
-        
-        通过时钟引脚逐位发送和接收数据。
-        """
-        tmp = 0
-        for i in range(8):
-            self.PS2_CMD.value(byte & (1 << i))  # 设置命令引脚的状态
-            self.PS2_CLK.value(0)                # 拉低时钟信号开始传输
-            time.sleep_us(SHORT_DELAY_US)        # 短暂等待
-            
-            # 读取数据引脚的当前值并记录
-            if self.PS2_DAT.value():
-                tmp |= (1 << i)
-            
-            self.PS2_CLK.value(1)                # 拉高时钟信号结束当前位的传输
-            time.sleep_us(SHORT_DELAY_US)        # 短暂等待
-        self.PS2_CMD.value(1)                    # 释放命令引脚
-        time.sleep_us(SHORT_DELAY_US)            # 等待状态稳定
-        return tmp
+        """发送和接收一个字节的数据，与手柄通信。借用缓冲区最后一个字节，之后恢复原来的数据。"""
+        tx = self._tx
+        rx = self.PS2data
+        old_tx = tx[20]
+        old_rx = rx[20]
+        tx[20] = byte
+        self._shift(20, 1)
+        value = rx[20]
+        tx[20] = old_tx
+        rx[20] = old_rx
+        return value
 
     def read_gamepad(self, motor1=False, motor2=0):
         """从手柄读取当前状态，包括按键和模拟信号。
         
         如果启用了振动，则根据参数设置手柄振动强度。
         """
-        elapsed = time.ticks_ms() - self.last_read
+        elapsed = ticks_diff(ticks_ms(), self.last_read)
         if elapsed > 1500:
             self.reconfig_gamepad()              # 如果读取时间过长，重新配置手柄
-        if elapsed < self.read_delay:
-            time.sleep_ms(self.read_delay - elapsed)
+        elif elapsed < self.read_delay:
+            sleep_ms(self.read_delay - elapsed)
 
-        data_to_send = [0x01, 0x42, 0, motor1, int((motor2 / 255) * 0xFF), 0, 0, 0, 0]
-        extra_data = [0] * 12
+        t0 = ticks_us()
+        tx = self._tx
+        rx = self.PS2data
+        tx[0:21] = _CMD_POLL                     # 读取命令 0x01 0x42，之后全部为0
+        tx[3] = 1 if motor1 else 0
+        tx[4] = motor2 & 0xFF
 
         for _ in range(5):  # 尝试最多5次
-            self.PS2_CMD.value(1)
-            self.PS2_CLK.value(1)
-            self.PS2_SEL.value(0)                # 选择手柄开始通信
-            time.sleep_us(SHORT_DELAY_US)
-
-            for i in range(9):
-                self.PS2data[i] = self._gamepad_shiftinout(data_to_send[i])
-            
-            if self.PS2data[1] == 0x79:
-                for i in range(12):
-                    self.PS2data[i + 9] = self._gamepad_shiftinout(extra_data[i])
-            
-            self.PS2_SEL.value(1)                # 结束通信
-
-            if (self.PS2data[1] & 0xF0) == 0x70:
+            self._idle()
+            self._sel(0)                         # 选择手柄开始通信
+            sleep_us(SHORT_DELAY_US)
+
+            self._shift(0, 9)
+            if rx[1] == 0x79:
+                self._shift(9, 12)
+
+            self._sel(1)                         # 结束通信
+
+            if (rx[1] & 0xF0) == 0x70:
                 break
-            
+
             self.reconfig_gamepad()              # 重新配置手柄
-            time.sleep_ms(self.read_delay)
+            sleep_ms(self.read_delay)
 
-        if (self.PS2data[1] & 0xF0) != 0x70:
+        ok = (rx[1] & 0xF0) == 0x70
+        if not ok:
             self.read_delay = min(self.read_delay + 1, 10)
 
-        self.last_buttons = self.buttons
-        self.buttons = (self.PS2data[4] << 8) + self.PS2data[3]
-        self.last_read = time.ticks_ms()
-        return (self.PS2data[1] & 0xF0) == 0x70
+        last = self.buttons
+        self.last_buttons = last
+        if ok:                                   # 读取失败时保持上次的按键状态，不产生假事件
+            self.buttons = (rx[4] << 8) + rx[3]
+        changed = last ^ self.buttons
+        self.pressed = changed & last            # 1 -> 0 为按下
+        self.released = changed & self.buttons   # 0 -> 1 为松开
+        self.held = ~self.buttons & 0xFFFF
+        if changed:
+            self._push_events(changed)
+        self.last_read = ticks_ms()
+
+        us = ticks_diff(ticks_us(), t0)
+        self.read_us = us
+        self.read_count += 1
+        self.read_us_total += us
+        if us > self.read_us_max:
+            self.read_us_max = us
+        return ok
+
+    def _push_events(self, changed):
+        """把变化的按键逐位放入事件队列。"""
+        buttons = self.buttons
+        i = 0
+        while changed:
+            if changed & 1:
+                if self.ev_count < EVENT_DEPTH:
+                    k = (self.ev_head + self.ev_count) % EVENT_DEPTH
+                    self.ev_kind[k] = EV_RELEASED if buttons >> i & 1 else EV_PRESSED
+                    self.ev_bit[k] = i
+                    self.ev_count += 1
+                else:
+                    self.ev_dropped += 1
+            changed >>= 1
+            i += 1
+
+    def get_event(self):
+        """取出一个按键事件，返回(事件类型, 按键位)，没有事件时返回(0, 0)。"""
+        if not self.ev_count:
+            return 0, 0
+        k = self.ev_head
+        self.ev_head = (k + 1) % EVENT_DEPTH
+        self.ev_count -= 1
+        return self.ev_kind[k], 1 << self.ev_bit[k]
+
+    def clear_events(self):
+        """清空按键事件队列。"""
+        self.ev_head = 0
+        self.ev_count = 0
+
+    def on(self, button_name, pressed=None, released=None):
+        """登记按键的处理函数，dispatch() 时按下调用 pressed()，松开调用 released()。"""
+        mask = BUTTONS[button_name]
+        i = 0
+        while mask > 1:
+            mask >>= 1
+            i += 1
+        self.on_pressed[i] = pressed
+        self.on_released[i] = released
+
+    def dispatch(self):
+        """处理队列中的全部按键事件，只对发生变化的按键调用处理函数，返回处理的事件数。"""
+        n = 0
+        while self.ev_count:
+            k = self.ev_head
+            self.ev_head = (k + 1) % EVENT_DEPTH
+            self.ev_count -= 1
+            if self.ev_kind[k] == EV_PRESSED:
+                handler = self.on_pressed[self.ev_bit[k]]
+            else:
+                handler = self.on_released[self.ev_bit[k]]
+            if handler:
+                handler()
+            n += 1
+        return n
+
+    def read_stats(self, reset=True):
+        """返回读取统计 (读取次数, 平均耗时us, 最大耗时us, 读取频率Hz)，用于确认手柄的轮询速率。"""
+        n = self.read_count
+        ms = ticks_diff(ticks_ms(), self.stats_start)
+        stats = (n, self.read_us_total // n if n else 0, self.read_us_max, n * 1000 // ms if ms > 0 else 0)
+        if reset:
+            self.read_count = 0
+            self.read_us_max = 0
+            self.read_us_total = 0
+            self.stats_start = ticks_ms()
+        return stats
 
     def config_gamepad(self, pressures=False, rumble=False):
         """配置手柄并检测其功能支持。
         
         配置压力感应和振动功能。
         """
-        self.PS2_CMD.value(1)
-        self.PS2_CLK.value(1)
+        self._idle()
 
         for _ in range(10):
-            self.sendCommandString([0x01, 0x43, 0x00, 0x01, 0x00])
-            time.sleep_us(SHORT_DELAY_US)
+            self.sendCommandString(_CMD_ENTER_CONFIG)
+            sleep_us(SHORT_DELAY_US)
 
-            self.PS2_CMD.value(1)
-            self.PS2_CLK.value(1)
-            self.PS2_SEL.value(0)                # 选择手柄
-            time.sleep_us(SHORT_DELAY_US)
+            self._idle()
+            self._sel(0)                         # 选择手柄
+            sleep_us(SHORT_DELAY_US)
 
-            temp = [self._gamepad_shiftinout(byte) for byte in [0x01, 0x45, 0x00, 0x5A, 0x5A, 0x5A, 0x5A, 0x5A, 0x5A]]
+            self._tx[0:9] = _CMD_TYPE_READ
+            self._shift(0, 9)
 
-            self.PS2_SEL.value(1)
-            self.controller_type = temp[3]
+            self._sel(1)
+            self.controller_type = self.PS2data[3]
 
-            self.sendCommandString([0x01, 0x44, 0x00, 0x01, 0x03, 0x00, 0x00, 0x00, 0x00])
+            self.sendCommandString(_CMD_SET_MODE)
             if rumble:
-                self.sendCommandString([0x01, 0x4D, 0x00, 0x00, 0x01])
+                self.sendCommandString(_CMD_ENABLE_RUMBLE)
                 self.en_Rumble = True
             if pressures:
-                self.sendCommandString([0x01, 0x4F, 0x00, 0xFF, 0xFF, 0x03, 0x00, 0x00, 0x00])
+                self.sendCommandString(_CMD_ENABLE_PRESSURES)
                 self.en_Pressures = True
 
-            self.sendCommandString([0x01, 0x43, 0x00, 0x00, 0x5A, 0x5A, 0x5A, 0x5A, 0x5A])
+            self.sendCommandString(_CMD_EXIT_CONFIG)
             self.read_gamepad()
 
             if pressures and self.PS2data[1] == 0x79:
@@ -152,7 +390,7 @@ class Mars_PS2:
             if self.PS2data[1] == 0x73:
                 break
         
-        if self.PS2data[1] not in [0x41, 0x42, 0x73, 0x79]:
+        if self.PS2data[1] not in (0x41, 0x42, 0x73, 0x79):
             return 1  # 配置错误
 
         self.read_delay = 1
@@ -163,22 +401,23 @@ class Mars_PS2:
         
         用于配置手柄或更新其状态。
         """
-        self.PS2_SEL.value(0)  # 选择手柄
-        time.sleep_us(SHORT_DELAY_US)
-        for byte in command:
-            self._gamepad_shiftinout(byte)
-        self.PS2_SEL.value(1)  # 取消选择
-        time.sleep_ms(self.read_delay)
+        n = len(command)
+        self._tx[0:n] = bytes(command) if isinstance(command, list) else command
+        self._sel(0)  # 选择手柄
+        sleep_us(SHORT_DELAY_US)
+        self._shift(0, n)
+        self._sel(1)  # 取消选择
+        sleep_ms(self.read_delay)
 
     def reconfig_gamepad(self):
         """重新配置手柄，通常在通信中断时使用。"""
-        self.sendCommandString([0x01, 0x43, 0x00, 0x01, 0x00])
-        self.sendCommandString([0x01, 0x44, 0x00, 0x01, 0x03, 0x00, 0x00, 0x00, 0x00])
+        self.sendCommandString(_CMD_ENTER_CONFIG)
+        self.sendCommandString(_CMD_SET_MODE)
         if self.en_Rumble:
-            self.sendCommandString([0x01, 0x4D, 0x00, 0x00, 0x01])
+            self.sendCommandString(_CMD_ENABLE_RUMBLE)
         if self.en_Pressures:
-            self.sendCommandString([0x01, 0x4F, 0x00, 0xFF, 0xFF, 0x03, 0x00, 0x00, 0x00])
-        self.sendCommandString([0x01, 0x43, 0x00, 0x00, 0x5A, 0x5A, 0x5A, 0x5A, 0x5A])
+            self.sendCommandString(_CMD_ENABLE_PRESSURES)
+        self.sendCommandString(_CMD_EXIT_CONFIG)
 
     def Button(self, button_name):
         """检查某个按钮是否被按下。
@@ -193,7 +432,7 @@ class Mars_PS2:
         返回特定按钮或所有按钮的状态是否发生了变化。
         """
         if button_name:
-            return bool(self.last_buttons ^ self.buttons & BUTTONS[button_name])
+            return bool((self.last_buttons ^ self.buttons) & BUTTONS[button_name])
         return bool(self.last_buttons ^ self.buttons)
 
     def ButtonPressed(self, button_name):
@@ -201,14 +440,14 @@ class Mars_PS2:
         
         返回布尔值表示按钮是否刚刚从未按状态变为按下状态。
         """
-        return self.NewButtonState(button_name) and self.Button(button_name)
+        return bool(self.pressed & BUTTONS[button_name])
 
     def ButtonReleased(self, button_name):
         """检查某个按钮是否刚刚被释放。
         
         返回布尔值表示按钮是否刚刚从按下状态变为释放状态。
         """
-        return self.NewButtonState(button_name) and (not self.last_buttons & BUTTONS[button_name])
+        return bool(self.released & BUTTONS[button_name])
 
     def Analog(self, index):
         """获取指定索引位置的模拟量数据。
@@ -230,9 +469,9 @@ class Mars_PS2:
         
         发送命令激活手柄的振动马达。
         """
-        self.sendCommandString([0x01, 0x43, 0x00, 0x01, 0x00])
-        self.sendCommandString([0x01, 0x4D, 0x00, 0x00, 0x01])
-        self.sendCommandString([0x01, 0x43, 0x00, 0x00, 0x5A, 0x5A, 0x5A, 0x5A, 0x5A])
+        self.sendCommandString(_CMD_ENTER_CONFIG)
+        self.sendCommandString(_CMD_ENABLE_RUMBLE)
+        self.sendCommandString(_CMD_EXIT_CONFIG)
         self.en_Rumble = True
 
     def enablePressures(self):
@@ -240,16 +479,120 @@ class Mars_PS2:
         
         配置手柄以启用对按钮的压力感应。
         """
-        self.sendCommandString([0x01, 0x43, 0x00, 0x01, 0x00])
-        self.sendCommandString([0x01, 0x4F, 0x00, 0xFF, 0xFF, 0x03, 0x00, 0x00, 0x00])
-        self.sendCommandString([0x01, 0x43, 0x00, 0x00, 0x5A, 0x5A, 0x5A, 0x5A, 0x5A])
+        self.sendCommandString(_CMD_ENTER_CONFIG)
+        self.sendCommandString(_CMD_ENABLE_PRESSURES)
+        self.sendCommandString(_CMD_EXIT_CONFIG)
         self.read_gamepad()
         self.read_gamepad()
         self.en_Pressures = self.PS2data[1] == 0x79
         return self.en_Pressures
 
+
+def _selftest():
+    """用假引脚/假SPI模拟手柄，检查引脚模拟、硬件SPI(LSB)、SoftSPI(MSB+查表)三种传输发出的协议字节。"""
+    class FakePad:
+        # 时钟下降沿输出一位，上升沿采样CMD，低位先发
+        def __init__(self, mode=0x73, data=b'\xf7\xff\x80\x80\x80\x80'):
+            self.mode = mode
+            self.data = data
+            self.frames = []
+            self.lv = {'dat': 1, 'cmd': 1, 'sel': 1, 'clk': 1}
+
+        def reply(self, frame, k):
+            if k == 0:
+                return 0xFF
+            if k == 1:
+                return self.mode
+            if k == 2:
+                return 0x5A
+            if frame[1] == 0x42 and k - 3 < len(self.data):
+                return self.data[k - 3]
+            if frame[1] == 0x45 and k == 3:
+                return 0x03
+            return 0
+
+        def xfer(self, byte):
+            # 协议层交换一个字节
+            frame = self.frames[-1]
+            out = self.reply(frame, len(frame))
+            frame.append(byte)
+            return out
+
+        def pin(self, name):
+            pad = self
+
+            class FakePin:
+                def value(self, v=None):
+                    if v is None:
+                        return pad.lv[name]
+                    v = 1 if v else 0
+                    old = pad.lv[name]
+                    pad.lv[name] = v
+                    if name == 'sel' and old and not v:
+                        pad.frames.append(bytearray())
+                        pad.bit = 0
+                        pad.byte = 0
+                    elif name == 'clk' and not pad.lv['sel']:
+                        if old and not v:
+                            frame = pad.frames[-1]
+                            pad.lv['dat'] = pad.reply(frame, len(frame)) >> pad.bit & 1
+                        elif v and not old:
+                            pad.byte |= pad.lv['cmd'] << pad.bit
+                            pad.bit += 1
+                            if pad.bit == 8:
+                                pad.frames[-1].append(pad.byte)
+                                pad.bit = 0
+                                pad.byte = 0
+            return FakePin()
+
+    class FakeSPI:
+        def __init__(self, pad, lsb):
+            self.pad = pad
+            self.lsb = lsb
+
+        def write_readinto(self, tx, rx):
+            for k in range(len(tx)):
+                if self.lsb:
+                    rx[k] = self.pad.xfer(tx[k])
+                else:
+                    rx[k] = _REV[self.pad.xfer(_REV[tx[k]])]
+
+    for name in ('bitbang', 'spi-lsb', 'spi-msb'):
+        for mode in (0x73, 0x79):
+            pad = FakePad(mode)
+            spi = None
+            if name != 'bitbang':
+                spi = FakeSPI(pad, name == 'spi-lsb')
+            ps2 = Mars_PS2(pad.pin('dat'), pad.pin('cmd'), pad.pin('sel'), pad.pin('clk'), spi=spi, delay_us=0)
+            ps2.spi_lsb = name != 'spi-msb'
+            assert ps2.config_gamepad(pressures=True, rumble=True) == 0
+            assert ps2.controller_type == 0x03
+            del pad.frames[:]
+            assert ps2.read_gamepad(True, 255)
+            expect = _CMD_POLL[:21 if mode == 0x79 else 9]
+            expect = expect[:3] + b'\x01\xff' + expect[5:]
+            assert bytes(pad.frames[0]) == expect, (name, pad.frames[0])
+            assert ps2.buttons == 0xFFF7 and ps2.Button('START') and not ps2.Button('SELECT')
+            assert ps2.Analog(5) == 0x80
+            # START 按下 -> 保持 -> 松开，同时 SELECT 按下
+            log = []
+            ps2.on('START', lambda: log.append('start down'), lambda: log.append('start up'))
+            ps2.on('SELECT', lambda: log.append('select down'))
+            assert ps2.ev_count == 1 and ps2.dispatch() == 1 and log == ['start down']   # 配置时读到的按下
+            assert ps2.read_gamepad() and not ps2.pressed and ps2.held == 0x0008 and not ps2.dispatch()
+            pad.data = b'\xfe\xff'
+            assert ps2.read_gamepad()
+            assert ps2.ButtonReleased('START') and ps2.ButtonPressed('SELECT') and ps2.NewButtonState('START')
+            assert not ps2.NewButtonState('L3')
+            assert ps2.dispatch() == 2 and log == ['start down', 'select down', 'start up']
+            print(name, hex(mode), 'ok', ps2.read_stats())
+    print('ps2 protocol ok')
+
 # 示例代码
 if __name__ == "__main__":
+    if Pin is None:                      # CPython：用假引脚检查协议字节
+        _selftest()
+        raise SystemExit
     # 指定引脚号来初始化PS2X
     PS2_DAT_PIN = 19
     PS2_CMD_PIN = 18
@@ -0,0 +1,159 @@
+'''
+总线舵机位置回读
+查询指令 '#IIIPRAD!'，舵机应答 '#IIIPpppp!'(pppp为当前PWM)。
+几个舵机的查询在构造时拼成一帧预分配好，一次写到串口(流水线)，应答按 ID 配对，不要求顺序；
+应答在帧解析器里就被过滤函数取走，直接写进位置缓存，不会进入 uart.recv_str 的帧队列。
+同一个串口可以有多个查询对象：过滤函数串成链，不是自己ID的应答交给之前安装的过滤函数。
+超过 timeout_ms 没有应答的 ID 记为超时，缓存中保留上一次的位置。
+wait_arrival() 反复查询，所有舵机到达目标(误差 tol 以内)就立即返回，
+只认发出运动指令之后(since)收到的位置，不会被运动前缓存的旧位置提前满足；
+舵机不支持回读时最多等待 timeout_ms，与原来的固定延时相同。
+'''
+
+import time
+
+SLOT = 9                                    # 每个查询的长度 len('#000PRAD!')
+_P = ord('P')
+_R = ord('R')
+_0 = ord('0')
+UNKNOWN = -1                                # 从未收到应答时的位置
+
+
+# 读取 buf[off:off+width] 的十进制数字，有非数字时返回 -1
+def _digits(buf, off, width):
+    v = 0
+    for k in range(off, off + width):
+        d = buf[k] - _0
+        if d < 0 or d > 9:
+            return -1
+        v = v * 10 + d
+    return v
+
+
+class Mars_ServoQuery(object):
+    def __init__(self, uart, ids, timeout_ms=30):
+        self.uart = uart                                            # Mars_UART 对象
+        self.ids = tuple(ids)                                       # 查询的舵机ID
+        self.n = len(self.ids)
+        self.timeout_ms = timeout_ms                                # 单次查询的应答超时
+        self.buf = bytearray(b'#000PRAD!' * self.n)                # 预分配的查询帧
+        for i in range(self.n):
+            v = self.ids[i]
+            for k in range(3, 0, -1):
+                self.buf[i * SLOT + k] = _0 + v % 10
+                v //= 10
+        self.pos = [UNKNOWN] * self.n                               # 位置缓存
+        self.stamp = [0] * self.n                                   # 每个位置的更新时间 ticks_ms
+        self.pending = bytearray(self.n)                            # 1-已查询、等待应答
+        self.waiting = 0                                            # 等待应答的个数
+        self.sent_ms = 0                                            # 最近一次查询的时间
+        self.replies = 0                                            # 收到的应答数
+        self.timeouts = 0                                           # 超时数
+        self.next_filter = uart.parser.filter                       # 之前安装的过滤函数，串成链
+        uart.parser.filter = self._on_frame                         # 由解析器把应答交给本对象
+
+    # 解析器的过滤函数：取走本对象ID的应答帧 '#IIIPpppp!' 和总线回显的查询帧 '#IIIPRAD!'，
+    # 其余的帧交给链上之前的过滤函数
+    def _on_frame(self, buf, n, t):
+        if self._take(buf, n, t):
+            return True
+        return self.next_filter is not None and self.next_filter(buf, n, t)
+
+    def _take(self, buf, n, t):
+        if t != 3 or buf[4] != _P:
+            return False
+        if n == SLOT and buf[5] == _R:                              # 查询帧(半双工回显)
+            return True
+        if n != 10:
+            return False
+        dev_id = _digits(buf, 1, 3)
+        pwm = _digits(buf, 5, 4)
+        if dev_id < 0 or pwm < 0:
+            return False
+        for i in range(self.n):
+            if self.ids[i] == dev_id:
+                self.pos[i] = pwm
+                self.stamp[i] = time.ticks_ms()
+                if self.pending[i]:
+                    self.pending[i] = 0
+                    self.waiting -= 1
+                self.replies += 1
+                return True
+        return False
+
+    # 一次写出所有ID的查询，立即返回
+    def request(self):
+        for i in range(self.n):
+            self.pending[i] = 1
+        self.waiting = self.n
+        self.sent_ms = time.ticks_ms()
+        self.uart.uart_send_str(self.buf)
+
+    # 读取已到达的应答，并把超时的查询作废；返回还在等待的个数
+    def poll(self):
+        uart = self.uart
+        uart.parser.readfrom(uart.uart2)
+        if self.waiting and time.ticks_diff(time.ticks_ms(), self.sent_ms) >= self.timeout_ms:
+            for i in range(self.n):
+                if self.pending[i]:
+                    self.pending[i] = 0
+                    self.timeouts += 1
+            self.waiting = 0
+        return self.waiting
+
+    # 查询一次并等到全部应答或超时，返回收到应答的个数
+    def read(self):
+        self.request()
+        while self.poll():
+            time.sleep_ms(1)
+        n = 0
+        for i in range(self.n):
+            if time.ticks_diff(self.stamp[i], self.sent_ms) >= 0 and self.pos[i] != UNKNOWN:
+                n += 1
+        return n
+
+    # 缓存中的位置，没有应答过时返回 UNKNOWN
+    def position(self, dev_id):
+        return self.pos[self.ids.index(dev_id)]
+
+    # 缓存中的位置距今多少毫秒
+    def age_ms(self, dev_id):
+        return time.ticks_diff(time.ticks_ms(), self.stamp[self.ids.index(dev_id)])
+
+    # 等待舵机到达目标：targets 与 ids(默认为全部ID)一一对应，None 代表不关心
+    # since 为发出运动指令的 ticks_ms，默认为调用时刻；只有此后收到的位置才算数
+    # 全部到达误差 tol 以内返回 True，timeout_ms 内未到达返回 False
+    def wait_arrival(self, targets, ids=None, tol=15, timeout_ms=2000, period_ms=20, since=None):
+        ids = self.ids if ids is None else ids
+        start = time.ticks_ms()
+        if since is None:
+            since = start
+        while True:
+            t = time.ticks_ms()
+            self.read()
+            arrived = True
+            for k in range(len(ids)):
+                if targets[k] is None:
+                    continue
+                i = self.ids.index(ids[k])
+                p = self.pos[i]
+                if p == UNKNOWN or time.ticks_diff(self.stamp[i], since) < 0 or abs(p - targets[k]) > tol:
+                    arrived = False
+                    break
+            if arrived:
+                return True
+            if time.ticks_diff(time.ticks_ms(), start) >= timeout_ms:
+                return False
+            wait = period_ms - time.ticks_diff(time.ticks_ms(), t)
+            if wait > 0:
+                time.sleep_ms(wait)
+
+
+# 程序入口：查询机械臂4个舵机的位置
+if __name__ == '__main__':
+    from iCenterCar.z_uart import Mars_UART
+    uart = Mars_UART()
+    query = Mars_ServoQuery(uart, (21, 22, 23, 24))
+    for k in range(5):
+        print(query.read(), query.pos, 'replies', query.replies, 'timeouts', query.timeouts)
+        time.sleep(1)
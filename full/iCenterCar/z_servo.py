@@ -0,0 +1,132 @@
+'''
+总线舵机/电机指令帧
+一组设备的指令帧 '#IIIPppppTtttt!#IIIPppppTtttt!...' 在构造时一次分配好，
+之后只在原地改写 ID、PWM、时间的数字，然后把整个缓冲区直接写到串口，
+控制循环中不再拼接字符串，不产生内存碎片。
+格式：#xxxPyyyyTzzzz!  #xxx-ID；Pyyyy-PWM输出数值；Tzzzz-运行时间(ms)，0000代表一直运行
+
+每个 ID 最后一次发出的 PWM、时间和发送时刻记录在模块级缓存中(所有帧共用)，
+send_changed() 只把目标变化了的设备压缩到一起，一次写到串口，没有变化时不占用总线。
+舵机到达目标后保持位置，重复同样的指令没有意义；电机的指令只在运行时间内有效，
+重复同样的指令会重新开始计时，所以电机(hold=0)的指令总是发送，
+只有停止指令(1500)和一直运行(T=0)的指令在没有变化时省去。
+'''
+
+try:
+    from time import ticks_ms
+except ImportError:                         # CPython 下只用于运行自检
+    import time
+
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+SLOT = 15                                   # 每个设备的指令长度 len('#000P1500T1000!')
+NEUTRAL = 1500                              # 电机停止的PWM
+
+# 每个 ID 最后发出的指令
+last_pwm = {}
+last_time = {}
+last_ms = {}
+
+
+# 清除缓存，ids 为 None 时全部清除；舵机重新上电后调用，保证下一次全部重发
+def invalidate(ids=None):
+    if ids is None:
+        last_pwm.clear()
+        return
+    for dev_id in ids:
+        if dev_id in last_pwm:
+            del last_pwm[dev_id]
+
+
+class Mars_ServoFrame(object):
+    debug = False                           # 为True时每次发送都打印帧内容
+
+    def __init__(self, ids, pwm=1500, move_time=1000, hold=1):
+        self.n = len(ids)                                           # 设备个数
+        self.buf = bytearray(b'#000P0000T0000!' * self.n)          # 预分配的帧缓冲
+        self.out = bytearray(len(self.buf))                         # send_changed 压缩后的帧
+        self.out_mv = memoryview(self.out)
+        self.buf_mv = memoryview(self.buf)
+        self.ids = [0] * self.n                                     # 每个槽的 ID
+        self.pwm = [0] * self.n                                     # 每个槽的 PWM
+        self.time = [0] * self.n                                    # 每个槽的运行时间
+        # 每个槽到达后是否保持：1-舵机；0-电机(指令在运行时间后失效)。可以是一个数或每个槽一个值
+        self.hold = bytearray(hold if isinstance(hold, (tuple, list)) else (hold,) * self.n)
+        self.sent_bytes = 0                                         # 累计写到串口的字节数
+        self.skipped = 0                                            # 累计因没有变化而省去的指令数
+        for i in range(self.n):
+            self.set_id(i, ids[i])
+            self.set(i, pwm, move_time)
+
+    # 在 off 处原地写入 width 位十进制数字，超出范围的数值取边界值
+    def _put(self, off, value, width, top):
+        if value < 0:
+            value = 0
+        elif value > top:
+            value = top
+        buf = self.buf
+        k = off + width - 1
+        while k >= off:
+            buf[k] = 48 + value % 10
+            value //= 10
+            k -= 1
+
+    # 设置第 i 个设备的 ID
+    def set_id(self, i, dev_id):
+        self.ids[i] = dev_id
+        self._put(i * SLOT + 1, dev_id, 3, 999)
+
+    # 设置第 i 个设备的 PWM 和运行时间
+    def set(self, i, pwm, move_time):
+        self.pwm[i] = pwm
+        self.time[i] = move_time
+        off = i * SLOT
+        self._put(off + 5, pwm, 4, 9999)
+        self._put(off + 10, move_time, 4, 9999)
+
+    # 把整帧写到串口，uart 为 Mars_UART 对象
+    def send(self, uart):
+        if self.debug:
+            print(self.buf)
+        uart.uart_send_str(self.buf)
+        self.sent_bytes += len(self.buf)
+        now = ticks_ms()
+        for i in range(self.n):
+            self._remember(i, now)
+
+    # 记录第 i 个设备刚发出的指令
+    def _remember(self, i, now):
+        dev_id = self.ids[i]
+        last_pwm[dev_id] = self.pwm[i]
+        last_time[dev_id] = self.time[i]
+        last_ms[dev_id] = now
+
+    # 第 i 个设备的指令与缓存中最后发出的相同，并且仍然有效
+    def unchanged(self, i):
+        dev_id = self.ids[i]
+        pwm = self.pwm[i]
+        if last_pwm.get(dev_id) != pwm or last_time[dev_id] != self.time[i]:
+            return False
+        return self.hold[i] or pwm == NEUTRAL or not self.time[i]    # 电机的同样指令用于续时
+
+    # 只发送有变化的设备，压缩成一帧一次写出，返回发送的设备数
+    def send_changed(self, uart):
+        now = ticks_ms()
+        buf = self.buf_mv
+        out = self.out_mv
+        k = 0
+        for i in range(self.n):
+            if self.unchanged(i):
+                self.skipped += 1
+                continue
+            off = i * SLOT
+            out[k:k + SLOT] = buf[off:off + SLOT]
+            k += SLOT
+            self._remember(i, now)
+        if k:
+            if self.debug:
+                print(out[:k])
+            uart.uart_send_str(out[:k])
+            self.sent_bytes += k
+        return k // SLOT
@@ -10,14 +10,23 @@ and display real-time output with features like:
 - Colored output
 - Timestamp logging
 - Raw REPL mode support
+- Multi-device mode with a merged, timestamped timeline
+- Heap/GC telemetry from src/z_mem.py rendered as a live graph
+- Sorted profiler reports from src/z_prof.py
 """
 
+import re
 import sys
 import time
+import asyncio
+import queue
+import shutil
 import threading
 import os
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from pyboard import Pyboard, PyboardError
+from pyboard import Pyboard, PyboardError, ThreadSafePyboard, parse_usb_spec, find_usb_port, port_usb_identity
 from dotenv import load_dotenv
 
 try:
@@ -37,9 +46,420 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
+
+class DeviceWatcher:
+    """
+    Wake up as soon as something changes under /dev.
+
+    On Linux an inotify watch on /dev reports the board's node being
+    created (and udev fixing its permissions right after), so a
+    reconnect can be attempted within milliseconds. Elsewhere, or if
+    inotify is unavailable, wait() simply sleeps for the timeout and the
+    caller's backoff does the work.
+    """
+
+    IN_ATTRIB = 0x00000004
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+
+    def __init__(self, path='/dev'):
+        self.fd = None
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return
+            if libc.inotify_add_watch(fd, path.encode(), self.IN_CREATE | self.IN_ATTRIB | self.IN_DELETE) < 0:
+                os.close(fd)
+                return
+            self.fd = fd
+        except (OSError, AttributeError):
+            self.fd = None
+
+    def fileno(self):
+        return self.fd
+
+    def drain(self):
+        """Discard pending events; returns True if there were any"""
+        seen = False
+        while self.fd is not None:
+            try:
+                if not os.read(self.fd, 4096):
+                    break
+                seen = True
+            except BlockingIOError:
+                break
+        return seen
+
+    def wait(self, timeout):
+        """Block until /dev changes or timeout seconds pass; True if /dev changed"""
+        if self.fd is None:
+            time.sleep(timeout)
+            return False
+        import select
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(readable) and self.drain()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class LineFilter:
+    """
+    Include/exclude filters and highlight rules for device output.
+
+    All rules of one kind are compiled once into a single alternation
+    regex over bytes, so each received line costs at most three regex
+    scans and is only decoded after it has passed the filters. A pattern
+    with its own groups or a global inline flag such as (?i) would change
+    meaning inside the alternation (renumbered backreferences, a flag
+    that is not at the start), so it is compiled and scanned on its own.
+
+    Rules file syntax, one rule per line ('#' starts a comment):
+
+        include: PATTERN
+        exclude: PATTERN
+        highlight: PATTERN
+        highlight red: PATTERN
+    """
+
+    COLORS = {
+        'red': Fore.RED, 'green': Fore.GREEN, 'yellow': Fore.YELLOW, 'blue': Fore.BLUE,
+        'magenta': Fore.MAGENTA, 'cyan': Fore.CYAN, 'white': Fore.WHITE,
+    }
+    DEFAULT_HIGHLIGHT = 'yellow'
+
+    def __init__(self, include=(), exclude=(), highlight=()):
+        """
+        Args:
+            include: Patterns; if any are given only lines matching one of them are shown
+            exclude: Patterns; lines matching any of them are dropped
+            highlight: (pattern, color name) pairs; matching spans are colored
+        """
+        self.include = self.compile(include)
+        self.exclude = self.compile(exclude)
+        self.highlight = self.compile(pattern for pattern, _ in highlight)
+        # Rule i of the highlight regexes gets color i
+        self.highlight_colors = [self.COLORS[color].encode() for _, color in highlight]
+        self.dropped = 0
+
+    @staticmethod
+    def compile(patterns):
+        """
+        Compile patterns into a list of (bytes regex, rule index) pairs; None if there are none.
+
+        Patterns that can be combined share one regex with a named group
+        r<i> per rule and a rule index of None; each other pattern gets a
+        regex of its own.
+        """
+        patterns = list(patterns)
+        if not patterns:
+            return None
+        compiled = []
+        for i, pattern in enumerate(patterns):
+            try:
+                compiled.append(re.compile(pattern.encode('utf-8')))
+            except re.error as e:
+                # Report the offending rule rather than the combined regex
+                raise re.error(f"bad pattern {pattern!r}: {e}") from None
+        plain = [i for i, r in enumerate(compiled) if not r.groups and not r.flags]
+        rules = [(r, i) for i, r in enumerate(compiled) if i not in plain]
+        if plain:
+            combined = b'|'.join(b'(?P<r%d>%s)' % (i, compiled[i].pattern) for i in plain)
+            try:
+                rules.insert(0, (re.compile(combined), None))
+            except re.error:
+                rules[:0] = [(compiled[i], i) for i in plain]
+        return rules
+
+    @staticmethod
+    def search(rules, line):
+        """Whether any compiled rule matches the line"""
+        return any(regex.search(line) for regex, _ in rules)
+
+    @staticmethod
+    def spans(rules, line):
+        """Non-overlapping (start, end, rule) matches, leftmost first, the lower rule winning a tie"""
+        found = []
+        for regex, rule in rules:
+            for m in regex.finditer(line):
+                if m.end() > m.start():
+                    found.append((m.start(), rule if rule is not None else int(m.lastgroup[1:]), m.end()))
+        if len(rules) > 1:
+            found.sort()
+        pos = 0
+        for start, rule, end in found:
+            if start >= pos:
+                yield start, end, rule
+                pos = end
+
+    @classmethod
+    def parse_highlight(cls, spec):
+        """Split 'COLOR:PATTERN' into (pattern, color); a plain pattern gets the default color"""
+        color, sep, pattern = spec.partition(':')
+        if sep and color.lower() in cls.COLORS:
+            return pattern, color.lower()
+        return spec, cls.DEFAULT_HIGHLIGHT
+
+    @classmethod
+    def from_args(cls, include=None, exclude=None, highlight=None, rules_file=None):
+        """Build a filter from command line options and an optional rules file; None if there are no rules"""
+        include = list(include or [])
+        exclude = list(exclude or [])
+        highlight = [cls.parse_highlight(spec) for spec in highlight or []]
+
+        if rules_file:
+            with open(rules_file, 'r', encoding='utf-8') as f:
+                for number, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                    kind, sep, pattern = line.partition(':')
+                    kind = kind.split()
+                    pattern = pattern.strip()
+                    if not sep or not kind or not pattern:
+                        raise ValueError(f"{rules_file}:{number}: expected 'include|exclude|highlight [color]: PATTERN'")
+                    if kind[0] == 'include':
+                        include.append(pattern)
+                    elif kind[0] == 'exclude':
+                        exclude.append(pattern)
+                    elif kind[0] == 'highlight':
+                        color = kind[1].lower() if len(kind) > 1 else cls.DEFAULT_HIGHLIGHT
+                        if color not in cls.COLORS:
+                            raise ValueError(f"{rules_file}:{number}: unknown color '{color}'")
+                        highlight.append((pattern, color))
+                    else:
+                        raise ValueError(f"{rules_file}:{number}: unknown rule '{kind[0]}'")
+
+        if not (include or exclude or highlight):
+            return None
+        return cls(include, exclude, highlight)
+
+    def accept(self, line):
+        """Whether a raw line passes the include/exclude filters"""
+        if self.exclude is not None and self.search(self.exclude, line):
+            self.dropped += 1
+            return False
+        if self.include is not None and not self.search(self.include, line):
+            self.dropped += 1
+            return False
+        return True
+
+    def colorize(self, line, base=b''):
+        """Wrap highlighted spans of a raw line in color codes, restoring base afterwards"""
+        if self.highlight is None or not COLOR_SUPPORT:
+            return line
+        out = []
+        pos = 0
+        reset = Style.RESET_ALL.encode() + base
+        for start, end, rule in self.spans(self.highlight, line):
+            out.append(line[pos:start])
+            out.append(self.highlight_colors[rule])
+            out.append(line[start:end])
+            out.append(reset)
+            pos = end
+        if not out:
+            return line
+        out.append(line[pos:])
+        return b''.join(out)
+
+
+def parse_fields(text):
+    """Parse the 'key=value' pairs of a tagged device line; integer values become ints"""
+    fields = {}
+    for item in text.split():
+        key, sep, value = item.partition('=')
+        if not sep:
+            continue
+        try:
+            fields[key] = int(value)
+        except ValueError:
+            fields[key] = value
+    return fields
+
+
+class MemoryTelemetry:
+    """
+    Parser for the heap/GC lines printed by src/z_mem.py.
+
+    '@MEM' samples are rendered as one status line with a sparkline of
+    allocated heap; '@MEMSPIKE' lines record allocations between two
+    mark() calls that exceeded the device threshold. summary() reports
+    free-memory extremes, GC activity and the largest spikes with the
+    loop iteration and phase that caused them.
+    """
+
+    SPARK = ' \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588'
+    HISTORY = 40
+    TOP_SPIKES = 10
+
+    def __init__(self):
+        self.history = deque(maxlen=self.HISTORY)
+        self.last = None
+        self.samples = 0
+        self.min_free = None
+        self.max_alloc = 0
+        self.min_big = None
+        self.max_gc_us = 0
+        self.max_stack = 0
+        self.spike_count = 0
+        self.spikes = []
+
+    @staticmethod
+    def size(n):
+        return f"{n / 1024:.1f}k" if n >= 1024 else f"{n}B"
+
+    def feed(self, line):
+        """Consume a raw line; returns (kind, rendered text) for telemetry lines, None otherwise"""
+        if line.startswith(b'@MEMSPIKE '):
+            fields = parse_fields(line[10:].decode('ascii', errors='replace'))
+            self.spike_count += 1
+            self.spikes.append(fields)
+            self.spikes.sort(key=lambda f: f.get('bytes', 0), reverse=True)
+            del self.spikes[self.TOP_SPIKES:]
+            return 'spike', (f"[MEM] spike {self.size(fields.get('bytes', 0))} in "
+                             f"{fields.get('phase', '?')} at iteration {fields.get('iter', '?')}")
+        if not line.startswith(b'@MEM '):
+            return None
+
+        fields = parse_fields(line[5:].decode('ascii', errors='replace'))
+        free = fields.get('free', 0)
+        alloc = fields.get('alloc', 0)
+        self.last = fields
+        self.samples += 1
+        self.history.append((alloc, alloc + free))
+        self.min_free = free if self.min_free is None else min(self.min_free, free)
+        self.max_alloc = max(self.max_alloc, alloc)
+        if fields.get('big'):
+            self.min_big = fields['big'] if self.min_big is None else min(self.min_big, fields['big'])
+        self.max_gc_us = max(self.max_gc_us, fields.get('gcmax', 0))
+        self.max_stack = max(self.max_stack, fields.get('stack', 0))
+
+        return 'sample', (f"[MEM] {self.graph()} alloc {self.size(alloc)} free {self.size(free)} "
+                          f"big {self.size(fields.get('big', 0))} gc {fields.get('gc', 0)} "
+                          f"({fields.get('gcus', 0) / 1000:.1f}ms) stack {fields.get('stack', 0)} "
+                          f"peak {fields.get('peak', '-')}")
+
+    def graph(self):
+        """Sparkline of allocated heap as a fraction of the total heap"""
+        top = len(self.SPARK) - 1
+        return ''.join(self.SPARK[min(top, alloc * top // total) if total else 0]
+                       for alloc, total in self.history)
+
+    def summary(self):
+        if not self.samples:
+            return "No memory telemetry received (run z_mem.Mars_MemProbe on the device)"
+        last = self.last
+        lines = [
+            "Memory Telemetry:",
+            f"  Samples: {self.samples}",
+            f"  Heap: {self.size(last.get('alloc', 0))} allocated, {self.size(last.get('free', 0))} free",
+            f"  Lowest Free: {self.size(self.min_free)}",
+            f"  Highest Allocated: {self.size(self.max_alloc)}",
+            f"  Smallest Largest-Free-Block: {self.size(self.min_big) if self.min_big is not None else '-'}",
+            f"  GC Runs: {last.get('gc', 0)}, longest timed {self.max_gc_us / 1000:.1f}ms",
+            f"  Max Stack Use: {self.max_stack}",
+            f"  Allocation Spikes: {self.spike_count}",
+        ]
+        for spike in self.spikes:
+            lines.append(f"    {self.size(spike.get('bytes', 0)):>8} in {spike.get('phase', '?')} "
+                         f"at iteration {spike.get('iter', '?')} (t={spike.get('t', '?')}ms)")
+        return "\n".join(lines)
+
+
+class ProfileReport:
+    """
+    Collector for the function timing table printed by z_prof.dump().
+
+    '@PROF' lines are gathered until '@PROFEND', then rendered as a table
+    sorted by total time. Each report is compared with the previous one,
+    so a function whose average time grew shows up in the change column.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.previous = {}
+        self.reports = 0
+
+    def feed(self, line):
+        """Consume a raw line; returns (kind, text) for profiler lines, None otherwise"""
+        if line.startswith(b'@PROFEND'):
+            fields = parse_fields(line[8:].decode('ascii', errors='replace'))
+            entries, self.pending = self.pending, []
+            return 'report', self.render(entries, fields.get('enabled', 1))
+        if line.startswith(b'@PROF '):
+            self.pending.append(parse_fields(line[6:].decode('ascii', errors='replace')))
+            return 'report', None
+        return None
+
+    def render(self, entries, enabled=1):
+        if not enabled:
+            return "[PROF] Profiling is disabled on the device (upload with --profile)"
+        if not entries:
+            return "[PROF] No functions registered with z_prof"
+        self.reports += 1
+        entries.sort(key=lambda e: e.get('total', 0), reverse=True)
+        grand = sum(e.get('total', 0) for e in entries) or 1
+        lines = [f"[PROF] Report #{self.reports}",
+                 f"  {'name':<24} {'calls':>8} {'total ms':>10} {'%':>6} {'avg us':>9} {'max us':>9} {'avg change':>11}"]
+        current = {}
+        for e in entries:
+            name = str(e.get('name', '?'))
+            calls = e.get('n', 0)
+            total = e.get('total', 0)
+            avg = total / calls if calls else 0
+            current[name] = avg
+            before = self.previous.get(name)
+            change = f"{(avg - before) / before * 100:+.0f}%" if before else '-'
+            lines.append(f"  {name:<24} {calls:>8} {total / 1000:>10.1f} {total * 100 / grand:>6.1f} "
+                         f"{avg:>9.0f} {e.get('max', 0):>9} {change:>11}")
+        self.previous = current
+        return "\n".join(lines)
+
+
+def learn_usb_identity(port):
+    """
+    USB identity to follow a board opened by plain path, or None.
+
+    Only an identity with a serial number is unique: CH340/CP210x adapters
+    report none, and following VID:PID alone could pick up a second,
+    identical adapter. Those boards stay on their configured path.
+    """
+    identity = port_usb_identity(port)
+    if identity is None or not identity.serial_number:
+        return None
+    return identity
+
+
 class SerialMonitor:
-    def __init__(self,
-                 show_timestamps=True, auto_reconnect=True, raw_repl=False):
+    """
+    Interactive monitor for one device.
+
+    The monitor thread is the only one that touches the port: it streams
+    output and, between reads, runs the operations other threads queue
+    with submit(). The input thread therefore never competes with the
+    reader for bytes, and raw REPL commands see a quiet channel.
+
+    In raw REPL mode the port is not read between commands, so that the
+    board's '>' prompt is left for exec_raw. Only the output of commands
+    typed into the monitor is shown; anything the board prints on its own
+    stays buffered until the next command or until raw mode is left.
+    """
+
+    # Reconnect backoff when no /dev event arrives, in seconds
+    RECONNECT_DELAY_MIN = 0.05
+    RECONNECT_DELAY_MAX = 2.0
+    # How long the input thread waits for a queued command to finish
+    COMMAND_TIMEOUT = 30
+
+    def __init__(self, device=None,
+                 show_timestamps=True, auto_reconnect=True, raw_repl=False, line_filter=None,
+                 pyboard=None):
         """
         Initialize the Serial Monitor
 
@@ -51,14 +471,26 @@ class SerialMonitor:
             show_timestamps: Whether to show timestamps for each line
             auto_reconnect: Whether to automatically reconnect on disconnect
             raw_repl: Start in raw REPL mode
+            line_filter: Optional LineFilter applied to every received line
+            pyboard: Already open Pyboard to use for the first connection
+                (e.g. the one upload.py just used); reconnects open the device anew
         """
-        self.device = os.getenv('DEVICE')
+        self.device = device or (pyboard.device if pyboard else None) or os.getenv('DEVICE')
         self.baud = os.getenv('BAUD')
+        # USB VID/PID/serial of the board, used to find it again under a new path
+        self.identity = parse_usb_spec(self.device) if self.device and self.device.startswith('usb:') else None
+        self.port = None
         self.show_timestamps = show_timestamps
         self.auto_reconnect = auto_reconnect
         self.raw_repl = raw_repl
+        self.line_filter = line_filter
+        self.telemetry = MemoryTelemetry()
+        self.profile = ProfileReport()
 
         self.pyboard = None
+        self.shared_pyboard = pyboard
+        self.watcher = None
+        self.requests = queue.Queue()
         self.running = False
         self.input_thread = None
         self.monitor_thread = None
@@ -69,32 +501,76 @@ class SerialMonitor:
         self.start_time = None
         self.reconnect_count = 0
 
-    def connect(self):
+    def resolve_device(self):
+        """Current path of the board, following it if it re-enumerated elsewhere"""
+        if self.identity is not None:
+            return find_usb_port(self.identity) or self.port or self.device
+        return self.device
+
+    def connect(self, wait=2, quiet=False):
         """Connect to the MicroPython device"""
         try:
-            self.print_status(f"Connecting to {self.device} at {self.baud} baud...")
-
-            self.pyboard = Pyboard(
-                device=self.device,
-                baudrate=self.baud,
-                wait=2,
-                exclusive=True
-            )
+            device = self.resolve_device()
+            if not quiet:
+                self.print_status(f"Connecting to {device} at {self.baud} baud...")
+
+            if self.shared_pyboard is not None:
+                # Adopt the caller's open connection instead of reopening the port
+                pyboard, self.shared_pyboard = self.shared_pyboard, None
+                self.pyboard = pyboard if isinstance(pyboard, ThreadSafePyboard) else ThreadSafePyboard(pyboard)
+            else:
+                self.pyboard = ThreadSafePyboard(Pyboard(
+                    device=device,
+                    baudrate=self.baud,
+                    wait=wait,
+                    exclusive=True
+                ))
+            self.port = self.pyboard.device
+            if self.identity is None:
+                # Remember which USB board this is so a new /dev/ttyUSBn is recognised
+                self.identity = learn_usb_identity(self.port)
 
             if self.raw_repl:
                 self.pyboard.enter_raw_repl(soft_reset=False)
                 self.print_status("Entered RAW REPL mode")
 
-            self.print_status(f"Connected to {self.device}")
+            self.print_status(f"Connected to {self.port}")
             return True
 
         except PyboardError as e:
-            self.print_error(f"Failed to connect: {e}")
+            if not quiet:
+                self.print_error(f"Failed to connect: {e}")
             return False
         except Exception as e:
-            self.print_error(f"Connection error: {e}")
+            if not quiet:
+                self.print_error(f"Connection error: {e}")
             return False
 
+    def reconnect(self):
+        """
+        Reconnect after the board went away.
+
+        Retries as soon as /dev changes, otherwise with exponential backoff.
+        Returns False if the monitor was stopped before the board came back.
+        """
+        self.print_status("Attempting to reconnect...")
+        delay = self.RECONNECT_DELAY_MIN
+        while self.running:
+            if self.connect(wait=0, quiet=True):
+                self.reconnect_count += 1
+                return True
+            if self.watcher.wait(delay):
+                # Something appeared: retry right away, then back off from the start
+                delay = self.RECONNECT_DELAY_MIN
+            else:
+                delay = min(delay * 2, self.RECONNECT_DELAY_MAX)
+        return False
+
+    def restart_connection(self):
+        """Close and reopen the port (the 'reconnect' command)"""
+        self.disconnect()
+        self.connect()
+
     def disconnect(self):
         """Disconnect from the device"""
         if self.pyboard:
@@ -134,26 +610,72 @@ class SerialMonitor:
             return
 
         try:
-            # Try to decode as UTF-8
-            text = data.decode('utf-8', errors='replace')
+            # Split into lines on the raw bytes so filters run before decoding
+            for line in data.splitlines(keepends=True):
+                if not line.strip():  # Only print non-empty lines
+                    continue
+                if line.startswith(b'@'):
+                    parsed = self.telemetry.feed(line) or self.profile.feed(line)
+                    if parsed:
+                        if parsed[1]:
+                            self.print_telemetry(*parsed)
+                        continue
+                if self.line_filter is not None:
+                    if not self.line_filter.accept(line):
+                        continue
+                    line = self.line_filter.colorize(line, Fore.WHITE.encode())
+
+                # Decode as UTF-8
+                text = line.decode('utf-8', errors='replace')
+                timestamp = datetime.now().strftime("%H:%M:%S") if self.show_timestamps else ""
+                prefix = f"[{timestamp}] " if timestamp else ""
+
+                if COLOR_SUPPORT:
+                    print(f"{Fore.WHITE}{prefix}{text.rstrip()}{Style.RESET_ALL}")
+                else:
+                    print(f"{prefix}{text.rstrip()}")
 
-            # Split into lines but preserve line endings
-            lines = text.splitlines(keepends=True)
+            self.bytes_received += len(data)
 
-            for line in lines:
-                if line.strip():  # Only print non-empty lines
-                    timestamp = datetime.now().strftime("%H:%M:%S") if self.show_timestamps else ""
-                    prefix = f"[{timestamp}] " if timestamp else ""
+        except Exception as e:
+            self.print_error(f"Error processing data: {e}")
 
-                    if COLOR_SUPPORT:
-                        print(f"{Fore.WHITE}{prefix}{line.rstrip()}{Style.RESET_ALL}")
-                    else:
-                        print(f"{prefix}{line.rstrip()}")
+    def print_telemetry(self, kind, text):
+        """Print a rendered telemetry line"""
+        timestamp = datetime.now().strftime("%H:%M:%S") if self.show_timestamps else ""
+        prefix = f"[{timestamp}] " if timestamp else ""
+        color = {'spike': Fore.YELLOW, 'report': Fore.GREEN}.get(kind, Fore.MAGENTA)
 
-            self.bytes_received += len(data)
+        if COLOR_SUPPORT:
+            print(f"{color}{prefix}{text}{Style.RESET_ALL}")
+        else:
+            print(f"{prefix}{text}")
 
+    def request_profile(self):
+        """Have the device print its z_prof table; interrupts a running program"""
+        if not self.pyboard:
+            self.print_error("Not connected to device")
+            return
+
+        was_raw = self.raw_repl
+        try:
+            if not was_raw:
+                self.print_status("Interrupting the program to read the profile...")
+                self.pyboard.enter_raw_repl(soft_reset=False)
+            result, error = self.pyboard.exec_raw("import z_prof\nz_prof.dump()")
+            if result:
+                self.print_data(result)
+            if error:
+                self.print_error(error.decode('utf-8', errors='replace'))
         except Exception as e:
-            self.print_error(f"Error processing data: {e}")
+            self.print_error(f"Error reading profile: {e}")
+        finally:
+            if not was_raw:
+                try:
+                    self.pyboard.exit_raw_repl()
+                    self.print_status("Program stopped; use 'reset' to restart it")
+                except Exception as e:
+                    self.print_error(f"Error leaving raw REPL: {e}")
 
     def send_command(self, command):
         """Send a command to the device"""
@@ -181,28 +703,85 @@ class SerialMonitor:
             self.print_error(f"Error sending command: {e}")
             return False
 
+    def submit(self, operation, *args):
+        """Queue operation(*args) to run on the monitor thread; returns a Future for its result"""
+        future = Future()
+        self.requests.put((future, operation, args))
+        return future
+
+    def call(self, operation, *args):
+        """
+        Run operation(*args) on the monitor thread and wait for its result.
+
+        After COMMAND_TIMEOUT seconds this returns None. An operation still
+        waiting in the queue is dropped then, but one that has already
+        started cannot be interrupted: it runs to completion on the monitor
+        thread and its result is discarded.
+        """
+        if not self.monitor_thread or not self.monitor_thread.is_alive():
+            return operation(*args)
+        future = self.submit(operation, *args)
+        try:
+            return future.result(timeout=self.COMMAND_TIMEOUT)
+        except FutureTimeoutError:
+            if future.cancel():
+                self.print_error("Timed out waiting for the device; request dropped")
+            else:
+                self.print_error("Timed out waiting for the device; the operation is still running")
+            return None
+
+    def process_requests(self, timeout=0):
+        """Run queued operations, waiting up to timeout seconds for the first one"""
+        try:
+            item = self.requests.get(timeout=timeout) if timeout else self.requests.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            future, operation, args = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(operation(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            try:
+                item = self.requests.get_nowait()
+            except queue.Empty:
+                return
+
+    def cancel_requests(self):
+        """Fail every operation still waiting in the queue"""
+        while True:
+            try:
+                future, _, _ = self.requests.get_nowait()
+            except queue.Empty:
+                return
+            future.cancel()
+
     def monitor_loop(self):
-        """Main monitoring loop"""
+        """Main monitoring loop; owns all reads and writes on the port"""
         buffer = bytearray()
 
         while self.running:
             try:
                 if not self.pyboard:
-                    if self.auto_reconnect:
-                        self.print_status("Attempting to reconnect...")
-                        if self.connect():
-                            self.reconnect_count += 1
-                            continue
-                        else:
-                            time.sleep(2)  # Wait before retry
-                            continue
-                    else:
-                        break
+                    if self.auto_reconnect and self.reconnect():
+                        continue
+                    break
+
+                # Commands queued by the input thread
+                self.process_requests()
+                if not self.pyboard:
+                    continue
+
+                if self.raw_repl:
+                    # The board is idle in raw REPL; leave its '>' prompt for exec_raw
+                    self.process_requests(timeout=0.01)
+                    continue
 
                 # Check for incoming data
-                if self.pyboard.serial.inWaiting() > 0:
+                if self.pyboard.bytes_waiting() > 0:
                     try:
-                        data = self.pyboard.serial.read(self.pyboard.serial.inWaiting())
+                        data = self.pyboard.read_chunk()
                         if data:
                             buffer.extend(data)
 
@@ -226,7 +805,8 @@ class SerialMonitor:
                         else:
                             break
                 else:
-                    time.sleep(0.01)  # Short sleep to prevent CPU spinning
+                    # Idle: wait briefly, waking at once if a command is queued
+                    self.process_requests(timeout=0.01)
 
             except KeyboardInterrupt:
                 break
@@ -234,13 +814,13 @@ class SerialMonitor:
                 self.print_error(f"Monitor loop error: {e}")
                 if self.auto_reconnect:
                     self.disconnect()
-                    time.sleep(1)
                 else:
                     break
 
         # Print any remaining buffer data
         if buffer:
             self.print_data(bytes(buffer))
+        self.cancel_requests()
 
     def input_loop(self):
         """Handle user input"""
@@ -259,19 +839,22 @@ class SerialMonitor:
                     self.show_help()
                 elif user_input.lower() == 'stats':
                     self.show_stats()
+                elif user_input.lower() == 'mem':
+                    print(self.telemetry.summary())
+                elif user_input.lower() == 'prof':
+                    self.call(self.request_profile)
                 elif user_input.lower() == 'reconnect':
-                    self.disconnect()
-                    self.connect()
+                    self.call(self.restart_connection)
                 elif user_input.lower() == 'raw':
-                    self.toggle_raw_repl()
+                    self.call(self.toggle_raw_repl)
                 elif user_input.lower() in ['exit', 'quit']:
                     self.running = False
                     break
                 elif user_input.lower() == 'reset':
-                    self.send_reset()
+                    self.call(self.send_reset)
                 else:
                     # Send command to device
-                    self.send_command(user_input)
+                    self.call(self.send_command, user_input)
 
             except EOFError:
                 break
@@ -284,8 +867,10 @@ class SerialMonitor:
 Available commands:
   help        - Show this help message
   stats       - Show connection statistics
+  mem         - Show the heap/GC telemetry summary
+  prof        - Stop the program and show its z_prof report
   reconnect   - Reconnect to device
-  raw         - Toggle raw REPL mode
+  raw         - Toggle raw REPL mode (only the output of your commands is shown)
   reset       - Send soft reset (Ctrl+D)
   exit/quit   - Exit monitor
   
@@ -304,12 +889,13 @@ Use Ctrl+C to exit.
 
         stats = f"""
 Connection Statistics:
-  Device: {self.device}
+  Device: {self.port or self.device}
   Baud Rate: {self.baud}
   Uptime: {uptime_str}
   Bytes Received: {self.bytes_received}
   Bytes Sent: {self.bytes_sent}
   Reconnections: {self.reconnect_count}
+  Lines Filtered: {self.line_filter.dropped if self.line_filter else 0}
   Raw REPL Mode: {'Yes' if self.raw_repl else 'No'}
         """
         print(stats)
@@ -345,8 +931,8 @@ Connection Statistics:
         except Exception as e:
             self.print_error(f"Error sending reset: {e}")
 
-    def start(self):
-        """Start the serial monitor"""
+    def start(self, reset=False):
+        """Start the serial monitor; with reset=True soft-reset the board once the reader is running"""
         self.print_status("Starting Serial Monitor...")
         self.print_status(f"Device: {self.device}, Baud: {self.baud}")
 
@@ -355,10 +941,14 @@ Connection Statistics:
 
         self.running = True
         self.start_time = time.time()
+        self.watcher = DeviceWatcher()
 
         # Start monitor thread
         self.monitor_thread = threading.Thread(target=self.monitor_loop, daemon=True)
         self.monitor_thread.start()
+        if reset:
+            # Runs on the monitor thread, so the boot output is read from its first byte
+            self.submit(self.send_reset)
 
         # Start input thread
         self.input_thread = threading.Thread(target=self.input_loop, daemon=True)
@@ -377,16 +967,292 @@ Connection Statistics:
     def stop(self):
         """Stop the serial monitor"""
         self.running = False
-        self.disconnect()
 
+        # Let the monitor thread finish its current operation before closing the port
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(timeout=1)
+        self.cancel_requests()
+        self.disconnect()
+        if self.watcher:
+            self.watcher.close()
 
         self.print_status("Serial monitor stopped")
 
 
-def main():
-    """Main function"""
+class MultiSerialMonitor:
+    """
+    Read-only monitor for several devices at once.
+
+    All ports are serviced from a single asyncio event loop: on POSIX the
+    serial file descriptors are registered with the loop directly, other
+    channels (telnet, Windows COM ports) are polled from a coroutine.
+    Every line is tagged with its device label and a monotonic timestamp
+    shared by all devices, so the output forms one ordered timeline.
+    """
+
+    LABEL_COLORS = [Fore.GREEN, Fore.YELLOW, Fore.MAGENTA, Fore.BLUE, Fore.CYAN, Fore.WHITE]
+
+    def __init__(self, devices, baud=None, layout="merged",
+                 show_timestamps=True, auto_reconnect=True, line_filter=None):
+        """
+        Initialize the multi-device monitor
+
+        Args:
+            devices: List of (label, device path) pairs
+            baud: Baud rate shared by all devices (defaults to BAUD from .env)
+            layout: 'merged' for one interleaved stream, 'panes' for one column per device
+            show_timestamps: Whether to prefix lines with the shared timestamp
+            auto_reconnect: Whether to reopen a device after it disconnects
+            line_filter: Optional LineFilter applied to every received line
+        """
+        self.devices = list(devices)
+        self.baud = baud or os.getenv('BAUD') or 115200
+        self.layout = layout
+        self.show_timestamps = show_timestamps
+        self.auto_reconnect = auto_reconnect
+        self.line_filter = line_filter
+
+        self.label_width = max(len(label) for label, _ in self.devices)
+        self.pane_width = max(20, shutil.get_terminal_size().columns // len(self.devices))
+
+        self.boards = {}
+        self.identities = {label: parse_usb_spec(device) if device.startswith('usb:') else None
+                           for label, device in self.devices}
+        self.watcher = None
+        self.dev_changed = None
+        self.buffers = {label: bytearray() for label, _ in self.devices}
+        self.bytes_received = {label: 0 for label, _ in self.devices}
+        self.start_time = None
+        self.loop = None
+
+    def elapsed(self):
+        """Seconds since the monitor started, shared by all devices"""
+        return time.monotonic() - self.start_time
+
+    def print_status(self, label, message):
+        """Print a status message for one device"""
+        stamp = f"[{self.elapsed():10.3f}] " if self.show_timestamps else ""
+        print(f"{Fore.CYAN}{stamp}[{label}] [MONITOR] {message}{Style.RESET_ALL}")
+
+    def print_line(self, label, line):
+        """Print one complete line received from a device"""
+        if not line.strip():
+            return
+        if self.line_filter is not None:
+            if not self.line_filter.accept(line):
+                return
+            if self.layout != "panes":
+                # Pane columns are padded by length, so only highlight the merged stream
+                line = self.line_filter.colorize(line)
+        text = line.decode('utf-8', errors='replace').rstrip()
+
+        stamp = f"[{self.elapsed():10.3f}] " if self.show_timestamps else ""
+        index = [name for name, _ in self.devices].index(label)
+        color = self.LABEL_COLORS[index % len(self.LABEL_COLORS)]
+
+        if self.layout == "panes":
+            # One column per device; the timestamp stays in the left margin
+            column = text[:self.pane_width - 1].ljust(self.pane_width - 1)
+            pad = " " * (self.pane_width * index)
+            print(f"{stamp}{pad}{color}{column}{Style.RESET_ALL}")
+        else:
+            tag = label.ljust(self.label_width)
+            print(f"{stamp}{color}{tag}{Style.RESET_ALL} | {text}")
+
+    def print_header(self):
+        """Print column titles in pane layout"""
+        if self.layout != "panes":
+            return
+        margin = " " * 13 if self.show_timestamps else ""
+        titles = "".join(label[:self.pane_width - 1].ljust(self.pane_width) for label, _ in self.devices)
+        print(f"{Style.BRIGHT}{margin}{titles}{Style.RESET_ALL}")
+
+    def feed(self, label, data):
+        """Split incoming bytes into lines and print the complete ones"""
+        self.bytes_received[label] += len(data)
+        buffer = self.buffers[label]
+        buffer.extend(data)
+
+        start = 0
+        while True:
+            line_end = buffer.find(b'\n', start)
+            if line_end < 0:
+                break
+            self.print_line(label, bytes(buffer[start:line_end + 1]))
+            start = line_end + 1
+        del buffer[:start]
+
+        # Same limit as the single-device monitor
+        if len(buffer) > 1024:
+            self.print_line(label, bytes(buffer))
+            buffer.clear()
+
+    def open_device(self, label, device, quiet=False):
+        """Open one device, following it by USB identity; returns True on success"""
+        identity = self.identities.get(label)
+        if identity is not None:
+            device = find_usb_port(identity) or device
+        try:
+            pyboard = Pyboard(device=device, baudrate=self.baud, wait=0, exclusive=True)
+        except Exception as e:
+            if not quiet:
+                self.print_status(label, f"Failed to connect to {device}: {e}")
+            return False
+        self.boards[label] = pyboard
+        if identity is None:
+            self.identities[label] = learn_usb_identity(pyboard.device)
+        self.print_status(label, f"Connected to {pyboard.device}")
+        return True
+
+    def on_dev_changed(self):
+        """Event loop callback for the /dev watcher"""
+        self.watcher.drain()
+        self.dev_changed.set()
+
+    async def wait_for_dev_change(self, timeout):
+        """Sleep up to timeout seconds, returning early (True) if /dev changes"""
+        self.dev_changed.clear()
+        try:
+            await asyncio.wait_for(self.dev_changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def close_device(self, label):
+        """Close one device, ignoring errors"""
+        pyboard = self.boards.pop(label, None)
+        if pyboard:
+            if self.loop and self.can_add_reader(pyboard):
+                self.loop.remove_reader(pyboard.serial.fileno())
+            try:
+                pyboard.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def can_add_reader(pyboard):
+        """Whether the channel exposes a file descriptor the event loop can watch"""
+        return os.name != 'nt' and hasattr(pyboard.serial, 'fileno')
+
+    def read_available(self, label, lost):
+        """Read whatever is pending on a device, flagging `lost` on failure"""
+        pyboard = self.boards.get(label)
+        if pyboard is None:
+            return
+        try:
+            # With nothing waiting, read(1) makes pyserial detect a vanished port
+            data = pyboard.read_chunk()
+            if data:
+                self.feed(label, data)
+        except Exception as e:
+            self.lose_device(label, lost, e)
+
+    def lose_device(self, label, lost, error):
+        """Report a read error, close the device and resolve its `lost` future"""
+        self.print_status(label, f"Error reading data: {error}")
+        self.close_device(label)
+        if not lost.done():
+            lost.set_result(True)
+
+    async def watch_device(self, label, device):
+        """Keep one device open and forward its output until cancelled"""
+        delay = None
+        while True:
+            if not self.open_device(label, device, quiet=delay is not None):
+                if not self.auto_reconnect:
+                    return
+                if delay is None or await self.wait_for_dev_change(delay):
+                    delay = SerialMonitor.RECONNECT_DELAY_MIN
+                else:
+                    delay = min(delay * 2, SerialMonitor.RECONNECT_DELAY_MAX)
+                continue
+            delay = None
+
+            lost = self.loop.create_future()
+            pyboard = self.boards[label]
+            if self.can_add_reader(pyboard):
+                self.loop.add_reader(pyboard.serial.fileno(), self.read_available, label, lost)
+                await lost
+            else:
+                while not lost.done():
+                    try:
+                        waiting = pyboard.bytes_waiting()
+                    except Exception as e:
+                        # Only this device is lost; the other watchers keep running
+                        self.lose_device(label, lost, e)
+                        break
+                    if waiting > 0:
+                        self.read_available(label, lost)
+                    else:
+                        await asyncio.sleep(0.01)
+
+            if self.buffers[label]:
+                self.print_line(label, bytes(self.buffers[label]))
+                self.buffers[label].clear()
+            if not self.auto_reconnect:
+                return
+            self.print_status(label, "Attempting to reconnect...")
+            delay = SerialMonitor.RECONNECT_DELAY_MIN
+
+    async def run(self):
+        """Watch all devices until every watcher exits or the task is cancelled"""
+        self.loop = asyncio.get_running_loop()
+        self.start_time = time.monotonic()
+        self.dev_changed = asyncio.Event()
+        self.watcher = DeviceWatcher()
+        if self.watcher.fileno() is not None:
+            self.loop.add_reader(self.watcher.fileno(), self.on_dev_changed)
+        self.print_header()
+        try:
+            await asyncio.gather(*(self.watch_device(label, device) for label, device in self.devices))
+        finally:
+            for label in list(self.boards):
+                self.close_device(label)
+            if self.watcher.fileno() is not None:
+                self.loop.remove_reader(self.watcher.fileno())
+            self.watcher.close()
+
+    def start(self):
+        """Start the monitor; blocks until Ctrl+C"""
+        names = ", ".join(f"{label}={device}" for label, device in self.devices)
+        print(f"{Fore.CYAN}[MONITOR] Watching {names} at {self.baud} baud (Ctrl+C to exit){Style.RESET_ALL}")
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            pass
+
+        total = ", ".join(f"{label}: {n} bytes" for label, n in self.bytes_received.items())
+        print(f"{Fore.CYAN}[MONITOR] Serial monitor stopped ({total}){Style.RESET_ALL}")
+        return True
+
+
+def parse_device_specs(specs):
+    """
+    Turn 'label=path' strings into (label, path) pairs.
+
+    A bare path is labelled by its basename, e.g. '/dev/ttyUSB1' -> 'ttyUSB1'.
+    """
+    devices = []
+    for spec in specs:
+        for item in spec.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            if '=' in item:
+                label, device = item.split('=', 1)
+            else:
+                label, device = os.path.basename(item), item
+            devices.append((label.strip(), device.strip()))
+    return devices
+
+
+def main(pyboard=None, reset=False):
+    """
+    Main function
+
+    pyboard: an open Pyboard to monitor instead of opening DEVICE
+    reset: soft-reset the board once the monitor is reading
+    """
     import argparse
 
     parser = argparse.ArgumentParser(description='MicroPython Serial Monitor')
@@ -398,19 +1264,72 @@ def main():
                         help='Disable automatic reconnection')
     parser.add_argument('--raw-repl',
                         action='store_true',
-                        help='Start in raw REPL mode')
+                        help='Start in raw REPL mode; only the output of typed commands is shown')
+    parser.add_argument('--device',
+                        action='append',
+                        metavar='LABEL=PATH',
+                        help='Watch this device (repeatable); with several devices the '
+                             'monitor runs read-only with a merged timeline. '
+                             'Defaults to DEVICES from .env')
+    parser.add_argument('--layout',
+                        choices=['merged', 'panes'],
+                        default='merged',
+                        help='Multi-device output: one interleaved stream or one column per device')
+
+    parser.add_argument('--include',
+                        action='append',
+                        metavar='PATTERN',
+                        help='Only show lines matching this regex (repeatable)')
+    parser.add_argument('--exclude',
+                        action='append',
+                        metavar='PATTERN',
+                        help='Hide lines matching this regex (repeatable)')
+    parser.add_argument('--highlight',
+                        action='append',
+                        metavar='[COLOR:]PATTERN',
+                        help='Color matches of this regex, yellow by default (repeatable)')
+    parser.add_argument('--rules',
+                        metavar='FILE',
+                        help='Read include/exclude/highlight rules from a file')
 
     args = parser.parse_args()
 
+    try:
+        line_filter = LineFilter.from_args(args.include, args.exclude, args.highlight, args.rules)
+    except (OSError, ValueError, re.error) as e:
+        print(f"Error: invalid filter rules: {e}")
+        return 1
+
+    devices = parse_device_specs(args.device or [os.getenv('DEVICES', '')])
+    if pyboard is not None:
+        devices = [(os.path.basename(pyboard.device), pyboard.device)]
+    if len(devices) > 1:
+        monitor = MultiSerialMonitor(
+            devices,
+            line_filter=line_filter,
+            layout=args.layout,
+            show_timestamps=not args.no_timestamps,
+            auto_reconnect=not args.no_reconnect
+        )
+        try:
+            monitor.start()
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+        return 0
+
     # Create and start monitor
     monitor = SerialMonitor(
+        device=devices[0][1] if devices else None,
         show_timestamps=not args.no_timestamps,
         auto_reconnect=not args.no_reconnect,
-        raw_repl=args.raw_repl
+        raw_repl=args.raw_repl,
+        line_filter=line_filter,
+        pyboard=pyboard
     )
 
     try:
-        monitor.start()
+        monitor.start(reset=reset)
     except KeyboardInterrupt:
         print("\nExiting...")
     except Exception as e:
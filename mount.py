@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Serve a host directory to the device as a remote filesystem
+
+Builds on the _FS idea behind pyboard.py's _injected_import_hook_code:
+a small VFS class is injected into the device over the raw REPL and
+mounted at /remote, and its stat/listdir/read calls travel over the same
+serial link to the MountServer running here. With the device's working
+directory set to /remote, `import main` loads src/main.py straight from
+the host, so an edit needs neither an fs_put into flash nor a reset.
+
+File contents are fetched in fixed-size blocks and kept in an LRU block
+cache on the device. A file's blocks stay valid while its size and mtime
+are unchanged, so repeated imports of unchanged modules cost only a stat.
+
+Example:
+
+    python mount.py                    # serve ./src and run main.main()
+    python mount.py src -c "import z_uart"
+"""
+
+import os
+import stat
+import struct
+import sys
+import time
+
+from pyboard import Pyboard, PyboardError, stdout_write_bytes
+
+# Must match _mount_device_code
+SYNC = b'\x00\x5a'
+CMD_STAT = 1
+CMD_LISTDIR = 2
+CMD_READ = 3
+BLOCK_SIZE = 512
+
+_mount_device_code = """\
+import os, io, sys, struct, micropython
+class _Link:
+  def __init__(self):
+    self.rd = sys.stdin.buffer.read
+    self.wr = sys.stdout.buffer.write
+  def request(self, cmd, body):
+    micropython.kbd_intr(-1)
+    try:
+      self.wr(b'\\x00\\x5a' + struct.pack('<BH', cmd, len(body)))
+      self.wr(body)
+      n = struct.unpack('<i', self.read(4))[0]
+      if n < 0:
+        raise OSError(-n)
+      return self.read(n)
+    finally:
+      micropython.kbd_intr(3)
+  def read(self, n):
+    data = self.rd(n)
+    while len(data) < n:
+      data += self.rd(n - len(data))
+    return data
+class _RemoteFile(io.IOBase):
+  def __init__(self, fs, path, size, text):
+    self.fs = fs
+    self.path = path
+    self.size = size
+    self.text = text
+    self.off = 0
+  def ioctl(self, request, arg):
+    return 0
+  def readinto(self, buf):
+    mv = memoryview(buf)
+    n = 0
+    while n < len(buf) and self.off < self.size:
+      blk, i = divmod(self.off, _BLOCK)
+      data = self.fs.block(self.path, blk)
+      k = min(len(data) - i, len(buf) - n)
+      if k <= 0:
+        break
+      mv[n:n + k] = memoryview(data)[i:i + k]
+      n += k
+      self.off += k
+    return n
+  def read(self, n=-1):
+    left = self.size - self.off
+    buf = bytearray(left if n < 0 or n > left else n)
+    data = bytes(buf[:self.readinto(buf)])
+    return data.decode() if self.text else data
+  def readline(self):
+    line = bytearray()
+    while self.off < self.size:
+      blk, i = divmod(self.off, _BLOCK)
+      data = self.fs.block(self.path, blk)
+      j = data.find(b'\\n', i)
+      j = len(data) if j < 0 else j + 1
+      line.extend(data[i:j])
+      self.off += j - i
+      if line[-1:] == b'\\n':
+        break
+    return line.decode() if self.text else bytes(line)
+  def close(self):
+    self.off = self.size
+  def __enter__(self):
+    return self
+  def __exit__(self, *args):
+    self.close()
+class _RemoteFS:
+  def __init__(self, blocks):
+    self.link = _Link()
+    self.cwd = '/'
+    self.blocks = blocks
+    self.cache = {}
+    self.order = []
+    self.stamp = {}
+    self.hits = self.misses = 0
+  def mount(self, readonly, mkfs):
+    pass
+  def umount(self):
+    pass
+  def chdir(self, path):
+    self.cwd = self._abs(path).rstrip('/') + '/'
+  def getcwd(self):
+    return self.cwd.rstrip('/') or '/'
+  def _abs(self, path):
+    return path if path.startswith('/') else self.cwd + path
+  def stat(self, path):
+    mode, size, mtime = struct.unpack('<III', self.link.request(1, self._abs(path).encode()))
+    return (mode, 0, 0, 0, 0, 0, size, mtime, mtime, mtime)
+  def ilistdir(self, path):
+    data = self.link.request(2, self._abs(path).encode())
+    pos = 0
+    while pos < len(data):
+      mode, size, n = struct.unpack_from('<IIB', data, pos)
+      pos += 9
+      yield (str(data[pos:pos + n], 'utf-8'), mode & 0xf000, 0, size)
+      pos += n
+  def open(self, path, mode):
+    if 'w' in mode or 'a' in mode or '+' in mode:
+      raise OSError(30)
+    st = self.stat(path)
+    if st[0] & 0x4000:
+      raise OSError(21)
+    path = self._abs(path)
+    key = (st[6], st[7])
+    if self.stamp.get(path) != key:
+      for k in [k for k in self.order if k[0] == path]:
+        self.order.remove(k)
+        del self.cache[k]
+      self.stamp[path] = key
+    return _RemoteFile(self, path, st[6], 'b' not in mode)
+  def block(self, path, blk):
+    k = (path, blk)
+    data = self.cache.get(k)
+    if data is not None:
+      self.hits += 1
+      if self.order[-1] != k:
+        self.order.remove(k)
+        self.order.append(k)
+      return data
+    self.misses += 1
+    data = self.link.request(3, struct.pack('<II', blk * _BLOCK, _BLOCK) + path.encode())
+    if len(self.order) >= self.blocks:
+      del self.cache[self.order.pop(0)]
+    self.cache[k] = data
+    self.order.append(k)
+    return data
+  def statvfs(self, path):
+    return (_BLOCK, _BLOCK, 0, 0, 0, 0, 0, 0, 0, 255)
+"""
+
+_mount_run_code = """\
+_BLOCK = %d
+_mount_fs = _RemoteFS(%d)
+os.mount(_mount_fs, '/remote')
+os.chdir('/remote')
+for _m in %r:
+  sys.modules.pop(_m, None)
+try:
+%s
+finally:
+  os.chdir('/')
+  os.umount('/remote')
+  print('mount: cache %%d hits, %%d misses' %% (_mount_fs.hits, _mount_fs.misses))
+"""
+
+
+class MountServer:
+    """
+    Answers the device's filesystem requests from a local directory.
+
+    Paths from the device are relative to the mount point and are never
+    allowed to escape `root`. The server is read-only.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def local_path(self, path):
+        local = os.path.normpath(os.path.join(self.root, path.lstrip('/')))
+        if local != self.root and not local.startswith(self.root + os.sep):
+            raise OSError(2, "outside the mounted directory", path)
+        return local
+
+    def modules(self):
+        """Top-level module and package names the device must re-import from the host"""
+        names = []
+        for entry in sorted(os.listdir(self.root)):
+            if entry.endswith('.py') or entry.endswith('.mpy'):
+                names.append(entry.rsplit('.', 1)[0])
+            elif os.path.isfile(os.path.join(self.root, entry, '__init__.py')):
+                names.append(entry)
+        return names
+
+    def handle(self, cmd, body):
+        """Run one request; returns the reply payload or raises OSError"""
+        self.requests += 1
+        if cmd == CMD_STAT:
+            st = os.stat(self.local_path(body.decode('utf-8')))
+            mode = stat.S_IFDIR if stat.S_ISDIR(st.st_mode) else stat.S_IFREG
+            return struct.pack('<III', mode, st.st_size & 0xFFFFFFFF, int(st.st_mtime) & 0xFFFFFFFF)
+        if cmd == CMD_LISTDIR:
+            local = self.local_path(body.decode('utf-8'))
+            out = bytearray()
+            for entry in sorted(os.listdir(local)):
+                st = os.stat(os.path.join(local, entry))
+                mode = stat.S_IFDIR if stat.S_ISDIR(st.st_mode) else stat.S_IFREG
+                name = entry.encode('utf-8')[:255]
+                out += struct.pack('<IIB', mode, st.st_size & 0xFFFFFFFF, len(name)) + name
+            return bytes(out)
+        if cmd == CMD_READ:
+            offset, size = struct.unpack_from('<II', body)
+            with open(self.local_path(body[8:].decode('utf-8')), 'rb') as f:
+                f.seek(offset)
+                return f.read(size)
+        raise OSError(22, "unknown mount request %d" % cmd)
+
+    def reply(self, serial, cmd, body):
+        try:
+            data = self.handle(cmd, body)
+        except OSError as er:
+            serial.write(struct.pack('<i', -(er.errno or 5)))
+            return
+        serial.write(struct.pack('<i', len(data)) + data)
+        self.bytes_sent += len(data)
+
+
+class MountSession:
+    """
+    Injects the remote VFS into the device, runs `command` with the
+    working directory on the mount, and serves requests until the
+    command finishes. Everything else the device prints goes to `output`.
+    """
+
+    def __init__(self, pyb, root='src', blocks=16, output=stdout_write_bytes):
+        self.pyb = pyb
+        self.server = MountServer(root)
+        self.blocks = blocks
+        self.output = output
+
+    def run(self, command="import main\nmain.main()"):
+        body = '\n'.join('  ' + line for line in command.splitlines()) or '  pass'
+        code = _mount_device_code + _mount_run_code % (BLOCK_SIZE, self.blocks, tuple(self.server.modules()), body)
+        self.pyb.enter_raw_repl(soft_reset=False)
+        self.pyb.exec_raw_no_follow(code)
+        try:
+            self.serve()
+            err = self.pyb.read_until(1, b'\x04', timeout=None)[:-1]
+        finally:
+            self.pyb.exit_raw_repl()
+        if err:
+            raise PyboardError("mount: command failed", b"", err)
+
+    def read_exact(self, n):
+        data = b''
+        while len(data) < n:
+            data += self.pyb.read(n - len(data))
+        return data
+
+    def serve(self):
+        """Forward output and answer requests until the end-of-output marker"""
+        pyb = self.pyb
+        serial = pyb.serial
+        interrupted = False
+        pending = b''
+        while True:
+            try:
+                b = pyb.read(1)
+            except KeyboardInterrupt:
+                if interrupted:
+                    raise
+                interrupted = True
+                serial.write(b'\x03')       # first Ctrl-C interrupts the device program
+                continue
+            if not b:
+                continue
+            if b == b'\x00':
+                if self.read_exact(1) == b'\x5a':
+                    if pending:
+                        self.output(pending)
+                        pending = b''
+                    cmd, n = struct.unpack('<BH', self.read_exact(3))
+                    self.server.reply(serial, cmd, self.read_exact(n))
+                continue
+            if b == b'\x04':
+                break
+            pending += b
+            if b == b'\n' or pyb.bytes_waiting() == 0:
+                self.output(pending)
+                pending = b''
+        if pending:
+            self.output(pending)
+
+
+def main():
+    import argparse
+    import dotenv
+
+    dotenv.load_dotenv()
+    parser = argparse.ArgumentParser(description="Run code on the device with a host directory mounted at /remote")
+    parser.add_argument("directory", nargs="?", default="src", help="local directory to serve [src]")
+    parser.add_argument("-c", "--command", default="import main\nmain.main()",
+                        help="code to run on the device with /remote as the working directory")
+    parser.add_argument("--blocks", type=int, default=16,
+                        help="device-side cache size in %d-byte blocks [16]" % BLOCK_SIZE)
+    args = parser.parse_args()
+
+    pyb = Pyboard(os.environ.get("DEVICE"), os.environ.get("BAUD", 115200))
+    session = MountSession(pyb, args.directory, blocks=args.blocks)
+    start = time.monotonic()
+    try:
+        session.run(args.command.replace('\\n', '\n'))
+    except PyboardError as er:
+        print(er)
+        return 1
+    except KeyboardInterrupt:
+        return 1
+    finally:
+        pyb.close()
+        print("mount: %d requests, %d bytes served in %.1f s" % (
+            session.server.requests, session.server.bytes_sent, time.monotonic() - start))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
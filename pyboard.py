@@ -101,6 +101,44 @@ class PyboardError(Exception):
 
 listdir_result = namedtuple("dir_result", ["name", "st_mode", "st_ino", "st_size"])
 
+usb_identity = namedtuple("usb_identity", ["vid", "pid", "serial_number"])
+
+
+def parse_usb_spec(device):
+    """Parse "usb:VID:PID[:SERIAL]" (hex VID/PID, either may be empty) into a usb_identity."""
+    fields = device[len("usb:") :].split(":", 2) + ["", ""]
+    vid, pid, serial_number = fields[:3]
+    return usb_identity(
+        int(vid, 16) if vid else None, int(pid, 16) if pid else None, serial_number or None
+    )
+
+
+def find_usb_port(identity):
+    """Return the device path of the first port matching identity, or None."""
+    import serial.tools.list_ports
+
+    for port in serial.tools.list_ports.comports():
+        if port.vid is None:
+            continue
+        if identity.vid is not None and port.vid != identity.vid:
+            continue
+        if identity.pid is not None and port.pid != identity.pid:
+            continue
+        if identity.serial_number is not None and port.serial_number != identity.serial_number:
+            continue
+        return port.device
+    return None
+
+
+def port_usb_identity(device):
+    """Return the usb_identity of the port at device, or None if it is not a USB port."""
+    import serial.tools.list_ports
+
+    for port in serial.tools.list_ports.comports():
+        if port.device == device and port.vid is not None:
+            return usb_identity(port.vid, port.pid, port.serial_number)
+    return None
+
 
 class TelnetToSerial:
     def __init__(self, ip, user, password, read_timeout=None):
@@ -278,7 +316,10 @@ class Pyboard:
         timeout=None,
         write_timeout=5,
     ):
+        self.device = device
         self.in_raw_repl = False
+        # bytes read past a data_consumer's ending, returned by the next read
+        self.pushback = b""
         self.use_raw_paste = True
         if device.startswith("exec:"):
             self.serial = ProcessToSerial(device[len("exec:") :])
@@ -301,9 +342,17 @@ class Pyboard:
             if serial.__version__ >= "3.3":
                 serial_kwargs["exclusive"] = exclusive
 
+            # "usb:VID:PID[:SERIAL]" follows the board when it re-enumerates under a new path
+            identity = parse_usb_spec(device) if device.startswith("usb:") else None
+
             delayed = False
             for attempt in range(wait + 1):
                 try:
+                    if identity is not None:
+                        port = find_usb_port(identity)
+                        if port is None:
+                            raise OSError(errno.ENODEV, "no port matches " + device)
+                        device = port
                     if os.name == "nt":
                         self.serial = serial.Serial(**serial_kwargs)
                         self.serial.port = device
@@ -333,6 +382,7 @@ class Pyboard:
                 raise PyboardError("failed to access " + device)
             if delayed:
                 print("")
+            self.device = device
 
     def close(self):
         self.serial.close()
@@ -346,7 +396,9 @@ class Pyboard:
         timeout [s]: Return if timeout between characters. None: Infinite timeout.
         timeout_overall [s]: Return not later than timeout_overall. None: Infinite timeout.
         data_consumer: Use callback for incoming characters.
-            If data_consumer is used then data is not accumulated and the ending must be 1 byte long
+            If data_consumer is used then data is not accumulated and the ending must be 1 byte long.
+            The callback gets everything available as one chunk, cut after the ending; the
+            rest is kept in self.pushback for the next read. The chunk is returned.
 
         It is not visible to the caller why the function returned. It could be ending or timeout.
         """
@@ -359,13 +411,21 @@ class Pyboard:
         while True:
             if data.endswith(ending):
                 break
+            elif data_consumer and (self.pushback or self.serial.inWaiting() > 0):
+                new_data = self.read_chunk()
+                i = new_data.find(ending)
+                if i >= 0:
+                    self.pushback = new_data[i + 1 :]
+                    new_data = new_data[: i + 1]
+                data_consumer(new_data)
+                data = new_data
+                begin_char_s = time.monotonic()
+            elif self.pushback:
+                data = data + self.pushback[:1]
+                self.pushback = self.pushback[1:]
+                begin_char_s = time.monotonic()
             elif self.serial.inWaiting() > 0:
-                new_data = self.serial.read(1)
-                if data_consumer:
-                    data_consumer(new_data)
-                    data = new_data
-                else:
-                    data = data + new_data
+                data = data + self.serial.read(1)
                 begin_char_s = time.monotonic()
             else:
                 if timeout is not None and time.monotonic() >= begin_char_s + timeout:
@@ -378,6 +438,43 @@ class Pyboard:
                 time.sleep(0.01)
         return data
 
+    # Everything that reads the port goes through pushback first: read_until may
+    # have read past its ending, and those bytes belong to the next reader.
+    def bytes_waiting(self):
+        """Number of bytes readable without blocking, pushed-back ones included"""
+        return len(self.pushback) + self.serial.inWaiting()
+
+    def read(self, n):
+        """Read n bytes like serial.read(n), pushed-back ones first"""
+        data = self.pushback[:n]
+        self.pushback = self.pushback[n:]
+        if len(data) < n:
+            data += self.serial.read(n - len(data))
+        return data
+
+    def read_chunk(self):
+        """Return the pushed-back bytes, or else everything the port has buffered"""
+        if self.pushback:
+            data, self.pushback = self.pushback, b""
+            return data
+        return self.serial.read(max(1, self.serial.inWaiting()))
+
+    def read_exact(self, n, timeout=10):
+        """Read exactly n bytes, pushed-back ones first; timeout [s] between characters"""
+        data = bytearray(self.pushback[:n])
+        self.pushback = self.pushback[n:]
+        begin_char_s = time.monotonic()
+        while len(data) < n:
+            waiting = self.serial.inWaiting()
+            if waiting > 0:
+                data.extend(self.serial.read(min(waiting, n - len(data))))
+                begin_char_s = time.monotonic()
+            elif time.monotonic() >= begin_char_s + timeout:
+                raise PyboardError("timeout waiting for %d bytes" % (n - len(data)))
+            else:
+                time.sleep(0.001)
+        return data
+
     def enter_raw_repl(self, soft_reset=True, timeout_overall=10):
         try:
             self._enter_raw_repl_unprotected(soft_reset, timeout_overall)
@@ -388,6 +485,7 @@ class Pyboard:
         self.serial.write(b"\r\x03")  # ctrl-C: interrupt any running program
 
         # flush input (without relying on serial.flushInput())
+        self.pushback = b""
         n = self.serial.inWaiting()
         while n > 0:
             self.serial.read(n)
@@ -442,15 +540,15 @@ class Pyboard:
 
     def raw_paste_write(self, command_bytes):
         # Read initial header, with window size.
-        data = self.serial.read(2)
+        data = self.read(2)
         window_size = struct.unpack("<H", data)[0]
         window_remain = window_size
 
         # Write out the command_bytes data.
         i = 0
         while i < len(command_bytes):
-            while window_remain == 0 or self.serial.inWaiting():
-                data = self.serial.read(1)
+            while window_remain == 0 or self.bytes_waiting():
+                data = self.read(1)
                 if data == b"\x01":
                     # Device indicated that a new window of data can be sent.
                     window_remain += window_size
@@ -489,7 +587,7 @@ class Pyboard:
         if self.use_raw_paste:
             # Try to enter raw-paste mode.
             self.serial.write(b"\x05A\x01")
-            data = self.serial.read(2)
+            data = self.read(2)
             if data == b"R\x00":
                 # Device understood raw-paste command but doesn't support it.
                 pass
@@ -512,7 +610,7 @@ class Pyboard:
         self.serial.write(b"\x04")
 
         # check if we could exec command
-        data = self.serial.read(2)
+        data = self.read(2)
         if data != b"OK":
             raise PyboardError("could not exec command (response: %r)" % data)
 
@@ -596,21 +694,64 @@ class Pyboard:
         )
         self.exec_(cmd, data_consumer=stdout_write_bytes)
 
-    def fs_readfile(self, src, chunk_size=256):
-        buf = bytearray()
-
-        def repr_consumer(b):
-            buf.extend(b.replace(b"\x04", b""))
+    def fs_stream(self, src, consumer, chunk_size=256, limit=-1):
+        """
+        Pass the contents of src to consumer chunk by chunk and return the byte count.
 
+        One loop on the device reads up to chunk_size bytes at a time (at most limit
+        bytes in total, -1 for the whole file) and writes each chunk as a binary frame
+        b"\x01" + <H length + data, then b"\x00" at the end. Only one chunk is held
+        on either side, so memory use does not depend on the file size.
+        """
         cmd = (
-            "with open('%s', 'rb') as f:\n while 1:\n"
-            "  b=f.read(%u)\n  if not b:break\n  print(b,end='')" % (src, chunk_size)
+            "import sys\nw=sys.stdout.buffer.write\nb=bytearray(%u)\nm=memoryview(b)\nl=%d\n"
+            "with open('%s','rb') as f:\n while l:\n"
+            "  n=f.readinto(m if l<0 or l>=len(b) else m[:l])\n  if not n:break\n"
+            "  w(bytes((1,n&255,n>>8)))\n  w(m[:n])\n  l-=n\nw(b'\\x00')"
+            % (chunk_size, limit, src)
         )
+        assert 0 < chunk_size < 0x10000
+        total = 0
         try:
-            self.exec_(cmd, data_consumer=repr_consumer)
+            self.exec_raw_no_follow(cmd)
+            while True:
+                tag = self.read_exact(1)
+                if tag == b"\x01":
+                    n = struct.unpack("<H", self.read_exact(2))[0]
+                    consumer(self.read_exact(n))
+                    total += n
+                elif tag == b"\x00":
+                    break
+                elif tag == b"\x04":
+                    # the device raised before or between frames
+                    ret_err = self.read_until(1, b"\x04")
+                    raise PyboardError("exception", b"", ret_err[:-1])
+                else:
+                    raise PyboardError("fs_stream: unexpected frame %r" % tag)
+            _, ret_err = self.follow(10)
+            if ret_err:
+                raise PyboardError("exception", b"", ret_err)
         except PyboardError as e:
             raise e.convert(src)
-        return ast.literal_eval(buf.decode())
+        return total
+
+    def fs_readfile(self, src, chunk_size=256, buf=None):
+        """
+        Return the contents of src as bytes, or with buf (a writable buffer) read
+        at most len(buf) bytes into it and return the number read.
+        """
+        if buf is None:
+            data = bytearray()
+            self.fs_stream(src, data.extend, chunk_size)
+            return bytes(data)
+        mv = memoryview(buf)
+        pos = [0]
+
+        def buf_consumer(b):
+            mv[pos[0] : pos[0] + len(b)] = b
+            pos[0] += len(b)
+
+        return self.fs_stream(src, buf_consumer, chunk_size, limit=len(mv))
 
     def fs_writefile(self, dest, data, chunk_size=256):
         self.exec_("f=open('%s','wb')\nw=f.write" % dest)
@@ -637,26 +778,30 @@ class Pyboard:
     def fs_get(self, src, dest, chunk_size=256, progress_callback=None):
         if progress_callback:
             src_size = self.fs_stat(src).st_size
-            written = 0
-        self.exec_("f=open('%s','rb')\nr=f.read" % src)
-        with open(dest, "wb") as f:
-            while True:
-                data = bytearray()
-                self.exec_("print(r(%u))" % chunk_size, data_consumer=lambda d: data.extend(d))
-                assert data.endswith(b"\r\n\x04")
-                try:
-                    data = ast.literal_eval(str(data[:-3], "ascii"))
-                    if not isinstance(data, bytes):
-                        raise ValueError("Not bytes")
-                except (UnicodeError, ValueError) as e:
-                    raise PyboardError("fs_get: Could not interpret received data: %s" % str(e))
-                if not data:
-                    break
-                f.write(data)
-                if progress_callback:
-                    written += len(data)
-                    progress_callback(written, src_size)
-        self.exec_("f.close()")
+        # dest is created on the first chunk, so a missing src leaves no local file
+        written = [0]
+        out = []
+
+        def file_consumer(b):
+            if not out:
+                out.append(open(dest, "wb"))
+            out[0].write(b)
+            if progress_callback:
+                written[0] += len(b)
+                progress_callback(written[0], src_size)
+
+        try:
+            self.fs_stream(src, file_consumer, chunk_size)
+            if not out:
+                out.append(open(dest, "wb"))  # empty src
+        except BaseException:
+            if out:
+                out[0].close()
+                os.remove(dest)  # don't leave a partial copy behind
+            raise
+        finally:
+            if out:
+                out[0].close()
 
     def fs_put(self, src, dest, chunk_size=256, progress_callback=None):
         if progress_callback:
@@ -695,6 +840,48 @@ class Pyboard:
 setattr(Pyboard, "exec", Pyboard.exec_)
 
 
+class ThreadSafePyboard:
+    """Thread-safe facade for a Pyboard.
+
+    Every method call on the wrapped board holds a re-entrant lock, so calls
+    from different threads (e.g. an exec_ and a close) cannot interleave on
+    the serial channel. Use "with pyb:" to hold the lock across a sequence of
+    calls such as enter_raw_repl/exec_/exit_raw_repl. Plain attributes, and
+    in particular pyb.serial, are read through unlocked; code reading the
+    port directly must be its only user or hold the lock itself. Attribute
+    assignments (e.g. use_raw_paste = False) are made on the wrapped board.
+    """
+
+    def __init__(self, pyb):
+        import threading
+
+        object.__setattr__(self, "pyb", pyb)
+        object.__setattr__(self, "lock", threading.RLock())
+
+    def __getattr__(self, name):
+        attr = getattr(self.pyb, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self.lock:
+                return attr(*args, **kwargs)
+
+        return locked
+
+    def __setattr__(self, name, value):
+        with self.lock:
+            setattr(self.pyb, name, value)
+
+    def __enter__(self):
+        """Take the lock and return the raw Pyboard; only use it inside the with block."""
+        self.lock.acquire()
+        return self.pyb
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.lock.release()
+
+
 def execfile(filename, device="/dev/ttyACM0", baudrate=115200, user="micro", password="python"):
     pyb = Pyboard(device, baudrate, user, password)
     pyb.enter_raw_repl()
@@ -1,8 +1,31 @@
 #!/usr/bin/env python3
+"""
+Upload changed files and watch the board restart, over one connection.
+
+The port opened for the upload is handed to the monitor, which starts
+reading before the soft reset is sent, so the boot log is shown from its
+first line and there is no reopen delay between the two steps.
+"""
+
+import os
+import sys
+
+import dotenv
 
 import upload, monitor
+from pyboard import Pyboard, PyboardError
+
+
 def main():
-    upload.upload_changed_files()
-    monitor.main()
+    dotenv.load_dotenv()
+    try:
+        pyb = Pyboard(os.environ.get("DEVICE"), os.environ.get("BAUD", 115200))
+    except PyboardError as e:
+        print(f"Error: {e}")
+        return 1
+    upload.upload_changed_files(pyb=pyb)
+    return monitor.main(pyboard=pyb, reset=True)
+
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
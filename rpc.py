@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Host-side RPC proxy for MicroPython devices
+
+Calls functions on the device through the resident dispatcher in
+src/z_rpc.py instead of sending source text through exec_. Arguments and
+results travel as small struct-encoded frames, so a call costs a few
+dozen bytes on the wire and no compilation on the device.
+
+Example:
+
+    from rpc import DeviceProxy
+    with DeviceProxy(pyb, module='main') as car:
+        car.car_run(800, 0)
+        car.arm_move_4(1800, 1800, 1900, 1900, 1000)
+        car.uart.uart_send_str('#021P1500T1000!')
+"""
+
+import os
+import struct
+import sys
+import time
+
+from pyboard import Pyboard, PyboardError, stdout_write_bytes
+
+# Must match src/z_rpc.py
+SYNC = b'\x00\xa5'
+
+
+class RemoteError(PyboardError):
+    """An exception raised by the called function on the device"""
+
+
+def encode_value(v, out):
+    """
+    Append the tagged encoding of v to out (bytearray).
+
+    ints must fit in int64. floats travel as float32, the precision of
+    MicroPython's float on the ESP32, so they keep about 7 significant
+    digits; pass a str or a scaled int when more is needed.
+    """
+    if v is None:
+        out += b'N'
+    elif v is True:
+        out += b'T'
+    elif v is False:
+        out += b'F'
+    elif isinstance(v, int):
+        if -0x80000000 <= v <= 0x7fffffff:
+            out += b'i' + struct.pack('<i', v)
+        elif -0x8000000000000000 <= v <= 0x7fffffffffffffff:
+            out += b'q' + struct.pack('<q', v)
+        else:
+            raise ValueError("int %d does not fit in 64 bits" % v)
+    elif isinstance(v, float):
+        out += b'f' + struct.pack('<f', v)
+    elif isinstance(v, str):
+        data = v.encode('utf-8')
+        out += b's' + struct.pack('<H', len(data)) + data
+    elif isinstance(v, (bytes, bytearray)):
+        out += b'b' + struct.pack('<H', len(v)) + v
+    elif isinstance(v, (list, tuple)):
+        out += b'l' + struct.pack('<H', len(v))
+        for item in v:
+            encode_value(item, out)
+    else:
+        raise TypeError("cannot send %s to the device" % type(v).__name__)
+
+
+def decode_value(buf, pos=0):
+    """Decode one value from buf at pos; returns (value, new pos)"""
+    tag = buf[pos:pos + 1]
+    pos += 1
+    if tag == b'N':
+        return None, pos
+    if tag == b'T':
+        return True, pos
+    if tag == b'F':
+        return False, pos
+    if tag == b'i':
+        return struct.unpack_from('<i', buf, pos)[0], pos + 4
+    if tag == b'q':
+        return struct.unpack_from('<q', buf, pos)[0], pos + 8
+    if tag == b'f':
+        return struct.unpack_from('<f', buf, pos)[0], pos + 4
+    n = struct.unpack_from('<H', buf, pos)[0]
+    pos += 2
+    if tag == b's':
+        return buf[pos:pos + n].decode('utf-8'), pos + n
+    if tag == b'b':
+        return bytes(buf[pos:pos + n]), pos + n
+    if tag == b'l':
+        items = []
+        for _ in range(n):
+            v, pos = decode_value(buf, pos)
+            items.append(v)
+        return items, pos
+    raise PyboardError("rpc: bad value tag %r" % tag)
+
+
+class RemoteFunction:
+    """A callable standing for module.name on the device; attribute access extends the name"""
+
+    def __init__(self, proxy, name):
+        self._proxy = proxy
+        self._name = name
+
+    def __getattr__(self, name):
+        return RemoteFunction(self._proxy, self._name + '.' + name)
+
+    def __call__(self, *args):
+        return self._proxy.call(self._name, *args)
+
+
+class DeviceProxy:
+    """
+    Proxy object whose attributes call functions in a device module.
+
+    start() enters raw REPL (without a soft reset) and launches
+    z_rpc.serve(module) on the device; close() stops the dispatcher and
+    returns to the friendly REPL. Anything the device prints while serving
+    is passed to `output`.
+    """
+
+    def __init__(self, pyb, module='main', timeout=5, output=stdout_write_bytes):
+        self.pyb = pyb
+        self.module = module
+        self.timeout = timeout
+        self.output = output
+        self.seq = 0
+        self.running = False
+
+    def start(self):
+        self.pyb.enter_raw_repl(soft_reset=False)
+        self.pyb.exec_raw_no_follow("import z_rpc\nz_rpc.serve(%r)" % self.module)
+        seq, body = self.read_frame()
+        if body:
+            raise PyboardError("rpc: unexpected ready frame")
+        self.running = True
+        return self
+
+    def close(self):
+        if self.running:
+            self.running = False
+            self.send_frame(b'\x00')
+            _, err = self.pyb.follow(self.timeout, self.output)
+            self.pyb.exit_raw_repl()
+            if err:
+                raise PyboardError("rpc: dispatcher failed", b"", err)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return RemoteFunction(self, name)
+
+    def send_frame(self, body):
+        self.seq = (self.seq + 1) & 0xFF
+        self.pyb.serial.write(SYNC + struct.pack('<BH', self.seq, len(body)) + body)
+        return self.seq
+
+    def read_exact(self, n, deadline):
+        data = b''
+        while len(data) < n:
+            if time.monotonic() > deadline:
+                raise PyboardError("rpc: timeout waiting for the device")
+            waiting = self.pyb.bytes_waiting()
+            if waiting:
+                data += self.pyb.read(min(waiting, n - len(data)))
+            else:
+                time.sleep(0.0005)
+        return data
+
+    def read_frame(self):
+        """Read the next frame, forwarding any printed text before it; returns (seq, body)"""
+        deadline = time.monotonic() + self.timeout
+        text = bytearray()
+        prev = b''
+        while True:
+            b = self.read_exact(1, deadline)
+            # Match SYNC over the last two bytes, so a stray 0x00 cannot eat the real one
+            if prev == b'\x00' and b == b'\xa5':
+                break
+            prev = b
+            if b == b'\x00':
+                continue
+            text += b
+            if b == b'\n' and self.output:
+                self.output(bytes(text))
+                text.clear()
+            if b == b'\x04':
+                # The dispatcher died and the raw REPL reported the end of output
+                err = self.pyb.read_until(1, b'\x04', timeout=self.timeout)
+                self.running = False
+                raise PyboardError("rpc: dispatcher exited", bytes(text), err[:-1])
+        if text and self.output:
+            self.output(bytes(text))
+        seq, n = struct.unpack('<BH', self.read_exact(3, deadline))
+        return seq, self.read_exact(n, deadline)
+
+    def call(self, name, *args):
+        """Call module.name(*args) on the device and return its result"""
+        if not self.running:
+            raise PyboardError("rpc: proxy is not started")
+        name_bytes = name.encode('utf-8')
+        body = bytearray(struct.pack('<B', len(name_bytes)) + name_bytes + struct.pack('<B', len(args)))
+        for arg in args:
+            encode_value(arg, body)
+        seq = self.send_frame(bytes(body))
+
+        while True:
+            reply_seq, reply = self.read_frame()
+            if reply_seq == seq:
+                break
+        value, _ = decode_value(reply, 1)
+        if reply[0]:
+            raise RemoteError(value)
+        return value
+
+
+def main():
+    import argparse
+    import ast
+    import dotenv
+
+    dotenv.load_dotenv()
+    parser = argparse.ArgumentParser(description="Call a function on the device through z_rpc")
+    parser.add_argument("function", help="function name in the module, e.g. car_run or uart.uart_send_str")
+    parser.add_argument("args", nargs="*", help="arguments as Python literals")
+    parser.add_argument("--module", default="main", help="device module to call into [main]")
+    parser.add_argument("--repeat", type=int, default=1, help="call N times and report the round-trip time")
+    args = parser.parse_args()
+
+    values = []
+    for arg in args.args:
+        try:
+            values.append(ast.literal_eval(arg))
+        except (ValueError, SyntaxError):
+            values.append(arg)
+
+    pyb = Pyboard(os.environ.get("DEVICE"), os.environ.get("BAUD", 115200))
+    try:
+        with DeviceProxy(pyb, module=args.module) as proxy:
+            func = getattr(proxy, args.function)
+            start = time.monotonic()
+            for _ in range(args.repeat):
+                result = func(*values)
+            elapsed = time.monotonic() - start
+            print(repr(result))
+            if args.repeat > 1:
+                print("%d calls, %.2f ms per round trip" % (args.repeat, elapsed * 1000 / args.repeat))
+    except PyboardError as er:
+        print(er)
+        return 1
+    finally:
+        pyb.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
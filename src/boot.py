@@ -3,7 +3,27 @@
 #esp.osdebug(None)
 #import webrepl
 #webrepl.start()
-from time import sleep
+import time
 
-from main import main
-main()
\ No newline at end of file
+# Imported one at a time so the boot log shows what each module costs;
+# a module's own dependencies are charged to the first module importing them
+BOOT_MODULES = ('z_parser', 'z_uart', 'z_servo', 'z_query', 'wifi', 'main')
+
+
+def boot():
+    start = time.ticks_ms()
+    timings = []
+    for name in BOOT_MODULES:
+        t = time.ticks_us()
+        __import__(name)
+        timings.append((name, time.ticks_diff(time.ticks_us(), t)))
+
+    print('boot: imports ' + ', '.join('%s %d.%01dms' % (name, us // 1000, us % 1000 // 100)
+                                       for name, us in timings))
+    print('boot: ready in %d ms, %d ms after power-on' % (time.ticks_diff(time.ticks_ms(), start), time.ticks_ms()))
+
+    import main
+    main.main()
+
+
+boot()
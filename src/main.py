@@ -1,4 +1,6 @@
 from z_uart import Mars_UART
+from z_servo import Mars_ServoFrame
+from z_query import Mars_ServoQuery
 import wifi
 import time
 
@@ -49,75 +51,122 @@ arm_servo_4_init = 1500
 
 uart = Mars_UART()  # 实例化串口对象
 
+# 预分配的指令帧，控制函数只改写其中的数字
+car_motor_frame = Mars_ServoFrame((car_motor_fl, car_motor_fr, car_motor_bl, car_motor_br), hold=0)
+car_servo_frame = Mars_ServoFrame((car_servo_fl, car_servo_fr, car_servo_bl, car_servo_br))
+car_frame = Mars_ServoFrame((car_motor_fl, car_motor_fr, car_motor_bl, car_motor_br,
+                             car_servo_fl, car_servo_fr, car_servo_bl, car_servo_br), hold=(0, 0, 0, 0, 1, 1, 1, 1))
+arm_frame = Mars_ServoFrame((arm_servo_1, arm_servo_2, arm_servo_3, arm_servo_4))
+arm_one_frame = Mars_ServoFrame((arm_servo_1,))
+
+# 机械臂舵机位置回读，动作完成后查询到位即可继续，不必按最坏情况延时
+arm_query = Mars_ServoQuery(uart, (arm_servo_1, arm_servo_2, arm_servo_3, arm_servo_4))
+
 
 # 三、定义函数
 # 1.定义底盘舵机初始化函数，即再一次对中
 def car_servos_init():
-    Srt = f'#{car_servo_fl:03d}P{car_servo_fl_init:04d}T{1000:04d}!#{car_servo_fr:03d}P{car_servo_fr_init:04d}T{1000:04d}!#{car_servo_bl:03d}P{car_servo_bl_init:04d}T{1000:04d}!#{car_servo_br:03d}P{car_servo_br_init:04d}T{1000:04d}!'
-    print(Srt)
+    f = car_servo_frame
+    f.set(0, car_servo_fl_init, 1000)
+    f.set(1, car_servo_fr_init, 1000)
+    f.set(2, car_servo_bl_init, 1000)
+    f.set(3, car_servo_br_init, 1000)
+    f.send(uart)
     print("Car servos are tunning")
-    uart.uart_send_str(Srt)
 
 
 # 2.小车直行运动函数
 def car_run(run_speed, run_time):
-    Srt = f'#{car_motor_fl:03d}P{car_motor_fl_init - run_speed:04d}T{run_time:04d}!#{car_motor_fr:03d}P{car_motor_fr_init + run_speed:04d}T{run_time:04d}!#{car_motor_bl:03d}P{car_motor_bl_init - run_speed:04d}T{run_time:04d}!#{car_motor_br:03d}P{car_motor_br_init + run_speed:04d}T{run_time:04d}!'
-    print(Srt)
+    f = car_motor_frame
+    f.set(0, car_motor_fl_init - run_speed, run_time)
+    f.set(1, car_motor_fr_init + run_speed, run_time)
+    f.set(2, car_motor_bl_init - run_speed, run_time)
+    f.set(3, car_motor_br_init + run_speed, run_time)
+    f.send_changed(uart)
     print("Car is running")
-    uart.uart_send_str(Srt)
 
 
 # 3.定义小车转弯运动  
 def car_turn(turn_angle, turn_time):
-    Srt = f'#{car_servo_fl:03d}P{car_servo_fl_init - turn_angle:04d}T{turn_time:04d}!#{car_servo_fr:03d}P{car_servo_fr_init - turn_angle:04d}T{turn_time:04d}!#{car_servo_bl:03d}P{car_servo_bl_init + turn_angle:04d}T{turn_time:04d}!#{car_servo_br:03d}P{car_servo_br_init + turn_angle:04d}T{turn_time:04d}!'
-    print(Srt)
+    f = car_servo_frame
+    f.set(0, car_servo_fl_init - turn_angle, turn_time)
+    f.set(1, car_servo_fr_init - turn_angle, turn_time)
+    f.set(2, car_servo_bl_init + turn_angle, turn_time)
+    f.set(3, car_servo_br_init + turn_angle, turn_time)
+    f.send_changed(uart)
     print("Car is turning")
-    uart.uart_send_str(Srt)
 
 
 # 4.小车运动+转向
 def car_run_and_turn(run_speed, turn_angle, run_time):
-    Srt = f'#{car_motor_fl:03d}P{car_motor_fl_init - run_speed:04d}T{run_time:04d}!#{car_motor_fr:03d}P{car_motor_fr_init + run_speed:04d}T{run_time:04d}!#{car_motor_bl:03d}P{car_motor_bl_init - run_speed:04d}T{run_time:04d}!#{car_motor_br:03d}P{car_motor_br_init + run_speed:04d}T{run_time:04d}!#{car_servo_fl:03d}P{car_servo_fl_init - turn_angle:04d}T{run_time:04d}!#{car_servo_fr:03d}P{car_servo_fr_init - turn_angle:04d}T{run_time:04d}!#{car_servo_bl:03d}P{car_servo_bl_init + turn_angle:04d}T{run_time:04d}!#{car_servo_br:03d}P{car_servo_br_init + turn_angle:04d}T{run_time:04d}!'
-    print(Srt)
+    f = car_frame
+    f.set(0, car_motor_fl_init - run_speed, run_time)
+    f.set(1, car_motor_fr_init + run_speed, run_time)
+    f.set(2, car_motor_bl_init - run_speed, run_time)
+    f.set(3, car_motor_br_init + run_speed, run_time)
+    f.set(4, car_servo_fl_init - turn_angle, run_time)
+    f.set(5, car_servo_fr_init - turn_angle, run_time)
+    f.set(6, car_servo_bl_init + turn_angle, run_time)
+    f.set(7, car_servo_br_init + turn_angle, run_time)
+    f.send_changed(uart)
     print("Car is running and turning")
-    uart.uart_send_str(Srt)
 
 
 # 5.小车停止函数 #停止车轮和转向
 def car_stop():
-    Srt = f'#{car_motor_fl:03d}P{car_motor_fl_init}T1000!#{car_motor_fr:03d}P{car_motor_fr_init}T1000!#{car_motor_bl:03d}P{car_motor_bl_init}T1000!#{car_motor_br:03d}P{car_motor_br_init}T1000!#{car_servo_fl:03d}P{car_servo_fl_init}T1000!#{car_servo_fr:03d}P{car_servo_fr_init}T1000!#{car_servo_bl:03d}P{car_servo_bl_init}T1000!#{car_servo_br:03d}P{car_servo_br_init}T1000!'
-    print(Srt)
+    f = car_frame
+    f.set(0, car_motor_fl_init, 1000)
+    f.set(1, car_motor_fr_init, 1000)
+    f.set(2, car_motor_bl_init, 1000)
+    f.set(3, car_motor_br_init, 1000)
+    f.set(4, car_servo_fl_init, 1000)
+    f.set(5, car_servo_fr_init, 1000)
+    f.set(6, car_servo_bl_init, 1000)
+    f.set(7, car_servo_br_init, 1000)
+    f.send_changed(uart)
     print("Car is stopping")
-    uart.uart_send_str(Srt)
 
 
 # 三、定义函数
 # 1. 定义底盘舵机初始化函数，即再一次对中
 def arm_servos_init():
-    Srt = f'#{arm_servo_1:03d}P{arm_servo_1_init:04d}T{1000:04d}!#{arm_servo_2:03d}P{arm_servo_2_init:04d}T{1000:04d}!#{arm_servo_3:03d}P{arm_servo_3_init:04d}T{1000:04d}!#{arm_servo_4:03d}P{arm_servo_4_init:04d}T{1000:04d}!'
-    print(Srt)
+    f = arm_frame
+    f.set(0, arm_servo_1_init, 1000)
+    f.set(1, arm_servo_2_init, 1000)
+    f.set(2, arm_servo_3_init, 1000)
+    f.set(3, arm_servo_4_init, 1000)
+    f.send(uart)
     print("Arm servos are tunning")
-    uart.uart_send_str(Srt)
 
 
 # 2. 定义机械臂运动——任何1个关节运动，需要传递arm_id,arm_ang,move_time-ID号、角度和时间
 def arm_move_1(arm_id, arm_ang, move_time):
-    armSrt = f'#{arm_id:03d}P{arm_ang:04d}T{move_time:04d}!'
-    print(armSrt)
+    f = arm_one_frame
+    f.set_id(0, arm_id)
+    f.set(0, arm_ang, move_time)
+    f.send(uart)
     print(arm_id, "is running")
-    uart.uart_send_str(armSrt)
 
 
 # 4定义机械臂运动——4个关节的运动， 需要传递arm_ang1,arm_ang2,arm_ang3,arm_ang4,move_time
 def arm_move_4(arm_ang1, arm_ang2, arm_ang3, arm_ang4, move_time):
-    armSrt = f'#{arm_servo_1:03d}P{arm_ang1:04d}T{move_time:04d}!#{arm_servo_2:03d}P{arm_ang2:04d}T{move_time:04d}!#{arm_servo_3:03d}P{arm_ang3:04d}T{move_time:04d}!#{arm_servo_4:03d}P{arm_ang4:04d}T{move_time:04d}!'
-    print(armSrt)
+    f = arm_frame
+    f.set(0, arm_ang1, move_time)
+    f.set(1, arm_ang2, move_time)
+    f.set(2, arm_ang3, move_time)
+    f.set(3, arm_ang4, move_time)
+    f.send(uart)
     print("Arm is running")
-    uart.uart_send_str(armSrt)
+
+
+# 等待机械臂舵机到达目标，arm_ids 为 None 时代表全部4个舵机；舵机不应答时最多等待 timeout_ms
+def arm_wait(arm_ids, arm_angs, timeout_ms=2000):
+    if not arm_query.wait_arrival(arm_angs, arm_ids, timeout_ms=timeout_ms):
+        print("Arm arrival timeout")
 
 
 def main():
-    # wifi.connect_wifi()
+    # wifi.start_background()  # 后台连接Wi-Fi并发送测试请求，不阻塞小车启动
     #     global uart,car_run_speed,car_run_time,car_turn_angle,car_turn_time
 
 
@@ -175,47 +224,47 @@ def main():
     # 单个关节测试
     # 机械臂1号舵机先转到2000，再转到1000，最后回到初始位置
     arm_move_1(arm_servo_1, 2000, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_1,), (2000,))
 
     arm_move_1(arm_servo_1, 1000, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_1,), (1000,))
 
     arm_move_1(arm_servo_1, arm_servo_1_init, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_1,), (arm_servo_1_init,))
 
     # 机械臂2号舵机先转到2000，再转到1000，最后回到初始位置
     arm_move_1(arm_servo_2, 2000, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_2,), (2000,))
 
     arm_move_1(arm_servo_2, 1000, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_2,), (1000,))
 
     arm_move_1(arm_servo_2, arm_servo_2_init, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_2,), (arm_servo_2_init,))
 
     # 机械臂3号舵机先转到2000，再转到1000，最后回到初始位置
     arm_move_1(arm_servo_3, 2000, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_3,), (2000,))
 
     arm_move_1(arm_servo_3, 1000, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_3,), (1000,))
 
     arm_move_1(arm_servo_3, arm_servo_3_init, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_3,), (arm_servo_3_init,))
 
     # 机械臂4号舵机先转到2000，再转到1000，最后回到初始位置
     arm_move_1(arm_servo_4, 2000, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_4,), (2000,))
 
     arm_move_1(arm_servo_4, 1000, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_4,), (1000,))
 
     arm_move_1(arm_servo_4, arm_servo_4_init, 1000)  # 机械臂1号舵机运动
-    time.sleep(2)
+    arm_wait((arm_servo_4,), (arm_servo_4_init,))
 
     # 机械臂的4个舵机同时调试
     # 1234关节
     arm_move_4(1800, 1800, 1900, 1900, 1000)
-    time.sleep(2)
+    arm_wait(None, (1800, 1800, 1900, 1900))
     arm_move_4(1300, 1400, 1600, 1200, 1000)
-    time.sleep(2)
+    arm_wait(None, (1300, 1400, 1600, 1200))
@@ -1,34 +1,87 @@
-import network
 import time
-import urequests
 
 # Replace with your network name (SSID) and password
 ssid = 'k88936_mobile'
 password = 'k8893666'
 
-def connect_wifi():
+# State of the background connection, see start_background()
+status = 'idle'  # idle / connecting / connected / posted / failed / error
+ifconfig = None
+elapsed_ms = 0
+
+
+def _wlan():
+    # network is imported on first use: loading it at import time slows down boot
+    import network
     wlan = network.WLAN(network.STA_IF)
     wlan.active(True)
+    return wlan
+
 
+def associate(timeout_ms=10000):
+    """Join the access point; returns the WLAN object, or None after timeout_ms"""
+    wlan = _wlan()
     if not wlan.isconnected():
         print('Connecting to network...')
         wlan.connect(ssid, password)
 
-        # Wait for connection (timeout in 10 seconds)
-        timeout = 10
-        while not wlan.isconnected() and timeout > 0:
-            time.sleep(1)
-            timeout -= 1
+        start = time.ticks_ms()
+        while not wlan.isconnected() and time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+            time.sleep_ms(100)
 
-    if wlan.isconnected():
-        url = "http://httpbin.org/post"
-        data = '{"name": "ESP32", "value": 42}'
-        headers = {'Content-Type': 'application/json'}
+    return wlan if wlan.isconnected() else None
 
+
+def post_hello(timeout=5):
+    """Send the test POST to httpbin and print the reply"""
+    import urequests
+    url = "http://httpbin.org/post"
+    data = '{"name": "ESP32", "value": 42}'
+    headers = {'Content-Type': 'application/json'}
+
+    try:
+        response = urequests.post(url, data=data, headers=headers, timeout=timeout)
+    except TypeError:
+        # urequests builds without the timeout argument
         response = urequests.post(url, data=data, headers=headers)
-        print(response.text)
-        response.close()
+    print(response.text)
+    response.close()
+
+
+def connect_wifi(timeout_ms=10000):
+    """Connect and send the test request, blocking until both are done"""
+    wlan = associate(timeout_ms)
+    if wlan:
+        post_hello()
         print('Connected!')
         print('Network config:', wlan.ifconfig())
     else:
-        print('Failed to connect.')
\ No newline at end of file
+        print('Failed to connect.')
+
+
+def _background(timeout_ms, http_timeout, post):
+    global status, ifconfig, elapsed_ms
+    start = time.ticks_ms()
+    try:
+        status = 'connecting'
+        wlan = associate(timeout_ms)
+        if wlan is None:
+            status = 'failed'
+            return
+        ifconfig = wlan.ifconfig()
+        status = 'connected'
+        if post:
+            post_hello(http_timeout)
+            status = 'posted'
+    except Exception as e:
+        status = 'error'
+        print('wifi:', e)
+    finally:
+        elapsed_ms = time.ticks_diff(time.ticks_ms(), start)
+        print('wifi: %s after %d ms' % (status, elapsed_ms), ifconfig or '')
+
+
+def start_background(timeout_ms=10000, http_timeout=5, post=True):
+    """Connect (and optionally send the test request) on a separate thread; returns at once"""
+    import _thread
+    _thread.start_new_thread(_background, (timeout_ms, http_timeout, post))
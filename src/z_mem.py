@@ -0,0 +1,105 @@
+'''
+内存与垃圾回收(GC)遥测
+在主循环的各个阶段调用 mark(阶段名)，本模块记录两次 mark 之间新分配的内存，
+超过 spike_bytes 时立即输出一行 @MEMSPIKE；每隔 period_ms 输出一行 @MEM 采样：
+  @MEM t=毫秒 free=空闲字节 alloc=已分配字节 big=最大空闲块 gc=GC次数 gcus=最近一次GC耗时us gcmax=最长GC耗时us stack=栈使用 iter=mark次数 peak=周期内单次最大分配@阶段
+  @MEMSPIKE t=毫秒 iter=mark次数 phase=阶段名 bytes=分配字节
+主机端 monitor.py 识别这两种行，画出内存曲线并在 mem 命令中给出汇总。
+
+MicroPython 没有 GC 次数的接口：调用 collect() 的 GC 会计时；两次 mark 之间已分配
+内存变少，说明发生了一次自动 GC，也计入次数(不计时)。
+最大空闲块用二分法试分配得到，每次尝试失败都会触发一次 GC，所以每 big_every 次采样才测一次。
+'''
+
+import gc
+import time
+import micropython
+
+
+class Mars_MemProbe(object):
+    def __init__(self, period_ms=1000, spike_bytes=1024, big_every=10):
+        self.period_ms = period_ms              # @MEM 采样周期
+        self.spike_bytes = spike_bytes          # 单次分配超过它时输出 @MEMSPIKE，0代表不输出
+        self.big_every = big_every              # 每几次采样测一次最大空闲块，0代表不测
+        self.iter = 0                           # mark 次数
+        self.gc_count = 0                       # GC 次数(计时的 + 推断出的自动GC)
+        self.gc_us = 0                          # 最近一次计时GC的耗时
+        self.gc_us_max = 0                      # 最长的计时GC耗时
+        self.peak = 0                           # 本周期内两次 mark 之间的最大分配量
+        self.peak_phase = '-'                   # 最大分配发生的阶段
+        self.big = 0                            # 最近一次测得的最大空闲块
+        self.samples = 0                        # 已输出的采样数
+        self.last_ms = time.ticks_ms()          # 上次采样时间
+        self.prev_alloc = gc.mem_alloc()        # 上次 mark 时的已分配量
+
+    # 计时的垃圾回收，可以在空闲时主动调用
+    def collect(self):
+        t = time.ticks_us()
+        gc.collect()
+        us = time.ticks_diff(time.ticks_us(), t)
+        self.gc_count += 1
+        self.gc_us = us
+        if us > self.gc_us_max:
+            self.gc_us_max = us
+        self.prev_alloc = gc.mem_alloc()
+
+    # 最大空闲块：二分法试分配，精度16字节
+    def largest_free(self):
+        lo = 0
+        hi = gc.mem_free()
+        while hi - lo > 16:
+            mid = (lo + hi) // 2
+            try:
+                b = bytearray(mid)
+                b = None
+                lo = mid
+            except MemoryError:
+                hi = mid
+        self.prev_alloc = gc.mem_alloc()
+        return lo
+
+    # 每个阶段结束时调用，phase为阶段名(使用字符串常量，不会分配内存)
+    def mark(self, phase='loop'):
+        alloc = gc.mem_alloc()
+        delta = alloc - self.prev_alloc
+        self.prev_alloc = alloc
+        self.iter += 1
+        if delta < 0:                           # 已分配量变少：中间发生过自动GC
+            self.gc_count += 1
+        elif delta > self.peak:
+            self.peak = delta
+            self.peak_phase = phase
+        if self.spike_bytes and delta > self.spike_bytes:
+            print('@MEMSPIKE t=%d iter=%d phase=%s bytes=%d' % (time.ticks_ms(), self.iter, phase, delta))
+            self.prev_alloc = gc.mem_alloc()    # 输出本身的分配不算进下一阶段
+        if time.ticks_diff(time.ticks_ms(), self.last_ms) >= self.period_ms:
+            self.sample()
+
+    # 输出一行 @MEM 采样
+    def sample(self):
+        self.last_ms = time.ticks_ms()
+        if self.big_every and self.samples % self.big_every == 0:
+            self.big = self.largest_free()
+        self.samples += 1
+        print('@MEM t=%d free=%d alloc=%d big=%d gc=%d gcus=%d gcmax=%d stack=%d iter=%d peak=%d@%s' % (
+            self.last_ms, gc.mem_free(), gc.mem_alloc(), self.big, self.gc_count, self.gc_us, self.gc_us_max,
+            micropython.stack_use(), self.iter, self.peak, self.peak_phase))
+        self.peak = 0
+        self.peak_phase = '-'
+        self.prev_alloc = gc.mem_alloc()
+
+
+# 程序入口：制造一些分配，观察输出
+if __name__ == '__main__':
+    mem = Mars_MemProbe(period_ms=500)
+    junk = []
+    for i in range(200):
+        junk.append(bytearray(64))              # 每次循环分配一点
+        if i % 50 == 0:
+            junk.append(bytearray(4096))        # 偶尔一次大分配
+        if len(junk) > 40:
+            junk = []
+        mem.mark('demo')
+        time.sleep_ms(10)
+    mem.collect()
+    mem.sample()
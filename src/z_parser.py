@@ -0,0 +1,154 @@
+'''
+串口帧解析器
+逐字节状态机，从 UART 收到的字节流中切出完整的帧，放入有界队列：
+'<': '>',   # Type1: <...> 格式
+'{': '}',   # Type2: {...} 格式
+'#': '!',   # Type3: #...! 格式
+'$': '!'    # Type4: $...! 格式
+所有缓冲区在构造时一次分配好，解析过程中每个字节只检查一次，不产生新的对象；
+一次读到多帧、帧被拆成几次读到都能正确处理。
+本模块不依赖 machine，可在 CPython 下用假 UART 测试（见文件末尾）。
+'''
+
+# 起始字符 -> 帧类型
+_START = bytearray(256)
+_START[ord('<')] = 1
+_START[ord('{')] = 2
+_START[ord('#')] = 3
+_START[ord('$')] = 4
+# 帧类型 -> 结束字符
+_END = b'\x00>}!!'
+
+
+class Mars_FrameParser(object):
+    def __init__(self, frame_size=64, depth=8, rx_size=128):
+        self.frame_size = frame_size                            # 单帧最大长度，超长的帧丢弃
+        self.depth = depth                                      # 队列深度
+        self.rx = bytearray(rx_size)                            # readinto 用的接收缓冲
+        self.n = depth + 1                                      # 多一个槽给正在接收的帧，避免覆盖未取走的帧
+        self.slots = [bytearray(frame_size) for _ in range(self.n)]  # 帧队列（环形）
+        self.slot_len = [0] * self.n                            # 每个槽中帧的长度
+        self.slot_type = bytearray(self.n)                      # 每个槽中帧的类型 1~4
+        self.head = 0                                           # 下一个要取出的槽
+        self.count = 0                                          # 队列中完整帧的数量
+        self.state = 0                                          # 0-等待起始符；1~4-正在接收该类型的帧
+        self.end = 0                                            # 当前帧的结束符
+        self.pos = 0                                            # 当前帧已写入的长度
+        self.dropped = 0                                        # 因队列满或超长丢弃的帧数
+        self.filter = None                                      # 帧过滤函数 filter(缓冲, 长度, 类型)，返回True的帧不入队
+                                                                # 替换时保存旧的函数，把自己不处理的帧交给它
+
+    # 从 uart 读取已到达的数据并解析，返回读取的字节数
+    def readfrom(self, uart):
+        if not uart.any():
+            return 0
+        n = uart.readinto(self.rx)
+        if n:
+            self.feed(self.rx, n)
+        return n or 0
+
+    # 解析 data 的前 n 个字节
+    def feed(self, data, n=-1):
+        if n < 0:
+            n = len(data)
+        state = self.state
+        end = self.end
+        pos = self.pos
+        size = self.frame_size
+        slot = self.slots[(self.head + self.count) % self.n]
+        for i in range(n):
+            b = data[i]
+            if state == 0:
+                t = _START[b]
+                if t:                                           # 起始符，开始新帧
+                    state = t
+                    end = _END[t]
+                    slot[0] = b
+                    pos = 1
+                continue
+            if pos >= size:                                     # 超长，丢弃并重新同步
+                self.dropped += 1
+                state = 0
+                continue
+            slot[pos] = b
+            pos += 1
+            if b == end:                                        # 帧完整，入队
+                if self.filter is not None and self.filter(slot, pos, state):
+                    pass                                        # 已被过滤函数处理(如舵机应答)
+                elif self.count < self.depth:
+                    tail = (self.head + self.count) % self.n
+                    self.slot_len[tail] = pos
+                    self.slot_type[tail] = state
+                    self.count += 1
+                    slot = self.slots[(tail + 1) % self.n]
+                else:
+                    self.dropped += 1                           # 队列满，丢弃新帧
+                state = 0
+            elif _START[b] == state and b != end:               # 同类型起始符，说明前一帧不完整，从这里重新开始
+                slot[0] = b
+                pos = 1
+        self.state = state
+        self.end = end
+        self.pos = pos
+
+    # 队列中是否有完整的帧
+    def any(self):
+        return self.count
+
+    # 取出一帧，返回(类型, 帧内容bytes)，没有帧时返回(0, None)
+    def get(self):
+        if not self.count:
+            return 0, None
+        i = self.head
+        frame = bytes(self.slots[i][:self.slot_len[i]])
+        t = self.slot_type[i]
+        self.head = (i + 1) % self.n
+        self.count -= 1
+        return t, frame
+
+    # 取出一帧，复制到调用者的 buf 中（不创建 bytes 对象），返回(类型, 长度)
+    def get_into(self, buf):
+        if not self.count:
+            return 0, 0
+        i = self.head
+        n = self.slot_len[i]
+        buf[:n] = self.slots[i][:n]
+        t = self.slot_type[i]
+        self.head = (i + 1) % self.n
+        self.count -= 1
+        return t, n
+
+    # 清空队列和解析状态
+    def clear(self):
+        self.head = 0
+        self.count = 0
+        self.state = 0
+        self.pos = 0
+
+
+# 程序入口：用假 UART 验证解析器，CPython 和设备上都能运行
+if __name__ == '__main__':
+    class FakeUART(object):
+        def __init__(self, chunks):
+            self.chunks = list(chunks)
+
+        def any(self):
+            return len(self.chunks[0]) if self.chunks else 0
+
+        def readinto(self, buf):
+            data = self.chunks.pop(0)
+            buf[:len(data)] = data
+            return len(data)
+
+    # 一次读到两帧、帧被拆开、帧前有杂数据、帧内含其他起始符
+    uart = FakeUART([b'xx<ok>{te', b'st2}$QJ!#0', b'01P1500T1000!<$LEDON!>'])
+    parser = Mars_FrameParser()
+    while uart.any():
+        parser.readfrom(uart)
+    frames = []
+    while parser.any():
+        frames.append(parser.get())
+    print(frames)
+    assert frames == [(1, b'<ok>'), (2, b'{test2}'), (4, b'$QJ!'),
+                      (3, b'#001P1500T1000!'), (1, b'<$LEDON!>')]
+    print('parser ok')
@@ -0,0 +1,150 @@
+'''
+主机远程调用(RPC)分发器
+主机通过 rpc.py 的 DeviceProxy 发送紧凑的二进制帧，本模块在设备端常驻，
+按函数名调用模块中的函数并把返回值编码后发回，避免每次用 exec 重新编译源码。
+
+帧格式(两端一致)：
+  请求: 00 A5 | seq(1) | len(2, 小端) | 名称长度(1) 名称 | 参数个数(1) 参数...
+  应答: 00 A5 | seq(1) | len(2, 小端) | 状态(1, 0成功 1异常) | 返回值或异常信息
+  名称为空的请求表示结束服务
+值编码: N=None T/F=布尔 i=int32 q=int64 f=float32 s=字符串 b=字节串 l=列表/元组
+  超出 int64 的整数报 ValueError；浮点数按 float32 传输(ESP32 上 MicroPython 的浮点精度)，约7位有效数字
+'''
+
+import sys
+import struct
+import micropython
+
+SYNC = b'\x00\xa5'                    # 帧头，0x00 不会出现在 print 输出的文本里
+
+
+def _encode(v, out):
+    # 把一个值追加编码到 out(bytearray)
+    if v is None:
+        out.extend(b'N')
+    elif v is True:
+        out.extend(b'T')
+    elif v is False:
+        out.extend(b'F')
+    elif isinstance(v, int):
+        if -0x80000000 <= v <= 0x7fffffff:
+            out.extend(b'i')
+            out.extend(struct.pack('<i', v))
+        elif -0x8000000000000000 <= v <= 0x7fffffffffffffff:
+            out.extend(b'q')
+            out.extend(struct.pack('<q', v))
+        else:
+            raise ValueError('int too big')
+    elif isinstance(v, float):
+        out.extend(b'f')
+        out.extend(struct.pack('<f', v))
+    elif isinstance(v, str):
+        v = v.encode()
+        out.extend(b's')
+        out.extend(struct.pack('<H', len(v)))
+        out.extend(v)
+    elif isinstance(v, (bytes, bytearray)):
+        out.extend(b'b')
+        out.extend(struct.pack('<H', len(v)))
+        out.extend(v)
+    elif isinstance(v, (list, tuple)):
+        out.extend(b'l')
+        out.extend(struct.pack('<H', len(v)))
+        for item in v:
+            _encode(item, out)
+    else:
+        _encode(repr(v), out)         # 其他类型按字符串返回
+
+
+def _decode(buf, pos):
+    # 从 buf 的 pos 处解码一个值，返回(值, 新位置)
+    tag = buf[pos]
+    pos += 1
+    if tag == 0x4e:                   # N
+        return None, pos
+    if tag == 0x54:                   # T
+        return True, pos
+    if tag == 0x46:                   # F
+        return False, pos
+    if tag == 0x69:                   # i
+        return struct.unpack_from('<i', buf, pos)[0], pos + 4
+    if tag == 0x71:                   # q
+        return struct.unpack_from('<q', buf, pos)[0], pos + 8
+    if tag == 0x66:                   # f
+        return struct.unpack_from('<f', buf, pos)[0], pos + 4
+    n = struct.unpack_from('<H', buf, pos)[0]
+    pos += 2
+    if tag == 0x73:                   # s
+        return str(buf[pos:pos + n], 'utf-8'), pos + n
+    if tag == 0x62:                   # b
+        return bytes(buf[pos:pos + n]), pos + n
+    if tag == 0x6c:                   # l
+        items = []
+        for _ in range(n):
+            v, pos = _decode(buf, pos)
+            items.append(v)
+        return items, pos
+    raise ValueError('bad tag')
+
+
+def _read_exact(rd, n):
+    # 从标准输入读满 n 个字节
+    data = rd(n)
+    while len(data) < n:
+        data += rd(n - len(data))
+    return data
+
+
+def serve(module='main'):
+    # 常驻分发循环：读取请求帧，调用 module 中的函数，发回应答帧
+    ns = __import__(module) if isinstance(module, str) else module
+    rd = sys.stdin.buffer.read
+    wr = sys.stdout.buffer.write
+    cache = {}                        # 函数名 -> 可调用对象
+    out = bytearray()
+
+    micropython.kbd_intr(-1)          # 参数里可能有 0x03，不能当作 Ctrl-C
+    try:
+        wr(SYNC + b'\x00\x00\x00')   # 就绪帧
+        prev = b''
+        while True:
+            # 找帧头：比较最近的两个字节，多出来的 0x00 不会吃掉真正帧头的 0x00
+            b = rd(1)
+            if prev != b'\x00' or b != b'\xa5':
+                prev = b
+                continue
+            prev = b''
+            head = _read_exact(rd, 3)
+            seq = head[0]
+            n = head[1] | (head[2] << 8)
+            body = _read_exact(rd, n)
+
+            name_len = body[0]
+            if not name_len:
+                break                 # 空名称：结束服务
+            name = str(body[1:1 + name_len], 'utf-8')
+            pos = 1 + name_len
+            argc = body[pos]
+            pos += 1
+            args = []
+            for _ in range(argc):
+                v, pos = _decode(body, pos)
+                args.append(v)
+
+            out[:] = b'\x00'          # 状态：成功
+            try:
+                func = cache.get(name)
+                if func is None:
+                    func = ns
+                    for part in name.split('.'):
+                        func = getattr(func, part)
+                    cache[name] = func
+                _encode(func(*args), out)
+            except Exception as e:
+                out[:] = b'\x01'      # 状态：异常
+                _encode('%s: %s' % (type(e).__name__, e), out)
+
+            wr(SYNC + struct.pack('<BH', seq, len(out)))
+            wr(out)
+    finally:
+        micropython.kbd_intr(3)
@@ -0,0 +1,140 @@
+'''
+机械臂关节空间轨迹规划
+输入一串路径点 ((各关节PWM), 时间ms)，相邻路径点之间按最小加加速度(minimum-jerk)曲线插值：
+  s(τ) = 10τ³ - 15τ⁴ + 6τ⁵，起点和终点的速度、加速度都为0，运动平滑
+曲线预先算成整数查找表，运行时只有整数乘法和移位。
+每段的时间取给定时间和速度限制所需时间中较大的一个：最小加加速度曲线的峰值速度为 1.875×距离/时间，
+所以 时间 ≥ 1875×距离/最大速度 (ms，速度单位 PWM/s)。
+规划器按固定周期(默认20ms)把插值点用 Mars_ServoFrame 发到总线，舵机的 T 等于周期，
+舵机在两点之间自己平滑过渡，不再需要按经验调 time.sleep。
+'''
+
+import time
+from array import array
+
+LUT_N = 64                                  # 查找表分段数
+ONE = 4096                                  # 查找表中 1.0 对应的整数
+
+# 最小加加速度曲线查找表，s(0)=0，s(LUT_N)=ONE
+_LUT = array('H', [0] * (LUT_N + 1))
+for _i in range(LUT_N + 1):
+    _t = _i / LUT_N
+    _LUT[_i] = int((10 * _t ** 3 - 15 * _t ** 4 + 6 * _t ** 5) * ONE + 0.5)
+
+
+# 第 k 步(共 n 步)的曲线值，0~ONE，表中相邻两点之间线性插值
+def profile(k, n):
+    if k >= n:
+        return ONE
+    p = k * (LUT_N << 8) // n                 # 8位小数的表下标
+    i = p >> 8
+    a = _LUT[i]
+    return a + (((_LUT[i + 1] - a) * (p & 255)) >> 8)
+
+
+class Mars_ArmPlanner(object):
+    def __init__(self, frame, uart, start, vmax=1000, period_ms=20):
+        self.frame = frame                      # 关节的 Mars_ServoFrame，顺序与路径点中的PWM一致
+        self.uart = uart                        # Mars_UART 对象
+        self.n = frame.n                        # 关节数
+        self.pos = list(start)                  # 当前(最后发送的)各关节PWM
+        self.vmax = vmax if isinstance(vmax, (tuple, list)) else (vmax,) * self.n  # 各关节最大速度 PWM/s
+        self.period_ms = period_ms              # 发送周期
+        self.segments = []                      # 规划好的段：(起点, 终点, 步数)
+        self.seg = 0                            # 正在执行的段
+        self.k = 0                              # 段内的步
+        self.timer = None
+        self._tick_cb = self._tick              # 预先绑定定时器回调
+
+    # 一段运动需要的时间：给定时间和速度限制的较大值
+    def segment_ms(self, a, b, duration_ms=0):
+        t = duration_ms
+        for j in range(self.n):
+            need = 1875 * abs(b[j] - a[j]) // self.vmax[j]
+            if need > t:
+                t = need
+        return t
+
+    # 把路径点 ((PWM...), 时间ms) 规划成段，时间为0时只按速度限制
+    def plan(self, waypoints):
+        segments = []
+        a = tuple(self.pos)
+        for target, duration_ms in waypoints:
+            b = tuple(target)
+            t = self.segment_ms(a, b, duration_ms)
+            steps = max(1, (t + self.period_ms - 1) // self.period_ms)
+            segments.append((a, b, steps))
+            a = b
+        return segments
+
+    # 开始执行路径点，之后每个周期调用一次 update()(或由 start() 的定时器调用)
+    def load(self, waypoints):
+        self.segments = self.plan(waypoints)
+        self.seg = 0
+        self.k = 1
+
+    # 发送下一个插值点，全部完成后返回 False
+    def update(self):
+        if self.seg >= len(self.segments):
+            return False
+        a, b, steps = self.segments[self.seg]
+        s = profile(self.k, steps)
+        frame = self.frame
+        pos = self.pos
+        for j in range(self.n):
+            p = a[j] + (((b[j] - a[j]) * s) >> 12)
+            pos[j] = p
+            frame.set(j, p, self.period_ms)
+        frame.send(self.uart)
+        self.k += 1
+        if self.k > steps:
+            self.seg += 1
+            self.k = 1
+        return True
+
+    # 阻塞执行：按固定周期发送，直到全部路径点完成
+    def run(self, waypoints):
+        self.load(waypoints)
+        next_ms = time.ticks_ms()
+        while self.update():
+            next_ms = time.ticks_add(next_ms, self.period_ms)
+            wait = time.ticks_diff(next_ms, time.ticks_ms())
+            if wait > 0:
+                time.sleep_ms(wait)
+
+    # 后台执行：用硬件定时器按固定周期调用 update()，立即返回
+    def start(self, waypoints, timer_id=3):
+        from machine import Timer
+        self.stop()
+        self.load(waypoints)
+        self.timer = Timer(timer_id)
+        self.timer.init(mode=Timer.PERIODIC, period=self.period_ms, callback=self._tick_cb)
+
+    def _tick(self, timer):
+        if not self.update():
+            self.stop()
+
+    # 停止后台执行，关节停在当前位置
+    def stop(self):
+        if self.timer is not None:
+            self.timer.deinit()
+            self.timer = None
+        self.segments = []
+
+    # 是否还有没执行完的段
+    def busy(self):
+        return self.seg < len(self.segments)
+
+
+# 程序入口：不接串口，把发送的帧打印出来
+if __name__ == '__main__':
+    from z_servo import Mars_ServoFrame
+
+    class PrintUART(object):
+        def uart_send_str(self, s):
+            print(bytes(s))
+
+    frame = Mars_ServoFrame((21, 22), 1500, 20)
+    planner = Mars_ArmPlanner(frame, PrintUART(), (1500, 1500), vmax=2000, period_ms=100)
+    print(planner.plan((((2000, 1400), 0), ((2000, 1400), 300))))
+    planner.run((((2000, 1400), 0), ((1500, 1500), 800)))
@@ -14,6 +14,7 @@ esp32有3个串口，UART0给程序调试下载使用，一般做成TPYEC；
 #导包
 from machine import UART
 import time
+from z_parser import Mars_FrameParser
 
 class Mars_UART(object):
     global uart
@@ -25,6 +26,7 @@ class Mars_UART(object):
         self.uart_receive_str = ''
          # 定义帧类型及其对应的结束符：<...> {...} #...! $...!
         self.uart_send_flag = 0
+        self.parser = Mars_FrameParser()                            # 帧解析器，缓冲区预先分配
 
         self.uart2 = UART(2, self.baud)                             # 使用给定波特率初始化
         self.uart2.init(self.baud, bits=8, parity=None, stop=1)     # 使用给定参数初始化
@@ -38,64 +40,18 @@ class Mars_UART(object):
         self.uart_send_flag = 0
 
     # 串口接收数据，主要处理数据接受格式，主要格式为<...> {...} $...!  #...! 4种格式，...内容长度不限
-    def recv_str(self): 
-        if self.uart2.any() > 0:
-            # 每次最多读取128字节，避免内存溢出
-#             uart2_recv_data = ''
-            uart2_recv_data = self.uart2.read()
-            print("before1: ", uart2_recv_data)
-            self.uart_receive_str =''
-#             self.uart_receive_str = uart2_recv_data.decode("utf-8","ignore")
-#             self.uart_receive_str=self.uart_receive_str[:4]
-            # 使用ignore忽略解码错误
-            self.uart_receive_str = self.uart_receive_str + uart2_recv_data.decode("utf-8","ignore")
-            print("before2: ", self.uart_receive_str)
-        
-        if self.uart_send_flag:
-            self.uart_receive_str = ''
-            self.uart_send_flag = 0
-            print("if self.uart_send_flag")
-            return
-    
-        if len(self.uart_receive_str) < 2:
-#              print("if len(self.uart_receive_str) < 2")
-             return
-        
-        self.mode = 0
-        
-        if self.mode == 0:
-            if self.uart_receive_str.find('<') >= 0:
-                self.mode = 1
-#                 print('mode1 start')
-            elif self.uart_receive_str.find('{') >= 0:
-                self.mode = 2
-#                 print('mode2 start')
-            elif self.uart_receive_str.find('#') >= 0:
-                self.mode = 3
-#                 print('mode3 start')
-            elif self.uart_receive_str.find('$') >= 0:
-                self.mode = 4
-#                 print('mode4 start')
+    # 把已到达的字节交给帧解析器，然后取出一帧；一次读到的多帧会排队，由之后的 recv_frame 依次取出
+    def recv_str(self):
+        self.parser.readfrom(self.uart2)
+        self.recv_frame()
 
-        if self.mode == 1:
-            if self.uart_receive_str.find('>') >= 0:
-                self.uart_get_ok = 1
-                self.mode = 0
-#                 print('mode1 end')
-        elif self.mode == 2:
-            if self.uart_receive_str.find('}') >= 0:
-                self.uart_get_ok = 2
-                self.mode = 0
-#                 print('mode2 end')
-        elif self.mode == 3:
-            if self.uart_receive_str.find('!') >= 0:
-                self.uart_get_ok = 3
-                self.mode = 0
-#                 print('mode3 end')
-        elif self.mode == 4:
-            if self.uart_receive_str.find('!') >= 0:
-                self.uart_get_ok = 4
-                self.mode = 0
-#                 print('mode4 end')
-                
-#         print("end ", "self.uart_get_ok=", self.uart_get_ok, "self.mode=", self.mode)
\ No newline at end of file
+    # 从解析器队列中取出一帧到 uart_receive_str，uart_get_ok 为帧类型 1~4；没有帧时返回 False
+    def recv_frame(self):
+        if self.uart_get_ok:                                        # 上一帧还没处理
+            return True
+        t, frame = self.parser.get()
+        if not t:
+            return False
+        self.uart_receive_str = frame.decode("utf-8", "ignore")    # 使用ignore忽略解码错误
+        self.uart_get_ok = t
+        return True
@@ -4,6 +4,7 @@ import os
 import sys
 import time
 import argparse
+import base64
 import hashlib
 import dotenv
 from pathlib import Path
@@ -13,7 +14,70 @@ from colorama import Fore, Back, Style, init
 init(autoreset=True)
 
 # Import pyboard module from local path
-from pyboard import Pyboard, PyboardError
+from pyboard import Pyboard, PyboardError, stdout_write_bytes
+
+# Must match FLAG_FILE in src/z_prof.py
+PROFILE_FLAG = "/prof.enable"
+
+# Mount point of the in-memory filesystem used by --ram
+RAM_MOUNT = "/ram"
+
+# In-memory VFS for --ram, modelled on pyboard's _injected_import_hook_code.
+# It is defined once per session; later deploys only replace file contents.
+_ram_fs_code = """\
+import os, io, sys
+from binascii import a2b_base64
+class _RamFS:
+  class File(io.IOBase):
+    def __init__(self, data, text):
+      self.data = data
+      self.off = 0
+      self.text = text
+    def ioctl(self, request, arg):
+      return 0
+    def readinto(self, buf):
+      n = min(len(buf), len(self.data) - self.off)
+      buf[:n] = memoryview(self.data)[self.off:self.off + n]
+      self.off += n
+      return n
+    def read(self, n=-1):
+      end = len(self.data) if n < 0 else min(self.off + n, len(self.data))
+      data = self.data[self.off:end]
+      self.off = end
+      return data.decode() if self.text else data
+  def __init__(self):
+    self.files = {}
+  mount = umount = chdir = lambda *args: None
+  def stat(self, path):
+    path = path.strip('/')
+    if path in self.files:
+      return (0x8000, 0, 0, 0, 0, 0, len(self.files[path]), 0, 0, 0)
+    if not path or any(k.startswith(path + '/') for k in self.files):
+      return (0x4000, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+    raise OSError(2)
+  def ilistdir(self, path):
+    path = path.strip('/')
+    prefix = path + '/' if path else ''
+    seen = set()
+    for k in self.files:
+      if k.startswith(prefix):
+        name = k[len(prefix):].split('/')[0]
+        if name not in seen:
+          seen.add(name)
+          yield (name, 0x8000 if prefix + name in self.files else 0x4000, 0, 0)
+  def open(self, path, mode):
+    data = self.files.get(path.strip('/'))
+    if data is None or 'w' in mode or 'a' in mode:
+      raise OSError(2 if data is None else 30)
+    return self.File(data, 'b' not in mode)
+try:
+  _ram_fs
+except NameError:
+  _ram_fs = _RamFS()
+  os.mount(_ram_fs, '%s')
+if sys.path[0] != '%s':
+  sys.path.insert(0, '%s')
+""" % (RAM_MOUNT, RAM_MOUNT, RAM_MOUNT)
 
 
 def get_file_hash(file_path):
@@ -72,13 +136,31 @@ def upload_file(pyb, src_path, dest_path):
         return False
 
 
-def upload_changed_files(src_dir="./src", all_files=False):
-    """Upload changed files from src_dir to pyboard"""
+def set_profiling(pyb, enabled):
+    """Create or remove the flag file that turns on z_prof on the device"""
+    if enabled:
+        print(Fore.YELLOW + f"Enabling profiler ({PROFILE_FLAG})")
+        pyb.fs_touch(PROFILE_FLAG)
+    elif pyb.fs_exists(PROFILE_FLAG):
+        print(Fore.YELLOW + f"Disabling profiler ({PROFILE_FLAG})")
+        pyb.fs_rm(PROFILE_FLAG)
+
+
+def upload_changed_files(src_dir="./src", all_files=False, profile=None, pyb=None):
+    """
+    Upload changed files from src_dir to pyboard; profile=True/False turns z_prof on/off.
+
+    Without pyb a connection is opened, and closed after a soft reset. A
+    caller-owned pyb is left open in the friendly REPL and not reset, so the
+    caller (e.g. reload.py's monitor) can attach before restarting the board.
+    """
+    own = pyb is None
     try:
-        DEVICE = os.environ.get("DEVICE")
-        # Connect to the pyboard
-        print(Fore.GREEN + Style.BRIGHT + f"Connecting to pyboard at {DEVICE}...")
-        pyb = Pyboard(DEVICE)
+        if own:
+            DEVICE = os.environ.get("DEVICE")
+            # Connect to the pyboard
+            print(Fore.GREEN + Style.BRIGHT + f"Connecting to pyboard at {DEVICE}...")
+            pyb = Pyboard(DEVICE)
         pyb.enter_raw_repl(soft_reset=False)
         print(Fore.GREEN + "Raw REPL mode entered")
 
@@ -92,6 +174,7 @@ def upload_changed_files(src_dir="./src", all_files=False):
 
         if not py_files:
             print(Fore.YELLOW + Style.BRIGHT + f"No Python files found in {src_dir}")
+            pyb.exit_raw_repl()
             return
 
         # Track upload statistics
@@ -115,6 +198,9 @@ def upload_changed_files(src_dir="./src", all_files=False):
                 print(Fore.BLUE + f"Skipping unchanged file: {src_file}")
                 skipped += 1
 
+        if profile is not None:
+            set_profiling(pyb, profile)
+
         # Print summary
         print(Style.BRIGHT + f"\nUpload summary:")
         print(Fore.GREEN + f"  Uploaded: {uploaded}")
@@ -123,14 +209,97 @@ def upload_changed_files(src_dir="./src", all_files=False):
 
         # Exit raw REPL mode
         pyb.exit_raw_repl()
-        pyb.serial.write(b"\x04")  # ctrl-D: soft reset
-        pyb.close()
+        if own:
+            pyb.serial.write(b"\x04")  # ctrl-D: soft reset
+            pyb.close()
 
     except Exception as e:
         print(Fore.RED + Style.BRIGHT + f"Error: {e}")
         sys.exit(1)
 
 
+def module_name(rel_path):
+    """Import name of a file relative to src_dir, e.g. pkg/mod.py -> pkg.mod"""
+    name = rel_path.replace(os.path.sep, "/").rsplit(".", 1)[0]
+    if name.endswith("/__init__"):
+        name = name[: -len("/__init__")]
+    return name.replace("/", ".")
+
+
+def upload_to_ram(src_dir="./src", all_files=False, command="import main\nmain.main()"):
+    """
+    Inject changed files into an in-memory filesystem on the device and run
+    command, without writing flash or resetting. Files are compared with the
+    last flash upload, so the device sees exactly the working tree; run a
+    normal upload to commit them to flash.
+
+    RAM copies of files that no longer differ from flash are dropped, and
+    every module under src_dir is removed from sys.modules: modules imported
+    at boot (main, z_*) would otherwise keep references to the old code.
+    """
+    DEVICE = os.environ.get("DEVICE")
+    print(Fore.GREEN + Style.BRIGHT + f"Connecting to pyboard at {DEVICE}...")
+    pyb = Pyboard(DEVICE)
+    try:
+        pyb.enter_raw_repl(soft_reset=False)
+        pyb.exec_(_ram_fs_code)
+        print(Fore.GREEN + f"RAM filesystem mounted at {RAM_MOUNT}")
+
+        modules = []
+        changed = []
+        for root, _, files in os.walk(src_dir):
+            for file in sorted(files):
+                if not file.endswith(".py"):
+                    continue
+                src_file = os.path.join(root, file)
+                rel_path = os.path.relpath(src_file, src_dir)
+                modules.append(module_name(rel_path))
+                if all_files or has_file_changed(src_file):
+                    changed.append((src_file, rel_path.replace(os.path.sep, "/")))
+
+        # Files changed earlier in the session but now equal to flash must stop shadowing it
+        pyb.exec_(
+            "for _k in [k for k in _ram_fs.files if k not in %r]:\n  del _ram_fs.files[_k]"
+            % [rel for _, rel in changed]
+        )
+
+        injected = []
+        total = 0
+        start = time.monotonic()
+        for src_file, rel in changed:
+            with open(src_file, "rb") as f:
+                data = f.read()
+            print(Fore.CYAN + f"Injecting {src_file} ({len(data)} bytes)")
+            pyb.exec_("_ram_fs.files[%r] = a2b_base64(%r)" % (rel, base64.b64encode(data).decode("ascii")))
+            injected.append(src_file)
+            total += len(data)
+
+        # Re-import everything from src_dir, so nothing keeps a reference to a stale module
+        pyb.exec_("for _m in %r:\n  sys.modules.pop(_m, None)" % modules)
+
+        print(Style.BRIGHT + f"\nInjected {len(injected)} files, {total} bytes in "
+              f"{time.monotonic() - start:.2f} s (flash untouched)")
+        if not command:
+            pyb.exit_raw_repl()
+            return
+
+        print(Fore.GREEN + f"Running: {command}")
+        pyb.exec_raw_no_follow(command)
+        try:
+            _, err = pyb.follow(timeout=None, data_consumer=stdout_write_bytes)
+        except KeyboardInterrupt:
+            pyb.serial.write(b"\x03")  # ctrl-C: stop the program, keep the RAM files
+            _, err = pyb.follow(timeout=5, data_consumer=stdout_write_bytes)
+        if err:
+            stdout_write_bytes(err)
+        pyb.exit_raw_repl()
+    except PyboardError as e:
+        print(Fore.RED + Style.BRIGHT + f"Error: {e}")
+        sys.exit(1)
+    finally:
+        pyb.close()
+
+
 def main():
     # Load environment variables
     dotenv.load_dotenv()
@@ -144,14 +313,30 @@ def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Upload Python files to pyboard")
     parser.add_argument("--all", action="store_true", help="Upload all files, not just changed ones")
+    parser.add_argument("--profile", dest="profile", action="store_true", default=None,
+                        help="Enable the z_prof profiler on the device")
+    parser.add_argument("--no-profile", dest="profile", action="store_false",
+                        help="Disable the z_prof profiler on the device")
+    parser.add_argument("--ram", action="store_true",
+                        help="Inject changed files into device RAM and run them, leaving flash alone")
+    parser.add_argument("--run", default="import main\nmain.main()",
+                        help="Code to run after a --ram deploy [import main; main.main()]")
     args = parser.parse_args()
 
+    if args.ram:
+        if args.all:
+            print(Fore.YELLOW + "Mode: Injecting ALL files into RAM")
+        else:
+            print(Fore.YELLOW + "Mode: Injecting only CHANGED files into RAM")
+        upload_to_ram(all_files=args.all, command=args.run.replace("\\n", "\n"))
+        return
+
     if args.all:
         print(Fore.YELLOW + "Mode: Uploading ALL files")
     else:
         print(Fore.YELLOW + "Mode: Uploading only CHANGED files")
 
-    upload_changed_files(all_files=args.all)
+    upload_changed_files(all_files=args.all, profile=args.profile)
 
 
 if __name__ == "__main__":